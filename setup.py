@@ -17,6 +17,11 @@ setuptools.setup(
     'numpy',
     'matplotlib'
     ],
+    extras_require={
+        'tiff': ['tifffile'],
+        'safe': ['imagecodecs', 'tifffile'],
+        'tests': ['pytest'],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
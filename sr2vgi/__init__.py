@@ -1,4 +1,7 @@
 from . import vgi
+from .dsl import compile
+from .registry import INDEXES, compute_many
+from .safe import open_safe
 # Version of the package
 
 __version__ = "0.0.2"
@@ -1,5 +1,7 @@
-from .vgi import *
+import sys
+
+from .cli import main
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
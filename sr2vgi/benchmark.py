@@ -0,0 +1,358 @@
+"""
+Benchmarks of the index functions.
+
+.. code-block:: shell
+
+    python -m sr2vgi.benchmark --output 0.0.2.json
+    python -m sr2vgi.benchmark --sizes 1e6 --compare 0.0.2.json
+
+:func:`suite` times every function of :mod:`sr2vgi.vgi` over array sizes, \
+input data types and memory layouts, and records the peak of memory \
+allocated by each call. Results are saved as JSON with :func:`save`, and \
+:func:`compare` lists the regressions between two result files.
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+from . import __version__, parallel, registry, vgi
+
+SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8)
+
+# Inputs: reflectances in a floating type, or Sentinel-2 digital numbers.
+DTYPES = ('uint16', 'float32', 'float64')
+
+# Bands as contiguous arrays, or views of every other column of an array.
+LAYOUTS = ('contiguous', 'strided')
+
+# Options of the index functions for each input data type.
+_OPTIONS = {'uint16': {'scaling': 'sentinel2-l2a-legacy'}}
+
+# Fields identifying a result across files.
+_KEY = ('index', 'pixels', 'dtype', 'layout')
+
+
+def _bands(names, shape, dtype='float64', seed=0):
+    generator = numpy.random.default_rng(seed)
+    return {band: generator.uniform(0.01, 0.6, shape).astype(dtype)
+            for band in registry.required_bands(names)}
+
+
+def _shape(pixels):
+    """Shape of a band of ``pixels`` pixels, a power of ten wide."""
+    width = 10 ** math.ceil(math.log10(pixels) / 2)
+    return (max(pixels // width, 1), width)
+
+
+def _band(band, shape, dtype, layout, seed=0):
+    """Random band, the same for every index."""
+
+    generator = numpy.random.default_rng([seed, list(registry.BANDS).index(
+        band)])
+    rows, columns = shape
+    if layout == 'strided':
+        columns *= 2
+    values = generator.uniform(0.01, 0.6, (rows, columns))
+    if numpy.dtype(dtype).kind in 'iu':
+        values = numpy.rint(values * 10000, out=values)
+    values = values.astype(dtype)
+    return values[:, ::2] if layout == 'strided' else values
+
+
+def _time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def speedup(names=('ndvi', 'bai', 'REPA'), shape=(4096, 4096), workers=None,
+            repeat=3):
+    """
+    Time the thread-pool execution of indexes against a single thread.
+
+    Both runs are :func:`sr2vgi.parallel.compute` over the same blocks, \
+    so the speedup is that of the threads alone.
+
+    :param names: Indexes to time. The defaults cover a 2-band index and \
+    two 5-band indexes.
+    :type names: iterable of str
+    :param shape: Shape of the random bands.
+    :type shape: tuple
+    :param workers: Number of threads, defaults to the number of CPUs.
+    :type workers: int
+    :param repeat: Number of runs, the best one is kept.
+    :type repeat: int
+
+    :returns: Serial and parallel times in seconds, and speedup, by index.
+    :rtype: dict
+    """
+
+    workers = workers or os.cpu_count() or 1
+    bands = _bands(names, shape)
+    # Four strips per thread, the default of parallel.compute.
+    block = -(-shape[0] // (4 * workers))
+    results = {}
+
+    with numpy.errstate(all='ignore'):
+        for name in names:
+            spec = registry.get(name)
+            out = numpy.empty(shape)
+            serial = _time(lambda: parallel.compute(
+                name, bands, out=out, workers=1, block=block), repeat)
+            threaded = _time(lambda: parallel.compute(
+                name, bands, out=out, workers=workers, block=block), repeat)
+            results[spec.name] = {'serial': serial, 'parallel': threaded,
+                                  'workers': workers,
+                                  'speedup': serial / threaded}
+    return results
+
+
+def _peak(function):
+    """Peak of memory allocated by a call, in bytes."""
+
+    traced = not tracemalloc.is_tracing()
+    if traced:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        if traced:
+            tracemalloc.stop()
+
+
+def suite(names=None, sizes=SIZES, dtypes=DTYPES, layouts=LAYOUTS, repeat=3,
+          memory=True, log=None):
+    """
+    Time the index functions of :mod:`sr2vgi.vgi`.
+
+    Every index is computed by its function on random bands of each size, \
+    data type and layout, ``uint16`` bands being digital numbers decoded \
+    by the ``scaling`` option. Only the bands of one index are held at a \
+    time, which the largest sizes need: ``10 ** 8`` ``float64`` pixels are \
+    800 MB a band.
+
+    :param names: Indexes to time, defaults to all of them.
+    :type names: iterable of str
+    :param sizes: Numbers of pixels of the bands.
+    :type sizes: iterable of int
+    :param dtypes: Data types of the bands, see :data:`DTYPES`.
+    :type dtypes: iterable of str
+    :param layouts: Memory layouts of the bands, see :data:`LAYOUTS`.
+    :type layouts: iterable of str
+    :param repeat: Number of runs, the best one is kept.
+    :type repeat: int
+    :param memory: Whether to record the peak of memory of a call, in an \
+    extra run traced by :mod:`tracemalloc`.
+    :type memory: bool
+    :param log: File each result is written to as it is measured, e.g. \
+    :data:`sys.stderr`.
+    :type log: file
+
+    :returns: Results, with the ``index``, ``pixels``, ``shape``, \
+    ``dtype`` and ``layout`` of the bands, the best ``seconds``, \
+    ``pixels_per_second`` and ``peak_memory`` in bytes, ``None`` if not \
+    recorded.
+    :rtype: list of dict
+    """
+
+    names = [registry.get(name).name for name in names or registry.INDEXES]
+    results = []
+
+    with numpy.errstate(all='ignore'):
+        for pixels in sizes:
+            shape = _shape(int(pixels))
+            for dtype in dtypes:
+                options = _OPTIONS.get(numpy.dtype(dtype).name, {})
+                for layout in layouts:
+                    if layout not in LAYOUTS:
+                        raise ValueError('Unknown layout {!r}, expected one '
+                                         'of {}'.format(layout,
+                                                        ', '.join(LAYOUTS)))
+                    bands = {}
+                    for name in names:
+                        spec = registry.get(name)
+                        for band in set(bands) - set(spec.bands):
+                            del bands[band]
+                        for band in spec.bands:
+                            if band not in bands:
+                                bands[band] = _band(band, shape, dtype,
+                                                    layout)
+
+                        function = getattr(vgi, name)
+                        args = [bands[band] for band in spec.bands]
+                        seconds = _time(lambda: function(*args, **options),
+                                        repeat)
+                        result = {
+                            'index': name,
+                            'pixels': shape[0] * shape[1],
+                            'shape': list(shape),
+                            'dtype': numpy.dtype(dtype).name,
+                            'layout': layout,
+                            'seconds': seconds,
+                            'pixels_per_second': shape[0] * shape[1] /
+                            seconds if seconds else None,
+                            'peak_memory': _peak(lambda: function(
+                                *args, **options)) if memory else None,
+                        }
+                        results.append(result)
+                        if log is not None:
+                            print(_format(result), file=log, flush=True)
+    return results
+
+
+def _format(result):
+    return '{index:<16} {pixels:>10} {dtype:<8} {layout:<10} ' \
+        '{seconds:>10.6f}s {peak:>10}'.format(
+            peak='-' if result['peak_memory'] is None else
+            '{:.0f}kB'.format(result['peak_memory'] / 1024), **result)
+
+
+def save(results, path):
+    """
+    Save benchmark results as JSON, with the versions and the machine.
+
+    :param results: Results of :func:`suite`.
+    :type results: list of dict
+    :param path: Path of the JSON file.
+    :type path: str
+    """
+
+    document = {
+        'sr2vgi': __version__,
+        'numpy': numpy.__version__,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'results': results,
+    }
+    with open(path, 'w') as file:
+        json.dump(document, file, indent=1)
+
+
+def load(path):
+    """
+    Load benchmark results saved by :func:`save`.
+
+    :returns: Document with the ``results`` and the versions.
+    :rtype: dict
+    """
+
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(old, new, tolerance=0.1):
+    """
+    List the regressions of benchmark results.
+
+    :param old: Reference results, of :func:`suite` or :func:`load`.
+    :type old: list or dict
+    :param new: Results compared to the reference.
+    :type new: list or dict
+    :param tolerance: Relative increase of time or peak of memory \
+    reported, ``0.1`` for 10%.
+    :type tolerance: float
+
+    :returns: Regressions, most severe first, with the fields identifying \
+    the result, the ``measure`` (``seconds`` or ``peak_memory``), its \
+    ``old`` and ``new`` values and their ``ratio``. Results of only one \
+    of the files are ignored.
+    :rtype: list of dict
+    """
+
+    def index(results):
+        if isinstance(results, dict):
+            results = results['results']
+        return {tuple(result[key] for key in _KEY): result
+                for result in results}
+
+    old = index(old)
+    regressions = []
+    for key, result in index(new).items():
+        if key not in old:
+            continue
+        for measure in ('seconds', 'peak_memory'):
+            before, after = old[key].get(measure), result.get(measure)
+            if not before or after is None:
+                continue
+            if after > before * (1 + tolerance):
+                regressions.append(dict(zip(_KEY, key), measure=measure,
+                                        old=before, new=after,
+                                        ratio=after / before))
+    return sorted(regressions, key=lambda item: -item['ratio'])
+
+
+def main(argv=None):
+    """
+    Run the benchmarks from the command line.
+
+    :returns: Exit status, 1 if a comparison found regressions.
+    :rtype: int
+    """
+
+    parser = argparse.ArgumentParser(prog='python -m sr2vgi.benchmark',
+                                     description=__doc__.split('\n')[1])
+    parser.add_argument('-i', '--indexes', nargs='+', metavar='INDEX',
+                        help='indexes to time (default: all)')
+    parser.add_argument('--sizes', nargs='+', type=float, metavar='PIXELS',
+                        default=SIZES, help='pixels of the bands')
+    parser.add_argument('--dtypes', nargs='+', default=DTYPES,
+                        help='data types of the bands')
+    parser.add_argument('--layouts', nargs='+', choices=LAYOUTS,
+                        default=LAYOUTS, help='memory layouts of the bands')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='runs of each case (default: %(default)s)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='do not record the peaks of memory')
+    parser.add_argument('-o', '--output', help='JSON file of the results')
+    parser.add_argument('-c', '--compare', metavar='JSON',
+                        help='results to compare with')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.1,
+                        help='relative increase reported as a regression '
+                             '(default: %(default)s)')
+    parser.add_argument('--speedup', action='store_true',
+                        help='time the thread-pool execution instead')
+    args = parser.parse_args(argv)
+
+    if args.speedup:
+        for name, result in speedup(args.indexes or ('ndvi', 'bai',
+                                                     'REPA')).items():
+            print('{:<8} 1 thread {serial:.3f}s  {workers} threads '
+                  '{parallel:.3f}s  speedup {speedup:.1f}x'.format(name,
+                                                                  **result))
+        return 0
+
+    results = suite(args.indexes, [int(size) for size in args.sizes],
+                    args.dtypes, args.layouts, args.repeat,
+                    not args.no_memory, log=sys.stdout)
+    if args.output:
+        save(results, args.output)
+    if not args.compare:
+        return 0
+
+    regressions = compare(load(args.compare), results, args.tolerance)
+    for item in regressions:
+        print('{index} {pixels} {dtype} {layout}: {measure} {old:.6g} -> '
+              '{new:.6g} ({ratio:.2f}x)'.format(**item), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Command line computing indexes of many scenes.
+
+.. code-block:: shell
+
+    python -m sr2vgi S2*.SAFE -i ndvi nbr -o indexes/ --workers 4
+
+A scene is a Sentinel-2 L2A ``.SAFE`` directory, a directory of band \
+files (``b4.npy``, ``*_B04.tif``, ``*_B04.jp2`` or raw files with an \
+ENVI header like ``b4.dat``), a multi-band GeoTIFF or a raw file with an \
+ENVI header (see :mod:`sr2vgi.raw`). Scenes are processed in parallel by \
+a pool of processes, each one computing its scene block by block and \
+streaming the results to disk, so memory use is bounded by the block \
+size rather than the scene size, except for JPEG 2000 bands, like those \
+of SAFE products as distributed: they are decoded whole (see \
+:class:`sr2vgi.safe.Jp2Band`), so a scene of them holds every band it \
+reads in memory. The throughput of every scene is reported at the end.
+"""
+
+import argparse
+import concurrent.futures
+import os
+import re
+import sys
+import time
+
+import numpy
+
+from . import raw, registry, tiff, tiled
+from .safe import Jp2Band, Safe
+from .tiled import BLOCK_ROWS, _shape
+
+FORMATS = ('npy', 'raw', 'tif')
+
+# Band of a file name, e.g. b8a.npy, T23KMQ_B8A.tif or T23KMQ_B8A_20m.jp2.
+_BAND = re.compile(r'(?:^|_)b(\d[\da]?)(?:_\d+m)?\.(npy|tiff?|jp2|dat|img|'
+                   r'bin|raw|bsq|bil|bip)$', re.IGNORECASE)
+
+
+def _is_safe(path):
+    return os.path.isdir(os.path.join(path, 'GRANULE'))
+
+
+def _band_files(path):
+    """Band files of a directory, by band name."""
+    files = {}
+    for name in sorted(os.listdir(path)):
+        match = _BAND.search(name)
+        if match:
+            band = 'b' + match.group(1).lstrip('0').lower()
+            if band in registry.BANDS:
+                files[band] = os.path.join(path, name)
+    return files
+
+
+def _open(path, band):
+    """Open a band file of a directory, after its extension."""
+    extension = _BAND.search(os.path.basename(path)).group(2).lower()
+    if extension in ('tif', 'tiff'):
+        return tiff.load({band: path})[band]
+    if extension == 'jp2':
+        return Jp2Band(path)
+    if extension == 'npy':
+        return numpy.load(path, mmap_mode='r')
+    return raw.load(path, [band])[band]
+
+
+def open_scene(path, names=None, bands=None, resolution=None):
+    """
+    Open the bands of a scene needed by indexes.
+
+    :param path: Scene, see :mod:`sr2vgi.cli`.
+    :type path: str
+    :param names: Indexes to compute, defaults to all those whose bands \
+    are present.
+    :type names: list of str
+    :param bands: Band names of the samples of a multi-band file without \
+    band names.
+    :type bands: list of str
+    :param resolution: Resolution of the bands of a SAFE product in meters, \
+    defaults to the finest one of the bands needed.
+    :type resolution: float
+
+    :returns: Band arrays by name, whose TIFF files are closed by \
+    :func:`sr2vgi.tiff.close`, the index names and the scaling of the \
+    scene, if known.
+    :rtype: tuple
+    """
+
+    if _is_safe(path):
+        product = Safe(path)
+        if names is None:
+            names = registry.available(product.files)
+        if resolution is None:
+            resolution = min(product.resolutions[band]
+                             for band in registry.required_bands(names))
+        return product.bands(names, resolution), names, product.scaling
+
+    if os.path.isdir(path):
+        arrays = {band: _open(file, band)
+                  for band, file in _band_files(path).items()}
+    elif path.lower().endswith(('.tif', '.tiff')):
+        arrays = tiff.load(path, bands)
+    else:
+        arrays = raw.load(path, bands)
+
+    if names is None:
+        names = registry.available(arrays)
+    return arrays, names, None
+
+
+def process(path, output, names=None, format='npy', block=BLOCK_ROWS,
+            bands=None, resolution=None, **options):
+    """
+    Compute the indexes of a scene into files.
+
+    :param path: Scene, see :mod:`sr2vgi.cli`.
+    :type path: str
+    :param output: Output directory.
+    :type output: str
+    :param names: Indexes to compute, defaults to all those whose bands \
+    are present.
+    :type names: list of str
+    :param format: ``npy`` for a ``.npy`` file per index, ``raw`` for a \
+    raw file with an ENVI header, or ``tif`` for a tiled GeoTIFF, of a \
+    band per index.
+    :type format: str
+    :param block: Number of rows of a block.
+    :type block: int
+    :param bands: Band names of the samples of a multi-band file.
+    :type bands: list of str
+    :param resolution: Resolution of the bands of a SAFE product.
+    :type resolution: float
+    :param options: Options of :func:`sr2vgi.registry.compute_many`.
+
+    :returns: Path of the scene, number of pixels and seconds taken.
+    :rtype: tuple
+    """
+
+    started = time.perf_counter()
+    arrays, names, scaling = open_scene(path, names, bands, resolution)
+    if options.get('scaling') is None:
+        options['scaling'] = scaling
+    stem = os.path.join(output, os.path.splitext(
+        os.path.basename(os.path.normpath(path)))[0])
+
+    with tiff.Bands(arrays):
+        if format == 'npy':
+            tiled.compute_many(arrays, {
+                name: '{}_{}.npy'.format(stem, name) for name in names},
+                block=block, **options)
+        elif format == 'raw':
+            raw.compute_many(arrays, stem + '.dat', names, block=block,
+                             **options)
+        elif format == 'tif':
+            tiff.compute_many(arrays, stem + '.tif', names, workers=1,
+                              **options)
+        else:
+            raise ValueError('Unknown format {!r}, expected one of {}'.format(
+                format, ', '.join(FORMATS)))
+
+        pixels = 1
+        for length in _shape(arrays, registry.required_bands(names))[-2:]:
+            pixels *= length
+    return path, pixels, time.perf_counter() - started
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m sr2vgi',
+        description='Compute vegetation indexes of Sentinel-2 scenes.')
+    parser.add_argument('inputs', nargs='*', metavar='SCENE',
+                        help='SAFE directory, directory of band files, '
+                             'GeoTIFF or raw file with an ENVI header')
+    parser.add_argument('-i', '--indexes', nargs='+', metavar='INDEX',
+                        help='indexes to compute, separated by spaces or '
+                             'commas, defaults to all those computable')
+    parser.add_argument('-o', '--output', default='.',
+                        help='output directory (default: %(default)s)')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='npy',
+                        help='output files (default: %(default)s)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='scenes processed in parallel '
+                             '(default: %(default)s)')
+    parser.add_argument('-b', '--block', type=int, default=BLOCK_ROWS,
+                        help='rows per block, bounding the memory used '
+                             'except for JPEG 2000 bands, decoded whole '
+                             '(default: %(default)s)')
+    parser.add_argument('--bands', nargs='+', metavar='BAND',
+                        help='band names of the samples of multi-band files')
+    parser.add_argument('--resolution', type=float,
+                        help='resolution of SAFE products in meters')
+    parser.add_argument('--scaling',
+                        help='decoding of digital numbers, e.g. '
+                             'sentinel2-l2a (default: that of SAFE products)')
+    parser.add_argument('--dtype', help='floating type of the results')
+    parser.add_argument('--encoding', metavar='DTYPE',
+                        help='integer type of the encoded results, e.g. '
+                             'int16 (see sr2vgi.encoding)')
+    parser.add_argument('--list', action='store_true',
+                        help='list the indexes and exit')
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the command line.
+
+    :param argv: Arguments, defaults to :data:`sys.argv`.
+    :type argv: list of str
+
+    :returns: Exit status, 1 if a scene failed.
+    :rtype: int
+    """
+
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, spec in registry.INDEXES.items():
+            print('{:<16} {}'.format(name, ' '.join(spec.bands)))
+        return 0
+    if not args.inputs:
+        parser.error('no scene given')
+
+    names = None
+    if args.indexes:
+        try:
+            names = [registry.get(name).name for value in args.indexes
+                     for name in value.split(',') if name]
+        except KeyError as error:
+            parser.error(error.args[0])
+    os.makedirs(args.output, exist_ok=True)
+    options = {key: getattr(args, key) for key in ('scaling', 'dtype',
+                                                   'encoding')
+               if getattr(args, key) is not None}
+
+    status = 0
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        futures = {executor.submit(process, path, args.output, names,
+                                   args.format, args.block, args.bands,
+                                   args.resolution, **options): path
+                   for path in args.inputs}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as error:
+                status = 1
+                print('{}: {}'.format(futures[future], error),
+                      file=sys.stderr)
+
+    if results:
+        print('{:<40} {:>12} {:>9} {:>14}'.format('scene', 'pixels',
+                                                  'seconds', 'pixels/s'))
+        for path, pixels, seconds in sorted(results):
+            print('{:<40} {:>12} {:>9.2f} {:>14,.0f}'.format(
+                os.path.basename(os.path.normpath(path))[-40:], pixels,
+                seconds, pixels / seconds))
+    return status
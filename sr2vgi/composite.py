@@ -0,0 +1,339 @@
+"""
+Temporal composites selected by an index.
+
+A composite keeps, for every pixel, the bands and indexes of one date \
+chosen by a criterion index, e.g. the date of highest NDVI, so that the \
+spectrum of a pixel always comes from a single observation. Builders \
+take one date at a time and keep a running state of one image per band \
+and index, or of a bounded buffer of dates for percentiles, so the time \
+series never has to fit in memory:
+
+.. code-block:: python
+
+    from sr2vgi import composite
+
+    builder = composite.MaxComposite('ndvi', indexes=['nbr'])
+    for date in dates:                      # bands of one date, by name
+        builder.add(date)
+    images = builder.result()               # b2, b4... ndvi, nbr and date
+
+    # The same, from (time, y, x) cubes read a date at a time.
+    images = composite.composite(cubes, 'median', criterion='ndvi')
+
+Dates whose criterion is NaN, e.g. masked by ``where=``, are skipped.
+"""
+
+import abc
+
+import numpy
+
+from . import registry
+from .cube import CHUNK, _floating
+from .tiled import _options, _shape, read, windows
+
+
+class Composite(abc.ABC):
+    """
+    Composite built from dates added one at a time, see :meth:`add`.
+
+    :param criterion: Index selecting the date of each pixel.
+    :type criterion: str
+    :param indexes: Other indexes of the composite.
+    :type indexes: iterable of str
+    :param carry: Bands of the composite, defaults to all the bands of \
+    the first date added.
+    :type carry: iterable of str
+    :param params: Parameters by index name.
+    :type params: dict
+    :param shape: Shape of an image, needed if the dates are added block \
+    by block.
+    :type shape: tuple
+    :param options: Options of :func:`sr2vgi.registry.compute_many`, \
+    except ``encoding``: the criterion is compared as an index value.
+
+    Bands and indexes are kept in their data type. Pixels without any \
+    valid date are NaN, or 0 for integer bands, and their ``date`` is -1. \
+    Subclasses implement :meth:`_start`, :meth:`_update` and \
+    :meth:`_result`.
+    """
+
+    def __init__(self, criterion='ndvi', indexes=(), carry=None, params=None,
+                 shape=None, **options):
+        self.criterion = registry.get(criterion).name
+        self.indexes = list(dict.fromkeys(
+            [self.criterion] + [registry.get(name).name for name in indexes]))
+        self.carry = None if carry is None else list(carry)
+        self.params = params
+        self.shape = None if shape is None else tuple(shape)
+        self.options = options
+        self.dates = 0
+        self.values = None
+
+    def __repr__(self):
+        return '{}({!r}, indexes={!r}, dates={})'.format(
+            type(self).__name__, self.criterion, self.indexes[1:],
+            self.dates)
+
+    @property
+    def bands(self):
+        """Bands read from a date: those carried and those of the indexes."""
+        return list(dict.fromkeys([*(self.carry or ()),
+                                   *registry.required_bands(self.indexes)]))
+
+    def add(self, bands, window=(), date=None, where=None):
+        """
+        Add a date to the composite.
+
+        :param bands: Band images of the date by name.
+        :type bands: dict
+        :param window: Slices of the images in the whole image, if the \
+        date is added block by block.
+        :type window: tuple
+        :param date: Number of the date, reported in the ``date`` image of \
+        the result. Defaults to the number of dates added as whole images.
+        :type date: int
+        :param where: Mask of the valid pixels of the date, of the shape of \
+        the images added, instead of the ``where`` option.
+        :type where: numpy.ndarray
+        """
+
+        if self.carry is None:
+            self.carry = list(bands)
+        layers = {band: bands[band] for band in self.carry}
+        options = _options(self.options, window, numpy.ndim(
+            bands[self.bands[0]]))
+        if where is not None:
+            options = dict(options, where=where)
+        layers.update(registry.compute_many(
+            {band: bands[band] for band in registry.required_bands(
+                self.indexes)}, self.indexes, self.params, **options))
+
+        if self.values is None:
+            if self.shape is None:
+                if window:
+                    raise ValueError('Give the shape of the images to add '
+                                     'dates block by block')
+                self.shape = numpy.shape(layers[self.criterion])
+            _floating(layers[self.criterion].dtype)
+            self._start({name: numpy.asarray(value).dtype
+                         for name, value in layers.items()})
+
+        if date is None:
+            date = self.dates
+        if not window:
+            self.dates += 1
+        self._update(layers, tuple(window), date)
+
+    @abc.abstractmethod
+    def _start(self, dtypes):
+        """Allocate the state, given the data types of the layers by name."""
+
+    @abc.abstractmethod
+    def _update(self, layers, window, date):
+        """Update the state under ``window`` with the layers of a date."""
+
+    def result(self):
+        """
+        Return the composite.
+
+        :returns: Images of the bands and the indexes, and of the number \
+        of the selected date as ``date``, by name.
+        :rtype: dict
+        """
+
+        if self.values is None:
+            raise ValueError('No date added to the composite')
+        return self._result()
+
+    @abc.abstractmethod
+    def _result(self):
+        """Return the images of the composite by name."""
+
+
+def _fill(dtype):
+    return numpy.nan if dtype.kind in 'fc' else 0
+
+
+class MaxComposite(Composite):
+    """
+    Composite of the date of highest criterion of each pixel.
+
+    See :class:`Composite` for the parameters.
+    """
+
+    _better = numpy.greater
+
+    def _start(self, dtypes):
+        self.values = {name: numpy.full(self.shape, _fill(dtype), dtype)
+                       for name, dtype in dtypes.items()}
+        self.date = numpy.full(self.shape, -1, numpy.int32)
+
+    def _update(self, layers, window, date):
+        value, best = layers[self.criterion], \
+            self.values[self.criterion][window]
+        better = self._better(value, best)
+        better |= numpy.isnan(best) & ~numpy.isnan(value)
+        for name, layer in layers.items():
+            numpy.copyto(self.values[name][window], layer, where=better)
+        numpy.copyto(self.date[window], date, where=better)
+
+    def _result(self):
+        return dict(self.values, date=self.date)
+
+
+class MinComposite(MaxComposite):
+    """
+    Composite of the date of lowest criterion of each pixel.
+
+    See :class:`Composite` for the parameters.
+    """
+
+    _better = numpy.less
+
+
+class PercentileComposite(Composite):
+    """
+    Composite of the date of a percentile of the criterion of each pixel.
+
+    The date selected is the one whose criterion has the nearest rank to \
+    the percentile among the valid dates of the pixel, so the bands are \
+    those of an actual observation. Up to ``size`` dates are buffered per \
+    pixel: the percentile is exact for pixels with at most ``size`` valid \
+    dates, and estimated from a uniform sample of ``size`` of them \
+    (reservoir sampling) for the others.
+
+    :param q: Percentile, from 0 to 100.
+    :type q: float
+    :param size: Number of dates buffered, which the memory use is \
+    proportional to.
+    :type size: int
+    :param seed: Seed of the sampling of the dates.
+    :type seed: int
+
+    See :class:`Composite` for the other parameters.
+    """
+
+    def __init__(self, criterion='ndvi', indexes=(), carry=None, params=None,
+                 shape=None, q=50, size=32, seed=0, **options):
+        super().__init__(criterion, indexes, carry, params, shape, **options)
+        if not 0 <= q <= 100:
+            raise ValueError('Percentile {} out of 0 to 100'.format(q))
+        self.q = q
+        self.size = size
+        self.random = numpy.random.default_rng(seed)
+
+    def _start(self, dtypes):
+        shape = (self.size,) + self.shape
+        self.values = {name: numpy.full(shape, _fill(dtype), dtype)
+                       for name, dtype in dtypes.items()}
+        self.date = numpy.full(shape, -1, numpy.int32)
+        self.count = numpy.zeros(self.shape, numpy.intp)
+
+    def _update(self, layers, window, date):
+        valid = ~numpy.isnan(layers[self.criterion])
+        count = self.count[window]
+        count += valid
+
+        slot = count - 1
+        over = valid & (count > self.size)
+        if over.any():
+            # Replaces a buffered date with probability size / count.
+            slot[over] = self.random.integers(0, count[over])
+        keep = valid & (slot < self.size)
+        if not keep.any():
+            return
+
+        target = (slot[keep],) + numpy.nonzero(keep)
+        buffered = (slice(None),) + window
+        for name, layer in layers.items():
+            self.values[name][buffered][target] = numpy.broadcast_to(
+                layer, keep.shape)[keep]
+        self.date[buffered][target] = date
+
+    def _result(self):
+        count = numpy.minimum(self.count, self.size)
+        rank = numpy.rint(self.q / 100 * numpy.maximum(count - 1, 0)).astype(
+            numpy.intp)
+        # NaN sort last, after the buffered values.
+        order = numpy.argsort(self.values[self.criterion], axis=0)
+        slot = numpy.take_along_axis(order, rank[None], 0)
+        empty = count == 0
+
+        result = {}
+        for name, values in self.values.items():
+            result[name] = numpy.take_along_axis(values, slot, 0)[0]
+            result[name][empty] = _fill(values.dtype)
+        result['date'] = numpy.take_along_axis(self.date, slot, 0)[0]
+        result['date'][empty] = -1
+        return result
+
+
+class MedianComposite(PercentileComposite):
+    """
+    Composite of the date of median criterion of each pixel.
+
+    See :class:`PercentileComposite` for the parameters.
+    """
+
+    def __init__(self, criterion='ndvi', indexes=(), carry=None, params=None,
+                 shape=None, size=32, seed=0, **options):
+        super().__init__(criterion, indexes, carry, params, shape, 50, size,
+                         seed, **options)
+
+
+METHODS = {
+    'max': MaxComposite,
+    'min': MinComposite,
+    'median': MedianComposite,
+    'percentile': PercentileComposite,
+}
+
+
+def composite(bands, method='max', chunk=CHUNK, block=None, **kwargs):
+    """
+    Composite band cubes, a date at a time.
+
+    :param bands: Band cubes by name, typically memory-mapped, time first.
+    :type bands: dict
+    :param method: Builder of :data:`METHODS`.
+    :type method: str
+    :param chunk: Number of dates read at a time.
+    :type chunk: int
+    :param block: Number of rows of a strip of a date, or the shape of a \
+    block over the spatial axes, defaults to whole images.
+    :type block: int or tuple
+    :param kwargs: Arguments of the builder, e.g. ``criterion``, \
+    ``indexes`` or ``q``. ``carry`` defaults to all the bands, and \
+    ``where`` may be a mask of the valid pixels of every date, a cube.
+
+    :returns: Images of the bands and the indexes, and of the number of \
+    the selected date as ``date``, by name.
+    :rtype: dict
+    """
+
+    if method not in METHODS:
+        raise ValueError('Unknown method {!r}, expected one of {}'.format(
+            method, ', '.join(METHODS)))
+    kwargs.setdefault('carry', list(bands))
+    builder = METHODS[method](**kwargs)
+    shape = _shape(bands, builder.bands)
+    if len(shape) < 3:
+        raise ValueError('Cubes have a time axis and two spatial axes, not '
+                         'the shape {}'.format(shape))
+    builder.shape = shape[1:]
+    where = None
+    if numpy.ndim(builder.options.get('where')) == len(shape):
+        where = builder.options.pop('where')
+
+    step = (chunk,) + (() if block is None else (block,)
+                       if isinstance(block, int) else tuple(block))
+    for window in windows(shape, step):
+        values = {band: read(bands[band], window, len(shape))
+                  for band in builder.bands}
+        mask = None if where is None else read(where, window, len(shape))
+        for offset in range(window[0].stop - window[0].start):
+            builder.add({band: value[offset] for band, value in
+                         values.items()}, window[1:],
+                        window[0].start + offset,
+                        None if mask is None else mask[offset])
+    return builder.result()
@@ -0,0 +1,275 @@
+"""
+Indexes of time series, as ``(time, y, x)`` cubes.
+
+.. code-block:: python
+
+    from sr2vgi import cube, raw
+
+    bands = raw.load('cubes/')      # b4.npy, b8.npy... of shape (t, y, x)
+    cube.compute('ndvi', bands, out='ndvi.npy')
+    mean, peak = cube.compute('ndvi', bands, reducer=[cube.Mean(),
+                                                      cube.Max()])
+
+The cubes are read a time chunk at a time, of one date by default, and \
+optionally a strip of rows at a time. Every chunk is evaluated by \
+:func:`sr2vgi.registry.compute_many` and streamed into an output cube, \
+a ``.npy`` file for results larger than memory, or into reducers of the \
+time axis, which keep one image of state. Memory use is bounded by the \
+chunk whatever the length of the series.
+"""
+
+import abc
+
+import numpy
+
+from . import registry
+from .fused import dtypes
+from .tiled import _encodings, _options, _output, _shape, read, windows
+
+
+# Default number of dates of a chunk.
+CHUNK = 1
+
+
+class Reducer(abc.ABC):
+    """
+    Reduction of index values over the time axis, chunk by chunk.
+
+    :meth:`start` is called once with the shape of an image, then \
+    :meth:`update` with every chunk, and :meth:`result` at the end. \
+    Subclasses implement :meth:`update` and :meth:`result`.
+    """
+
+    def start(self, shape, dtype):
+        """
+        Start a reduction.
+
+        :param shape: Shape of an image, without the time axis.
+        :type shape: tuple
+        :param dtype: Data type of the index values.
+        :type dtype: numpy.dtype
+        """
+
+        self.shape, self.dtype = shape, numpy.dtype(dtype)
+
+    @abc.abstractmethod
+    def update(self, values, window):
+        """
+        Reduce a chunk.
+
+        :param values: Index values of the chunk, time first. The array is \
+        reused for the next chunk.
+        :type values: numpy.ndarray
+        :param window: Slices of the chunk in the cube, time first.
+        :type window: tuple
+        """
+
+    @abc.abstractmethod
+    def result(self):
+        """Return the reduced image."""
+
+
+def _floating(dtype):
+    if dtype.kind != 'f':
+        raise ValueError('Reducers take index values, not {} encoded '
+                         'values'.format(dtype))
+    return dtype
+
+
+class Count(Reducer):
+    """Number of dates with a value, not NaN."""
+
+    def start(self, shape, dtype):
+        super().start(shape, dtype)
+        self.count = numpy.zeros(shape, numpy.intp)
+
+    def update(self, values, window):
+        self.count[window[1:]] += len(values) - numpy.count_nonzero(
+            numpy.isnan(values), axis=0)
+
+    def result(self):
+        return self.count
+
+
+class Sum(Reducer):
+    """Sum of the values, NaN ignored, accumulated in ``float64``."""
+
+    def start(self, shape, dtype):
+        super().start(shape, _floating(numpy.dtype(dtype)))
+        self.total = numpy.zeros(shape, numpy.float64)
+
+    def update(self, values, window):
+        self.total[window[1:]] += numpy.nansum(values, axis=0)
+
+    def result(self):
+        return self.total
+
+
+class Mean(Reducer):
+    """Mean of the values, NaN ignored, and NaN where no date has one."""
+
+    def start(self, shape, dtype):
+        super().start(shape, dtype)
+        self.sum, self.count = Sum(), Count()
+        self.sum.start(shape, dtype)
+        self.count.start(shape, dtype)
+
+    def update(self, values, window):
+        self.sum.update(values, window)
+        self.count.update(values, window)
+
+    def result(self):
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return (self.sum.result() / self.count.result()).astype(
+                self.dtype)
+
+
+class Min(Reducer):
+    """Lowest value, NaN ignored, and NaN where no date has one."""
+
+    _reduce = numpy.fmin
+
+    def start(self, shape, dtype):
+        super().start(shape, _floating(numpy.dtype(dtype)))
+        self.value = numpy.full(shape, numpy.nan, self.dtype)
+
+    def update(self, values, window):
+        target = self.value[window[1:]]
+        self._reduce(target, self._reduce.reduce(values, axis=0), out=target)
+
+    def result(self):
+        return self.value
+
+
+class Max(Min):
+    """Highest value, NaN ignored, and NaN where no date has one."""
+
+    _reduce = numpy.fmax
+
+
+def _reducers(value):
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def compute_many(bands, names=None, *, out=None, reducers=None, params=None,
+                 chunk=CHUNK, block=None, **options):
+    """
+    Compute indexes of cubes chunk by chunk, into cubes or reducers.
+
+    :param bands: Band cubes by name, typically memory-mapped, time first.
+    :type bands: dict
+    :param names: Indexes to compute. Defaults to the keys of ``out`` and \
+    ``reducers``.
+    :type names: iterable of str
+    :param out: Output cubes, or paths of ``.npy`` files to create, by \
+    index name.
+    :type out: dict
+    :param reducers: :class:`Reducer` or list of reducers, by index name.
+    :type reducers: dict
+    :param params: Parameters by index name.
+    :type params: dict
+    :param chunk: Number of dates of a chunk.
+    :type chunk: int
+    :param block: Number of rows of a strip of a chunk, or the shape of a \
+    block over the spatial axes, defaults to whole images.
+    :type block: int or tuple
+    :param options: Options of :func:`sr2vgi.registry.compute_many`.
+
+    :returns: Results of the reducers by index name, in the form of \
+    ``reducers``, or the output cubes by index name when no reducer is \
+    given.
+    :rtype: dict
+
+    :raises ValueError: If neither ``out`` nor ``reducers`` is given, or \
+    the bands are not cubes.
+    """
+
+    if not out and not reducers:
+        raise ValueError('Give output cubes or reducers to stream the '
+                         'results into')
+    if names is None:
+        names = list(dict.fromkeys([*(out or ()), *(reducers or ())]))
+    names = [registry.get(name).name for name in names]
+    out = {registry.get(name).name: target
+           for name, target in (out or {}).items()}
+    reducers = {registry.get(name).name: value
+                for name, value in (reducers or {}).items()}
+
+    batch = registry.plan(names, params)
+    shape = _shape(bands, batch.bands)
+    if len(shape) < 3:
+        raise ValueError('Cubes have a time axis and two spatial axes, not '
+                         'the shape {}'.format(shape))
+    _, dtype = dtypes([bands[band] for band in batch.bands],
+                      options.get('dtype'), options.get('precision'))
+    options, types = _encodings(names, options)
+    kinds = {name: types.get(name, dtype) for name in names}
+
+    out = {name: _output(target, shape, kinds[name])
+           for name, target in out.items()}
+    for name, value in reducers.items():
+        for reducer in _reducers(value):
+            reducer.start(shape[1:], kinds[name])
+
+    step = (chunk,) + (() if block is None else (block,)
+                       if isinstance(block, int) else tuple(block))
+    # Chunks of the indexes without an output cube, reused.
+    buffers = {name: numpy.empty(tuple(min(size, length) for size, length
+                                       in zip(step, shape)) +
+                                 shape[len(step):], kinds[name])
+               for name in names if name not in out}
+
+    for window in windows(shape, step):
+        part = tuple(slice(0, region.stop - region.start)
+                     for region in window)
+        targets = {name: out[name][window] if name in out
+                   else buffers[name][part] for name in names}
+        registry.compute_many({band: read(bands[band], window, len(shape))
+                               for band in batch.bands}, names, params,
+                              out=targets,
+                              **_options(options, window, len(shape)))
+        for name, value in reducers.items():
+            for reducer in _reducers(value):
+                reducer.update(targets[name], window)
+
+    if not reducers:
+        return out
+    return {name: [reducer.result() for reducer in value]
+            if isinstance(value, (list, tuple)) else value.result()
+            for name, value in reducers.items()}
+
+
+def compute(function, bands, out=None, reducer=None, chunk=CHUNK,
+            block=None, **kwargs):
+    """
+    Compute an index of cubes chunk by chunk, into a cube or reducers.
+
+    :param function: Index function of :mod:`sr2vgi.vgi` or index name.
+    :type function: callable or str
+    :param bands: Band cubes by name, time first.
+    :type bands: dict
+    :param out: Output cube, or the path of a ``.npy`` file to create.
+    :type out: numpy.ndarray or str
+    :param reducer: :class:`Reducer` or list of reducers.
+    :type reducer: Reducer or list
+    :param chunk: Number of dates of a chunk.
+    :type chunk: int
+    :param block: Number of rows of a strip of a chunk, or the shape of a \
+    block over the spatial axes.
+    :type block: int or tuple
+    :param kwargs: Parameters of the index and options of the index \
+    functions (``dtype``, ``precision``, ``scaling``...).
+
+    :returns: Result of the reducer, or results of the list of reducers, \
+    or the output cube when no reducer is given.
+    """
+
+    name = registry.get(function if isinstance(function, str)
+                        else function.__name__).name
+    options = {key: kwargs.pop(key) for key in registry.OPTIONS
+               if key in kwargs}
+    return compute_many(bands, [name],
+                        out=None if out is None else {name: out},
+                        reducers=None if reducer is None else {name: reducer},
+                        params={name: kwargs}, chunk=chunk, block=block,
+                        **options)[name]
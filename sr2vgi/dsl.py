@@ -0,0 +1,331 @@
+"""
+Band-math formulas compiled to fused kernels.
+
+.. code-block:: python
+
+    import sr2vgi
+
+    kernel = sr2vgi.compile('(b8 - b4) / (b8 + b4 - 2*b2)')
+    value = kernel(b2=blue, b4=red, b8=nir)
+
+Formulas use the band names of :data:`sr2vgi.registry.BANDS`, numbers, \
+``+ - * / **``, comparisons, ``& | ~`` (or ``and or not``) and the \
+functions ``sqrt``, ``abs`` and ``nd`` (normalized difference). Built-in \
+indexes are written in the same language (see :func:`formula`) and both run \
+on :func:`sr2vgi.fused.execute`.
+"""
+
+import ast
+import functools
+import inspect
+import operator
+
+import numpy
+
+from . import registry
+from .expr import to_formula, trace
+from .fused import execute
+from .kernels import normalized_difference
+from .plan import Plan
+
+
+FUNCTIONS = {
+    'sqrt': numpy.sqrt,
+    'abs': numpy.absolute,
+    'nd': normalized_difference,
+}
+
+# Module of the built-in indexes, which register keeps unless told.
+_BUILTIN = __package__ + '.vgi'
+
+# Number of arguments of the functions, when not 1.
+_ARGUMENTS = {'nd': 2}
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+    ast.BitAnd: numpy.logical_and,
+    ast.BitOr: numpy.logical_or,
+}
+
+_UNARY = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: numpy.logical_not,
+    ast.Invert: numpy.logical_not,
+}
+
+_COMPARE = {
+    ast.Lt: numpy.less,
+    ast.LtE: numpy.less_equal,
+    ast.Gt: numpy.greater,
+    ast.GtE: numpy.greater_equal,
+    ast.Eq: numpy.equal,
+    ast.NotEq: numpy.not_equal,
+}
+
+# Syntax nodes allowed besides names, numbers and calls.
+_SYNTAX = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.BoolOp,
+           ast.Load, ast.operator, ast.unaryop, ast.cmpop, ast.boolop)
+
+
+def parse(formula, params=()):
+    """
+    Parse and validate a formula.
+
+    :param formula: Band-math formula, e.g. ``(b8 - b4) / (b8 + b4)``.
+    :type formula: str
+    :param params: Names of the parameters allowed besides the bands.
+    :type params: iterable of str
+
+    :returns: Syntax tree and band names used, in \
+    :data:`sr2vgi.registry.BANDS` order.
+    :rtype: tuple
+
+    :raises ValueError: If the formula is not valid.
+    """
+
+    try:
+        tree = ast.parse(formula.strip(), mode='eval')
+    except SyntaxError as error:
+        raise ValueError('Invalid formula {!r}: {}'.format(
+            formula, error.msg)) from None
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) \
+                    or node.func.id not in FUNCTIONS \
+                    or len(node.args) != _ARGUMENTS.get(node.func.id, 1) \
+                    or node.keywords:
+                raise ValueError('Invalid call in formula {!r}, only {} are '
+                                 'supported'.format(formula,
+                                                    ', '.join(FUNCTIONS)))
+        elif isinstance(node, ast.Name):
+            if node.id not in FUNCTIONS:
+                names.add(node.id)
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) \
+                    or not isinstance(node.value, (int, float)):
+                raise ValueError('Invalid constant {!r} in formula '
+                                 '{!r}'.format(node.value, formula))
+        elif not isinstance(node, _SYNTAX) or isinstance(node, ast.operator) \
+                and type(node) not in _BINARY \
+                or isinstance(node, ast.cmpop) and type(node) not in _COMPARE:
+            raise ValueError('Unsupported syntax {} in formula {!r}'.format(
+                type(node).__name__, formula))
+
+    unknown = sorted(names - set(registry.BANDS) - set(params))
+    if unknown:
+        raise ValueError('Unknown bands {} in formula {!r}, expected names '
+                         'among {}'.format(', '.join(unknown), formula,
+                                           ', '.join(registry.BANDS)))
+
+    bands = tuple(band for band in registry.BANDS if band in names)
+    return tree, bands
+
+
+def _evaluate(node, values):
+    """Evaluate a syntax tree on arrays, numbers or expression nodes."""
+
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, values)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        return values[node.id]
+    if isinstance(node, ast.BinOp):
+        return _BINARY[type(node.op)](_evaluate(node.left, values),
+                                      _evaluate(node.right, values))
+    if isinstance(node, ast.UnaryOp):
+        return _UNARY[type(node.op)](_evaluate(node.operand, values))
+    if isinstance(node, ast.Call):
+        return FUNCTIONS[node.func.id](*(_evaluate(arg, values)
+                                         for arg in node.args))
+    if isinstance(node, ast.BoolOp):
+        combine = numpy.logical_and if isinstance(node.op, ast.And) \
+            else numpy.logical_or
+        return functools.reduce(combine, (_evaluate(value, values)
+                                          for value in node.values))
+    if isinstance(node, ast.Compare):
+        left = _evaluate(node.left, values)
+        result = None
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _evaluate(comparator, values)
+            comparison = _COMPARE[type(op)](left, right)
+            result = comparison if result is None \
+                else numpy.logical_and(result, comparison)
+            left = right
+        return result
+    raise ValueError('Unsupported syntax {}'.format(type(node).__name__))
+
+
+class Kernel:
+    """
+    Compiled formula, see :func:`compile`.
+
+    :param formula: Band-math formula.
+    :type formula: str
+    :param params: Values of the parameters used in the formula.
+    :type params: dict
+    """
+
+    def __init__(self, formula, params=None):
+        self.formula = formula
+        self.params = dict(params or {})
+        self.tree, self.bands = parse(formula, self.params)
+        self.signature = inspect.Signature(
+            [inspect.Parameter(band, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+             for band in self.bands] +
+            [inspect.Parameter(name, inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                               default=value)
+             for name, value in self.params.items()])
+        self.node = trace(self.function, self.bands, **self.params)
+        self.plan = Plan({'result': self.node})
+
+    def __repr__(self):
+        return 'Kernel({!r})'.format(self.formula)
+
+    def function(self, *args, **kwargs):
+        """Evaluate the formula as written, like the functions of vgi."""
+        arguments = self.signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        return _evaluate(self.tree, arguments.arguments)
+
+    def __call__(self, bands=None, out=None, dtype=None, precision=None,
+                 scaling=None, where=None, fill_value=None, divide=None,
+                 encoding=None, **arrays):
+        """
+        Compute the formula with :func:`sr2vgi.fused.execute`.
+
+        :param bands: Band arrays by name. Bands can also be given as \
+        keyword arguments.
+        :type bands: dict
+        :param out: Array receiving the values.
+        :type out: numpy.ndarray
+        :param dtype: Floating data type of the result, and of the \
+        computation unless ``precision`` says otherwise.
+        :type dtype: numpy.dtype
+        :param precision: Precision policy of :mod:`sr2vgi.precision`.
+        :type precision: str
+        :param scaling: Decoding of bands given as digital numbers.
+        :type scaling: sr2vgi.scaling.Scaling or str or dict
+        :param where: Valid pixels, the others are not computed.
+        :type where: numpy.ndarray
+        :param fill_value: Value of the pixels outside ``where``, defaults \
+        to NaN.
+        :type fill_value: float
+        :param divide: Result of the divisions by zero, ``nan``, ``clamp`` \
+        or a fill value (see :func:`sr2vgi.fused.execute`).
+        :type divide: str or float
+        :param encoding: Integer encoding of the result (see \
+        :mod:`sr2vgi.encoding`).
+        :type encoding: sr2vgi.encoding.Encoding
+
+        :returns: Formula value
+        :rtype: numpy.ndarray
+        """
+
+        bands = dict(bands or {}, **arrays)
+        missing = [band for band in self.bands if band not in bands]
+        if missing:
+            raise KeyError('Formula {!r} requires the bands {}'.format(
+                self.formula, ', '.join(missing)))
+
+        result = execute(self.plan, bands,
+                         out=None if out is None else {'result': out},
+                         dtype=dtype, precision=precision,
+                         scaling=scaling, where=where,
+                         fill_value=fill_value, divide=divide,
+                         encoding=encoding)['result']
+        if out is None and not result.ndim:
+            return result[()]
+        return result
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(formula, params):
+    return Kernel(formula, dict(params))
+
+
+def compile(formula, **params):
+    """
+    Compile a band-math formula into a fused kernel.
+
+    Kernels are cached by formula and parameters, so compiling the same \
+    formula again is free.
+
+    :param formula: Band-math formula, e.g. ``(b8 - b4) / (b8 + b4)``.
+    :type formula: str
+    :param params: Values of parameters used in the formula besides the \
+    bands, e.g. ``compile('(b8 - b4) / (b8 + b4 + L)', L=0.5)``.
+
+    :returns: Compiled formula
+    :rtype: Kernel
+
+    :raises ValueError: If the formula is not valid.
+    """
+
+    return _compile(formula, tuple(sorted(params.items())))
+
+
+def formula(name, **params):
+    """
+    Return the formula of a registered index.
+
+    :param name: Index name.
+    :type name: str
+    :param params: Values overriding the default parameters.
+
+    :returns: Band-math formula, accepted by :func:`compile`.
+    :rtype: str
+    """
+
+    return to_formula(registry.get(name).expression(**params))
+
+
+def register(name, formula, replace=False, **params):
+    """
+    Register a formula as an index, usable like the built-in ones.
+
+    The index is added to :data:`sr2vgi.registry.INDEXES`, so that it can \
+    be given to :func:`sr2vgi.compute_many`, the tiled and parallel \
+    executors and the command line. Registering a name again replaces its \
+    formula.
+
+    :param name: Index name.
+    :type name: str
+    :param formula: Band-math formula.
+    :type formula: str
+    :param replace: Whether to replace a built-in index of the same name.
+    :type replace: bool
+    :param params: Default values of parameters used in the formula.
+
+    :returns: The index function, with the options of the vgi functions.
+
+    :raises ValueError: If ``name`` is a built-in index and ``replace`` is \
+    false, or the formula is not valid.
+    """
+
+    if not replace and name in registry.INDEXES \
+            and registry.INDEXES[name].function.__module__ == _BUILTIN:
+        raise ValueError('{} is a built-in index, give replace=True to '
+                         'replace it'.format(name))
+    kernel = compile(formula, **params)
+
+    def function(*args, **kwargs):
+        return kernel.function(*args, **kwargs)
+
+    function.__name__ = function.__qualname__ = name
+    function.__signature__ = kernel.signature
+    function.__doc__ = """
+    Custom index.
+
+    .. math:: {} = {}
+
+    :returns: Index value
+    """.format(name.upper(), formula)
+    return registry.index(function)
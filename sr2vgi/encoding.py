@@ -0,0 +1,223 @@
+"""
+Integer encoding of index values.
+
+Indexes are often stored as scaled integers, e.g. NDVI as ``int16`` \
+multiplied by 10000. Index functions accept an :class:`Encoding` as \
+``encoding=`` and write the stored integers straight into the output, \
+scaling, rounding and clipping one block at a time as part of the \
+computation:
+
+.. code-block:: python
+
+    from sr2vgi import encoding, vgi
+
+    stored = vgi.ndvi(b4, b8, encoding='int16')     # NDVI * 10000
+    values = encoding.decode(stored, encoding.default((-1, 1)))
+
+Given a data type name instead of an :class:`Encoding`, an index is \
+encoded with the :func:`default` encoding of its valid range (see \
+:attr:`sr2vgi.registry.Index.valid_range`), or of :data:`FALLBACK_RANGE` \
+for the indexes without one, like ratios of bands.
+"""
+
+import collections
+import math
+
+import numpy
+
+
+# Range of the default encodings of the indexes without a valid range: a
+# thousandth of precision into int16, and room for the band ratios of
+# most pixels.
+FALLBACK_RANGE = (-30.0, 30.0)
+
+Encoding = collections.namedtuple('Encoding', ['scale', 'offset', 'dtype',
+                                               'nodata', 'clip'],
+                                  defaults=(0.0, 'int16', None, None))
+Encoding.__doc__ = """
+Linear encoding of index values: ``value = stored * scale + offset``.
+
+``dtype`` is the integer data type of the stored values. ``nodata`` is \
+stored where the value is NaN or masked out, and defaults to the lowest \
+value of a signed type or the highest of an unsigned one. Values are \
+clipped to the ``clip`` range of index values, if given, and always to \
+the range of ``dtype`` without ``nodata``.
+"""
+
+
+def default(valid_range, dtype='int16'):
+    """
+    Return an encoding of values in ``valid_range`` into ``dtype``.
+
+    The scale is the power of ten giving the most digits that fit the \
+    data type, e.g. ``0.0001`` for ``(-1, 1)`` into ``int16``.
+
+    :param valid_range: Lowest and highest index value.
+    :type valid_range: tuple
+    :param dtype: Integer data type of the stored values.
+    :type dtype: str
+
+    :returns: Encoding clipping to ``valid_range``.
+    :rtype: Encoding
+    """
+
+    dtype = _integer(dtype)
+    low, high = valid_range
+    info = numpy.iinfo(dtype)
+    # One end of the type is kept for nodata.
+    largest = max(abs(low), abs(high)) or 1
+    room = info.max if info.min else info.max - 1
+    if low < 0 and not info.min:
+        raise ValueError('Cannot encode negative values into {}'.format(
+            dtype))
+    scale = 10.0 ** math.ceil(math.log10(largest / room))
+    return Encoding(scale, 0.0, dtype.name, None, (low, high))
+
+
+def get(encoding, ranges):
+    """
+    Return the encoding of each output.
+
+    :param encoding: A single encoding, an integer data type name for the \
+    :func:`default` encodings, of :data:`FALLBACK_RANGE` for the outputs \
+    without a valid range, or encodings by output name.
+    :type encoding: Encoding or str or dict
+    :param ranges: Valid range by output name, ``None`` when unknown.
+    :type ranges: dict
+
+    :returns: Encoding by output name, for the encoded outputs only.
+    :rtype: dict
+    """
+
+    if encoding is None:
+        return {}
+    if not isinstance(encoding, dict):
+        encoding = dict.fromkeys(ranges, encoding)
+
+    result = {}
+    for name, value in encoding.items():
+        if value is None or name not in ranges:
+            continue
+        if isinstance(value, Encoding):
+            result[name] = value
+        elif isinstance(value, (str, numpy.dtype, type)):
+            result[name] = default(FALLBACK_RANGE if ranges[name] is None
+                                   else ranges[name], value)
+        else:
+            result[name] = Encoding(*value)
+    return result
+
+
+def _integer(dtype):
+    dtype = numpy.dtype(dtype)
+    if dtype.kind not in 'iu':
+        raise ValueError('Encoded values are integers, not {}'.format(dtype))
+    return dtype
+
+
+def nodata(encoding):
+    """Return the stored value of the missing values of ``encoding``."""
+
+    if encoding.nodata is not None:
+        return encoding.nodata
+    info = numpy.iinfo(_integer(encoding.dtype))
+    return info.min if info.min else info.max
+
+
+def limits(encoding):
+    """
+    Return the lowest and highest index value that ``encoding`` stores.
+
+    :param encoding: Encoding.
+    :type encoding: Encoding
+
+    :returns: Range of the index values, the ``clip`` range if any, within \
+    the range of the data type.
+    :rtype: tuple
+    """
+
+    info = numpy.iinfo(_integer(encoding.dtype))
+    low, high = info.min, info.max
+    if nodata(encoding) == low:
+        low += 1
+    elif nodata(encoding) == high:
+        high -= 1
+    low, high = sorted(stored * encoding.scale + encoding.offset
+                       for stored in (low, high))
+    if encoding.clip is not None:
+        low, high = max(low, encoding.clip[0]), min(high, encoding.clip[1])
+    return low, high
+
+
+def _encode(value, target, encoding, bounds, buffer, invalid):
+    """
+    Encode ``value`` into the integer array ``target``.
+
+    ``bounds`` are the :func:`limits` of ``encoding``, ``buffer`` and \
+    ``invalid`` floating and boolean scratch buffers of the shape of \
+    ``target``.
+    """
+
+    numpy.clip(value, *bounds, out=buffer)
+    if encoding.offset:
+        numpy.subtract(buffer, encoding.offset, out=buffer)
+    if encoding.scale != 1:
+        numpy.divide(buffer, encoding.scale, out=buffer)
+    numpy.rint(buffer, out=buffer)
+    numpy.isnan(buffer, out=invalid)
+    if invalid.any():
+        numpy.copyto(buffer, nodata(encoding), where=invalid)
+    numpy.copyto(target, buffer, casting='unsafe')
+    return target
+
+
+def encode(values, encoding, out=None):
+    """
+    Encode index values into integers.
+
+    Index functions encode while computing when given ``encoding=``, this \
+    is for values computed otherwise.
+
+    :param values: Index values.
+    :type values: numpy.ndarray
+    :param encoding: Encoding.
+    :type encoding: Encoding
+    :param out: Integer array receiving the stored values.
+    :type out: numpy.ndarray
+
+    :returns: Stored values
+    :rtype: numpy.ndarray
+    """
+
+    values = numpy.asarray(values)
+    if out is None:
+        out = numpy.empty(values.shape, _integer(encoding.dtype))
+    dtype = values.dtype if values.dtype.kind == 'f' else numpy.float64
+    return _encode(values, out, encoding, limits(encoding),
+                   numpy.empty(out.shape, dtype),
+                   numpy.empty(out.shape, bool))
+
+
+def decode(stored, encoding, dtype='float32', out=None):
+    """
+    Decode stored integers into index values, NaN where ``nodata``.
+
+    :param stored: Stored values.
+    :type stored: numpy.ndarray
+    :param encoding: Encoding of the stored values.
+    :type encoding: Encoding
+    :param dtype: Floating data type of the values.
+    :type dtype: str
+    :param out: Array receiving the values.
+    :type out: numpy.ndarray
+
+    :returns: Index values
+    :rtype: numpy.ndarray
+    """
+
+    out = numpy.multiply(stored, encoding.scale, out=out,
+                         dtype=None if out is not None else dtype)
+    if encoding.offset:
+        numpy.add(out, encoding.offset, out=out)
+    numpy.copyto(out, numpy.nan, where=numpy.equal(stored, nodata(encoding)))
+    return out
@@ -0,0 +1,291 @@
+import numbers
+import operator
+
+import numpy
+
+
+class Node:
+    """
+    Node of an index expression graph.
+
+    Nodes are built by calling an index function of :mod:`sr2vgi.vgi` \
+    with :func:`var` nodes in place of the band arrays (see :func:`trace`): \
+    the arithmetic operators and the NumPy ufuncs used by the formulas \
+    return new nodes instead of computing values.
+
+    :param op: Operation name, e.g. ``add`` or ``sqrt``. Leaves are \
+    ``var`` (a band) and ``const`` (a number).
+    :type op: str
+    :param args: Operands, nodes for operations and a name or a number \
+    for leaves.
+    :type args: tuple
+
+    Two nodes with the same :attr:`key` compute the same values, which is \
+    what :class:`sr2vgi.plan.Plan` uses to share common subexpressions.
+    """
+
+    __slots__ = ('op', 'args', 'key')
+
+    def __init__(self, op, args):
+        self.op = op
+        self.args = tuple(args)
+        self.key = (op,) + tuple(arg.key if isinstance(arg, Node) else arg
+                                 for arg in self.args)
+
+    def __repr__(self):
+        return 'Node({!r}, {!r})'.format(self.op, self.args)
+
+    def __add__(self, other):
+        return apply('add', self, other)
+
+    def __radd__(self, other):
+        return apply('add', other, self)
+
+    def __sub__(self, other):
+        return apply('sub', self, other)
+
+    def __rsub__(self, other):
+        return apply('sub', other, self)
+
+    def __mul__(self, other):
+        return apply('mul', self, other)
+
+    def __rmul__(self, other):
+        return apply('mul', other, self)
+
+    def __truediv__(self, other):
+        return apply('div', self, other)
+
+    def __rtruediv__(self, other):
+        return apply('div', other, self)
+
+    def __pow__(self, other):
+        return apply('pow', self, other)
+
+    def __rpow__(self, other):
+        return apply('pow', other, self)
+
+    def __neg__(self):
+        return apply('neg', self)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return apply('abs', self)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or kwargs or ufunc not in _UFUNC_OPS:
+            return NotImplemented
+        return apply(_UFUNC_OPS[ufunc], *inputs)
+
+    @property
+    def value(self):
+        """Value of a ``const`` node."""
+        return self.args[0]
+
+    def children(self):
+        """Operand nodes of this node."""
+        return tuple(arg for arg in self.args if isinstance(arg, Node))
+
+
+# Operation name -> (NumPy ufunc, Python operator used to fold constants)
+OPS = {
+    'add': (numpy.add, operator.add),
+    'sub': (numpy.subtract, operator.sub),
+    'mul': (numpy.multiply, operator.mul),
+    'div': (numpy.true_divide, operator.truediv),
+    'pow': (numpy.power, operator.pow),
+    'neg': (numpy.negative, operator.neg),
+    'sqrt': (numpy.sqrt, numpy.sqrt),
+    'abs': (numpy.absolute, abs),
+    'lt': (numpy.less, operator.lt),
+    'le': (numpy.less_equal, operator.le),
+    'gt': (numpy.greater, operator.gt),
+    'ge': (numpy.greater_equal, operator.ge),
+    'eq': (numpy.equal, operator.eq),
+    'ne': (numpy.not_equal, operator.ne),
+    'and': (numpy.logical_and, lambda x, y: bool(x and y)),
+    'or': (numpy.logical_or, lambda x, y: bool(x or y)),
+    'not': (numpy.logical_not, operator.not_),
+    'nd': (None, lambda x, y: (x - y) / (x + y) if x + y else float('nan')),
+}
+
+# Operations whose result is boolean.
+BOOLEAN = frozenset(['lt', 'le', 'gt', 'ge', 'eq', 'ne', 'and', 'or', 'not'])
+
+# Operations whose operands can be swapped without changing the result.
+COMMUTATIVE = frozenset(['add', 'mul', 'eq', 'ne', 'and', 'or'])
+
+_UFUNC_OPS = {ufunc: op for op, (ufunc, _) in OPS.items() if ufunc}
+
+
+def var(name):
+    """Return a leaf node standing for the band ``name``."""
+    return Node('var', (name,))
+
+
+def const(value):
+    """Return a leaf node holding the number ``value``."""
+    return Node('const', (value,))
+
+
+def wrap(value):
+    """Return ``value`` as a node, wrapping plain numbers in :func:`const`."""
+    if isinstance(value, Node):
+        return value
+    if isinstance(value, numbers.Number):
+        return const(value)
+    raise TypeError('Cannot use {!r} in an index expression'.format(value))
+
+
+def apply(op, *operands):
+    """
+    Return the node applying ``op`` to ``operands``.
+
+    Operations on constants only are folded into a new constant.
+    """
+
+    operands = tuple(wrap(operand) for operand in operands)
+    if all(operand.op == 'const' for operand in operands):
+        return const(OPS[op][1](*(operand.value for operand in operands)))
+    return Node(op, operands)
+
+
+def trace(function, bands, **params):
+    """
+    Build the expression graph of an index function.
+
+    :param function: Index function, as defined in :mod:`sr2vgi.vgi`.
+    :type function: callable
+    :param bands: Names of the band arguments of ``function``.
+    :type bands: iterable of str
+    :param params: Values of the non-band arguments.
+
+    :returns: Root of the expression graph
+    :rtype: Node
+    """
+
+    args = {band: var(band) for band in bands}
+    args.update(params)
+    return wrap(function(**args))
+
+
+def walk(roots):
+    """
+    Yield the distinct nodes reachable from ``roots``, operands first.
+
+    Nodes are distinct by :attr:`Node.key`, so a subexpression shared by \
+    several roots is yielded once.
+    """
+
+    seen = set()
+    for root in roots:
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node.key in seen:
+                continue
+            if expanded:
+                seen.add(node.key)
+                yield node
+                continue
+            stack.append((node, True))
+            for child in reversed(node.children()):
+                if child.key not in seen:
+                    stack.append((child, False))
+
+
+def _order(node):
+    return repr(node.key)
+
+
+def canonical(root, swap=True):
+    """
+    Return the canonical form of an expression graph.
+
+    Formulas written differently but computing the same values get the \
+    same :attr:`Node.key`: the operands of commutative operations are \
+    sorted, ``nd(y, x)`` becomes ``-nd(x, y)`` unless ``swap`` is false, \
+    and double negations cancel. These rewrites are exact in floating \
+    point arithmetic, so the canonical graph computes the same values bit \
+    for bit, except that swapping negates the value given to divisions by \
+    zero (see :func:`sr2vgi.fused.execute`).
+    """
+
+    done = {}
+    for node in walk([root]):
+        if node.op in ('var', 'const'):
+            done[node.key] = node
+            continue
+
+        args = [done[child.key] for child in node.args]
+        if node.op in COMMUTATIVE:
+            args.sort(key=_order)
+        if node.op == 'nd' and swap and _order(args[1]) < _order(args[0]):
+            result = Node('neg', [Node('nd', args[::-1])])
+        elif node.op == 'neg' and args[0].op == 'neg':
+            result = args[0].args[0]
+        else:
+            result = Node(node.op, args)
+        done[node.key] = result
+    return done[root.key]
+
+
+# Operation name -> (symbol, precedence) of the infix notation of formulas,
+# following Python, where & and | bind tighter than comparisons.
+_INFIX = {
+    'lt': ('<', 1), 'le': ('<=', 1), 'gt': ('>', 1), 'ge': ('>=', 1),
+    'eq': ('==', 1), 'ne': ('!=', 1),
+    'or': ('|', 2), 'and': ('&', 3),
+    'add': ('+', 4), 'sub': ('-', 4),
+    'mul': ('*', 5), 'div': ('/', 5),
+    'neg': ('-', 6), 'not': ('~', 6),
+    'pow': ('**', 7),
+}
+
+
+def to_formula(node):
+    """
+    Return the formula of an expression graph, e.g. ``(b8 - b4)/(b8 + b4)``.
+
+    The formula is valid input of :func:`sr2vgi.dsl.compile`, which builds \
+    back the same graph.
+    """
+
+    return _format(node)[0]
+
+
+def _format(node):
+    """Return the formula of ``node`` and the precedence of its operator."""
+
+    if node.op == 'var':
+        return node.args[0], 9
+    if node.op == 'const':
+        text = repr(node.value)
+        return text, 6 if text.startswith('-') else 9
+    if node.op in ('sqrt', 'abs'):
+        return '{}({})'.format(node.op, _format(node.args[0])[0]), 9
+    if node.op == 'nd':
+        return 'nd({}, {})'.format(*(_format(child)[0]
+                                     for child in node.args)), 9
+
+    symbol, precedence = _INFIX[node.op]
+    operands = [_format(child) for child in node.args]
+    if len(operands) == 1:
+        text, inner = operands[0]
+        # Python parses -x**2 as -(x**2), so a power operand needs none.
+        if inner < precedence:
+            text = '({})'.format(text)
+        return '{}{}'.format(symbol, text), precedence
+
+    (left, left_precedence), (right, right_precedence) = operands
+    # Comparisons do not chain like arithmetic, always group their operands.
+    if left_precedence < precedence or (node.op == 'pow' and
+                                        left_precedence == precedence) \
+            or (precedence == 1 and left_precedence == 1):
+        left = '({})'.format(left)
+    if right_precedence < precedence or (node.op != 'pow' and
+                                         right_precedence == precedence):
+        right = '({})'.format(right)
+    return '{} {} {}'.format(left, symbol, right), precedence
@@ -0,0 +1,536 @@
+import collections
+import tracemalloc
+
+import numpy
+
+from . import encoding as _encoding
+from . import precision as _precision
+from . import scaling as _scaling
+from .kernels import BLOCK_SIZE, _divide, _dtype, _nd
+from .plan import Plan, _apply
+
+
+# Number of columns of the tiles masked strips are cut into. Tiles without
+# any valid pixel are skipped, fully valid ones computed in place, and only
+# the valid pixels of the others are gathered and computed.
+TILE = 64
+
+# Number of blocks of rows of masked strips. Taller tiles cost fewer calls
+# per computed pixel, strips without invalid tiles are still computed one
+# block at a time.
+TALL = 4
+
+# Policies for divisions by zero, besides a fill value.
+DIVISIONS = ('nan', 'clamp')
+
+Temporaries = collections.namedtuple('Temporaries', ['plain', 'fused'])
+
+
+class _Pool:
+    """Scratch buffers of one block, reused across the steps of a plan."""
+
+    def __init__(self, size):
+        self.size = size
+        self.free = {}
+
+    def take(self, shape, dtype):
+        dtype = numpy.dtype(dtype)
+        buffers = self.free.setdefault(dtype, [])
+        flat = buffers.pop() if buffers else numpy.empty(self.size, dtype)
+        return flat, flat[:_size(shape)].reshape(shape)
+
+    def give(self, flat):
+        self.free[flat.dtype].append(flat)
+
+
+def _size(shape):
+    size = 1
+    for length in shape:
+        size *= length
+    return size
+
+
+def dtypes(values, dtype=None, precision=None):
+    """
+    Return the computation and result data types of an evaluation.
+
+    :param values: Band values.
+    :type values: iterable
+    :param dtype: Requested result data type.
+    :type dtype: numpy.dtype
+    :param precision: Precision policy of :mod:`sr2vgi.precision`.
+    :type precision: str
+
+    :returns: Computation and result data types.
+    :rtype: tuple
+    """
+
+    dtype, result_dtype = _precision.resolve(precision, dtype)
+    if dtype is None:
+        dtype = _dtype(values)
+    result_dtype = result_dtype or dtype
+    for kind in (dtype, result_dtype):
+        if kind.kind != 'f':
+            raise ValueError('Indexes are computed in a floating type, '
+                             'not {}'.format(kind))
+    return dtype, result_dtype
+
+
+def _rows(array, rows, ndim):
+    """Slice ``rows`` of the first axis of ``array``, unless broadcast."""
+    if numpy.ndim(array) == ndim and ndim and numpy.shape(array)[0] != 1:
+        return array[rows]
+    return array
+
+
+def _strips(shape, step, where):
+    """
+    Yield the strips of ``step`` rows of an evaluation, with their mask.
+
+    A strip comes with ``None`` when all its pixels are valid, and with \
+    its part of ``where`` otherwise.
+    """
+
+    ndim = len(shape)
+    for start in range(0, shape[0] if ndim else 1, step):
+        rows = slice(start, start + step)
+        if where is None:
+            yield rows, None
+            continue
+        valid = numpy.asarray(_rows(where, rows, ndim), bool)
+        yield rows, None if numpy.all(valid) else valid
+
+
+def _fill(target, keep, fill):
+    """
+    Set ``target`` to ``fill`` outside ``keep``, with bitwise operations.
+
+    ``keep`` holds all bits set on valid pixels and none elsewhere, and \
+    ``fill`` the bits of the fill value where they are not set, both as \
+    unsigned integers of the item size of ``target``. Masked copies \
+    branch on every pixel, which is several times slower on scattered \
+    masks like cloud edges.
+    """
+
+    bits = target.view(keep.dtype)
+    numpy.bitwise_and(bits, keep, out=bits)
+    numpy.bitwise_or(bits, fill, out=bits)
+
+
+def _mask(strip, fills, valid, pool):
+    """Set the arrays of ``strip`` to their fill outside ``valid``."""
+
+    masks = {}
+    for name, fill in fills.items():
+        target = strip[name]
+        kind = numpy.dtype('u{}'.format(target.dtype.itemsize))
+        if (kind, fill) not in masks:
+            keep = pool.take(valid.shape, kind)
+            put = pool.take(valid.shape, kind)
+            numpy.subtract(0, valid, out=keep[1], dtype=kind)
+            numpy.invert(keep[1], out=put[1])
+            numpy.bitwise_and(put[1], numpy.asarray(
+                fill, target.dtype).view(kind), out=put[1])
+            masks[kind, fill] = keep, put
+        keep, put = masks[kind, fill]
+        _fill(target, keep[1], put[1])
+    for keep, put in masks.values():
+        pool.give(keep[0])
+        pool.give(put[0])
+
+
+def _tiles(valid, size):
+    """
+    Return the column ranges of a masked strip by their valid pixels.
+
+    The strip is cut into tiles of ``size`` columns along its last axis, \
+    and consecutive tiles alike are merged into ranges.
+
+    :returns: Fully valid, partly valid and invalid ranges.
+    :rtype: tuple of list
+    """
+
+    axes = tuple(range(valid.ndim - 1))
+    starts = numpy.arange(0, valid.shape[-1], size)
+    kinds = numpy.logical_or.reduceat(valid.any(axis=axes), starts) \
+        .astype(numpy.int8)
+    kinds += numpy.logical_and.reduceat(valid.all(axis=axes), starts)
+    edges = numpy.flatnonzero(kinds[1:] != kinds[:-1]) + 1
+    bounds = [0, *edges.tolist(), len(starts)]
+    columns = [*starts.tolist(), valid.shape[-1]]
+    ranges = [], [], []
+    for start, stop in zip(bounds, bounds[1:]):
+        ranges[2 - kinds[start]].append(slice(columns[start], columns[stop]))
+    return ranges
+
+
+def _split(array, columns):
+    """
+    Return the parts of ``array`` in ``columns``, ranges of its last axis.
+
+    Scalars and arrays broadcast along the last axis are their own parts.
+    """
+
+    if not numpy.ndim(array) or numpy.shape(array)[-1] == 1:
+        return [array] * len(columns)
+    return [array[..., part] for part in columns]
+
+
+def _broadcast(array, shape):
+    """Return ``array`` broadcast to ``shape``, as is if already of it."""
+    if array.shape == shape:
+        return array
+    return numpy.broadcast_to(array, shape)
+
+
+def _segments(flat, shapes):
+    """Cut ``flat`` into consecutive arrays of ``shapes``."""
+
+    parts = []
+    start = 0
+    for shape in shapes:
+        stop = start + _size(shape)
+        parts.append(flat[start:stop].reshape(shape))
+        start = stop
+    return parts
+
+
+def execute(plan, bands, out=None, dtype=None, precision=None, scaling=None,
+            where=None, fill_value=None, divide=None, encoding=None,
+            block_size=BLOCK_SIZE):
+    """
+    Evaluate a plan block by block with in-place ufunc calls.
+
+    The arrays are walked in blocks of about ``block_size`` elements along \
+    their first axis. Within a block every step writes into a scratch \
+    buffer taken from a small pool, or in place into an operand read for \
+    the last time, and outputs are written straight into ``out``. Besides \
+    the inputs and outputs, memory use is a few blocks, whatever the size \
+    of the arrays.
+
+    Outputs of the same expression, like equivalent indexes, are computed \
+    once. Those missing from ``out`` are returned as read-only views of \
+    the first one.
+
+    :param plan: Evaluation plan.
+    :type plan: sr2vgi.plan.Plan
+    :param bands: Band arrays by name.
+    :type bands: dict
+    :param out: Output arrays by output name. Missing outputs are allocated.
+    :type out: dict
+    :param dtype: Floating data type of the allocated outputs, and of the \
+    computation unless ``precision`` says otherwise. Defaults to the type \
+    of the floating bands, or ``float64``.
+    :type dtype: numpy.dtype
+    :param precision: Precision policy of :mod:`sr2vgi.precision`, \
+    defaults to the global one.
+    :type precision: str
+    :param scaling: Decoding of the bands given as digital numbers, e.g. \
+    :data:`sr2vgi.scaling.SENTINEL2_L2A`. Bands are decoded one block at a \
+    time into a scratch buffer.
+    :type scaling: sr2vgi.scaling.Scaling or str or dict
+    :param where: Valid pixels. Masked arrays are walked in strips of \
+    :data:`TALL` blocks cut into tiles of :data:`TILE` columns: tiles \
+    without any valid pixel are neither read nor computed, fully valid \
+    ones are computed in place, and only the valid pixels of the others \
+    are gathered and computed. Invalid pixels are set to ``fill_value``.
+    :type where: numpy.ndarray
+    :param fill_value: Value of the pixels outside ``where``, defaults to \
+    NaN, and ``False`` for boolean outputs.
+    :type fill_value: float
+    :param divide: Result of the divisions by zero, ``nan``, ``clamp`` for \
+    the largest finite value with the sign of the numerator (0 for 0/0), \
+    or a fill value. Applied by the division steps themselves, without \
+    floating point warnings. Defaults to the IEEE results, with warnings, \
+    and NaN for normalized differences.
+    :type divide: str or float
+    :param encoding: Integer encoding of the outputs, a single one or by \
+    output name (see :mod:`sr2vgi.encoding`). Encoded outputs are scaled, \
+    rounded and clipped block by block into integer arrays, with \
+    ``nodata`` where the value is NaN and outside ``where``.
+    :type encoding: sr2vgi.encoding.Encoding or dict
+    :param block_size: Number of elements evaluated at a time.
+    :type block_size: int
+
+    :returns: Output values by name.
+    :rtype: dict
+    """
+
+    if isinstance(divide, str) and divide not in DIVISIONS:
+        raise ValueError('Unknown division policy {!r}, expected a number or '
+                         'one of {}'.format(divide, ', '.join(DIVISIONS)))
+    if divide == 'nan':
+        divide = numpy.nan
+    elif divide is not None and plan.swap:
+        # Computed as -nd(y, x), nd(x, y) would get the opposite fill value,
+        # -0.0 for 0 and clamp.
+        plan = plan.unswapped()
+
+    inputs = {band: bands[band] for band in plan.bands}
+    scalings = _scaling.get(scaling, plan.bands)
+    out = dict(out or {})
+
+    dtype, result_dtype = dtypes(inputs.values(), dtype, precision)
+    bool_ = numpy.dtype(bool)
+    encodings = _encoding.get(encoding, {
+        name: None for name, root in plan.outputs.items()
+        if root.key not in plan.boolean})
+
+    arrays = list(inputs.values()) + list(out.values())
+    if where is not None:
+        arrays.append(where)
+    shape = numpy.broadcast_shapes(*(numpy.shape(value) for value in arrays))
+
+    # Outputs sharing the same expression are computed once: into the
+    # first of their arrays, copied or encoded into the others given in
+    # ``out``, and returned as read-only views of one with the same
+    # encoding otherwise.
+    targets = {}
+    for name, root in plan.outputs.items():
+        targets.setdefault(root.key, []).append(name)
+    views = {}
+    for key, names in targets.items():
+        given = [name for name in names if name in out]
+        for name in names:
+            if name in out:
+                continue
+            for source in given:
+                if encodings.get(source) == encodings.get(name):
+                    views[name] = source
+                    break
+            else:
+                out[name] = numpy.empty(
+                    shape, bool if key in plan.boolean else
+                    encodings[name].dtype if name in encodings
+                    else result_dtype)
+                given.append(name)
+        targets[key] = given
+    bounds = {name: _encoding.limits(value)
+              for name, value in encodings.items()}
+
+    ndim = len(shape)
+    row_size = _size(shape[1:])
+    step = max(1, min(block_size // max(row_size, 1),
+                      shape[0] if ndim else 1))
+    tall = step if where is None else \
+        max(1, min(step * TALL, shape[0] if ndim else 1))
+    pool = _Pool(tall * row_size)
+
+    fills = {name: False if out[name].dtype == bool_ else
+             numpy.nan if fill_value is None else fill_value
+             for names in targets.values() for name in names}
+    for name, value in encodings.items():
+        if name in fills:
+            fills[name] = _encoding.nodata(value) if fill_value is None \
+                else _encoding.encode(fill_value, value)[()]
+
+    # Operands of the steps, with constants already converted.
+    steps = [(node, node.children(), [
+        (None, dtype.type(child.value)) if child.op == 'const'
+        else (child.key, None) for child in node.args])
+        for node in plan.steps]
+
+    def evaluate(inputs, strip):
+        """
+        Evaluate the plan on ``inputs`` into the arrays of ``strip``.
+
+        Both hold lists of parts, like a whole strip, column ranges of a \
+        strip or packed pixels, evaluated together. Scratch buffers are \
+        cut into parts of the shapes of those of the outputs.
+        """
+
+        shapes = [numpy.shape(part) for part in next(iter(strip.values()))]
+        count = len(shapes)
+
+        def scratch(kind):
+            flat, _ = pool.take((sum(map(_size, shapes)),), kind)
+            return flat, _segments(flat, shapes)
+
+        values = {}
+        owned = {}
+        written = set()
+        remaining = dict(plan.uses)
+
+        for band, parts in inputs.items():
+            decoding = scalings.get(band)
+            if not numpy.ndim(parts[0]):
+                if decoding:
+                    parts = [part * decoding.scale + decoding.offset
+                             for part in parts]
+            elif decoding or parts[0].dtype != dtype:
+                flat, buffers = scratch(dtype)
+                for part, buffer in zip(parts, buffers):
+                    if decoding:
+                        numpy.multiply(part, decoding.scale, out=buffer,
+                                       dtype=dtype)
+                        numpy.add(buffer, decoding.offset, out=buffer)
+                    else:
+                        numpy.copyto(buffer, part, casting='unsafe')
+                owned[('var', band)] = flat
+                parts = buffers
+            values[('var', band)] = parts
+
+        for node, children, args in steps:
+            operands = [values[key] if key else [value] * count
+                        for key, value in args]
+
+            kind = bool_ if node.key in plan.boolean else dtype
+            names = targets.get(node.key)
+            if names and names[0] not in encodings \
+                    and strip[names[0]][0].dtype == kind:
+                target = strip[names[0]]
+                written.add(node.key)
+            else:
+                for child in children:
+                    if remaining[child.key] == 1 and child.key in owned \
+                            and values[child.key][0].dtype == kind:
+                        owned[node.key] = owned.pop(child.key)
+                        target = values[child.key]
+                        break
+                else:
+                    owned[node.key], target = scratch(kind)
+
+            if node.op == 'nd' or node.op == 'div' and divide is not None:
+                # Denominator and its zero mask only live for this step.
+                flat, denominators = scratch(dtype)
+                mask, zeros = scratch(bool_)
+                for x, y, result, denominator, zero in zip(
+                        *operands, target, denominators, zeros):
+                    if node.op == 'nd':
+                        _nd(x, y, result, denominator, zero,
+                            numpy.nan if divide is None else divide)
+                    else:
+                        _divide(x, y, result, zero, denominator, divide)
+                pool.give(flat)
+                pool.give(mask)
+            else:
+                for parts in zip(*operands, target):
+                    _apply(node, parts[:-1], out=parts[-1])
+            values[node.key] = target
+
+            for child in children:
+                remaining[child.key] -= 1
+                if not remaining[child.key] and child.key in owned:
+                    pool.give(owned.pop(child.key))
+
+        for key, names in targets.items():
+            parts = values[key] if key[0] != 'const' else [key[1]] * count
+            for name in names[1 if key in written else 0:]:
+                if name not in encodings:
+                    for part, target in zip(parts, strip[name]):
+                        numpy.copyto(target, part, casting='same_kind')
+                    continue
+                flat, buffers = scratch(dtype)
+                mask, invalids = scratch(bool_)
+                for part, target, buffer, invalid in zip(
+                        parts, strip[name], buffers, invalids):
+                    _encoding._encode(part, target, encodings[name],
+                                      bounds[name], buffer, invalid)
+                pool.give(flat)
+                pool.give(mask)
+
+        for flat in owned.values():
+            pool.give(flat)
+
+    def blocks(inputs, strip):
+        """Evaluate ``inputs`` into ``strip`` one block of rows at a time."""
+        for start in range(0, tall, step):
+            rows = slice(start, start + step)
+            evaluate({band: [_rows(value, rows, ndim)]
+                      for band, value in inputs.items()},
+                     {name: [_rows(target, rows, ndim)]
+                      for name, target in strip.items()})
+
+    for rows, valid in _strips(shape, tall, where):
+        strip = {name: _rows(out[name], rows, ndim) for name in fills}
+        inputs_strip = {band: _rows(value, rows, ndim)
+                        for band, value in inputs.items()}
+        if valid is None:
+            blocks(inputs_strip, strip)
+            continue
+
+        valid = numpy.broadcast_to(valid, next(iter(strip.values())).shape)
+        if not numpy.any(valid):
+            for name, fill in fills.items():
+                strip[name][...] = fill
+            continue
+
+        full, mixed, empty = _tiles(valid, TILE)
+        if not empty:
+            blocks(inputs_strip, strip)
+            if mixed:
+                _mask(strip, fills, valid, pool)
+            continue
+
+        # Tiles without valid pixels are filled, fully valid ones computed
+        # in place, and only the valid pixels of the others are gathered,
+        # computed and scattered back, all in a single evaluation.
+        keeps = [valid[..., part] for part in mixed]
+        counts = [(numpy.count_nonzero(keep),) for keep in keeps]
+        packed = {name: pool.take((sum(map(_size, counts)),), target.dtype)
+                  for name, target in strip.items()}
+        evaluate({band: _split(value, full) + [
+                  value if not numpy.ndim(value) else _broadcast(
+                      value, valid.shape)[..., part][keep]
+                  for part, keep in zip(mixed, keeps)]
+                  for band, value in inputs_strip.items()},
+                 {name: _split(target, full)
+                  + _segments(packed[name][0], counts)
+                  for name, target in strip.items()})
+        for name, fill in fills.items():
+            for part in empty:
+                strip[name][..., part] = fill
+            start = 0
+            for part, keep, (size,) in zip(mixed, keeps, counts):
+                target = strip[name][..., part]
+                target[...] = fill
+                target[keep] = packed[name][0][start:start + size]
+                start += size
+            pool.give(packed[name][0])
+
+    for name, source in views.items():
+        out[name] = out[source].view()
+        out[name].flags.writeable = False
+    return {name: out[name] for name in plan.outputs}
+
+
+def measure_temporaries(index, bands, **params):
+    """
+    Measure the temporary memory allocated to compute an index.
+
+    The index is computed twice, with its function and with \
+    :func:`execute`, while :mod:`tracemalloc` records the peak of \
+    allocated memory. The output array is not counted.
+
+    :param index: Index to measure, e.g. ``sr2vgi.registry.get('evi')``.
+    :type index: sr2vgi.registry.Index
+    :param bands: Band arrays by name.
+    :type bands: dict
+    :param params: Values overriding the default parameters.
+
+    :returns: Bytes of temporaries of the plain and of the fused evaluation.
+    :rtype: Temporaries
+    """
+
+    plan = Plan({index.name: index.expression(**params)})
+    out = {index.name: numpy.empty(numpy.broadcast_shapes(
+        *(numpy.shape(bands[band]) for band in plan.bands)),
+        _dtype([bands[band] for band in plan.bands]))}
+
+    def peak(function):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            result = function()
+            return tracemalloc.get_traced_memory()[1] - before, result
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    plain, result = peak(lambda: index(bands, **params))
+    plain -= numpy.asarray(result).nbytes
+    fused, _ = peak(lambda: execute(plan, bands, out=out))
+    return Temporaries(max(plain, 0), fused)
@@ -0,0 +1,257 @@
+"""
+Runtime statistics of the index functions.
+
+Instrumentation is off by default, and then costs each call a single \
+test, about 0.03 microseconds. Within :func:`record`, or between \
+:func:`enable` and :func:`disable`, each call of a function of \
+:mod:`sr2vgi.vgi` (or of an :class:`sr2vgi.registry.Index`) is timed and \
+its result inspected:
+
+.. code-block:: python
+
+    from sr2vgi import instrument, vgi
+
+    with instrument.record(memory=True) as recorder:
+        for tile in tiles:
+            vgi.ndvi(tile['b4'], tile['b8'])
+            vgi.evi(tile['b2'], tile['b4'], tile['b8'])
+    print(recorder.summary())
+    recorder.dump('indexes.json')
+
+So is each evaluation of :meth:`sr2vgi.registry.Index.compute` and \
+:func:`sr2vgi.registry.compute_many`, which the tiled, parallel, cube, \
+composite and file executors and the command line run block by block: \
+their ``calls`` count blocks. Indexes computed together share their \
+operations, so each index of a batch gets an equal share of its time \
+and memory.
+"""
+
+import collections
+import contextlib
+import json
+import threading
+import time
+import tracemalloc
+
+import numpy
+
+
+Stats = collections.namedtuple('Stats', ['calls', 'seconds', 'pixels',
+                                         'allocated', 'nan', 'inf'])
+Stats.__doc__ = """
+Statistics of an index: number of ``calls``, wall time in ``seconds``, \
+``pixels`` computed, peak of ``allocated`` bytes summed over the calls \
+(``None`` unless recorded), and counts of ``nan`` and ``inf`` values of \
+the results (``None`` unless inspected).
+"""
+
+_recorder = None
+
+
+class Recorder:
+    """
+    Statistics of the index calls, by index name.
+
+    :param memory: Whether to trace the memory allocated by each call \
+    with :mod:`tracemalloc`, which slows the calls down.
+    :type memory: bool
+    :param values: Whether to count the NaN and infinite values of the \
+    results, a pass over each result.
+    :type values: bool
+    """
+
+    def __init__(self, memory=False, values=True):
+        self.memory = memory
+        self.values = values
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._traced = False
+
+    def __repr__(self):
+        return 'Recorder(indexes={})'.format(sorted(self.stats))
+
+    def call(self, name, function, args, kwargs):
+        """
+        Call ``function`` and record its statistics under ``name``.
+
+        ``name`` may be a list of the index names of a batch, whose \
+        ``function`` returns results by name: each index gets its own \
+        pixels and values, and an equal share of the time and memory.
+        """
+
+        traced = self.memory and not tracemalloc.is_tracing()
+        if self.memory:
+            if traced:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        try:
+            started = time.perf_counter()
+            result = function(*args, **kwargs)
+            seconds = time.perf_counter() - started
+            allocated = tracemalloc.get_traced_memory()[1] - before \
+                if self.memory else None
+        finally:
+            if traced:
+                tracemalloc.stop()
+
+        results = {name: result} if isinstance(name, str) \
+            else {key: result[key] for key in name}
+        share = 1 / len(results)
+        for key, value in results.items():
+            nan = inf = None
+            if self.values:
+                nan = inf = 0
+                if numpy.asarray(value).dtype.kind in 'fc':
+                    nan = int(numpy.count_nonzero(numpy.isnan(value)))
+                    inf = int(numpy.count_nonzero(numpy.isinf(value)))
+            self.add(key, Stats(1, seconds * share, int(numpy.size(value)),
+                                None if allocated is None
+                                else int(allocated * share), nan, inf))
+        return result
+
+    def add(self, name, stats):
+        """Add statistics to those of ``name``."""
+
+        with self._lock:
+            if name in self.stats:
+                stats = Stats(*(_add(total, value) for total, value
+                                in zip(self.stats[name], stats)))
+            self.stats[name] = stats
+
+    def clear(self):
+        """Forget the statistics recorded."""
+        with self._lock:
+            self.stats.clear()
+
+    def to_dict(self):
+        """
+        Return the statistics as plain values, e.g. for JSON.
+
+        :returns: Fields of :class:`Stats` and ``pixels_per_second`` by \
+        index name, the most expensive index first.
+        :rtype: dict
+        """
+
+        result = {}
+        for name, stats in sorted(self.stats.items(),
+                                  key=lambda item: -item[1].seconds):
+            result[name] = dict(stats._asdict(), pixels_per_second=(
+                stats.pixels / stats.seconds if stats.seconds else None))
+        return result
+
+    def dump(self, file):
+        """
+        Write the statistics as JSON (see :meth:`to_dict`).
+
+        :param file: Path or open text file.
+        :type file: str or file
+        """
+
+        if isinstance(file, str):
+            with open(file, 'w') as opened:
+                return self.dump(opened)
+        json.dump(self.to_dict(), file, indent=1)
+
+    def summary(self):
+        """
+        Return a table of the statistics, the most expensive index first.
+
+        :rtype: str
+        """
+
+        total = sum(stats.seconds for stats in self.stats.values()) or 1
+        lines = ['{:<16} {:>7} {:>10} {:>6} {:>13} {:>10} {:>10} {:>9} '
+                 '{:>9}'.format('index', 'calls', 'seconds', '%', 'pixels',
+                                'Mpixels/s', 'allocated', 'nan', 'inf')]
+        for name, stats in self.to_dict().items():
+            lines.append(
+                '{:<16} {:>7} {:>10.4f} {:>6.1f} {:>13} {:>10} {:>10} '
+                '{:>9} {:>9}'.format(
+                    name, stats['calls'], stats['seconds'],
+                    100 * stats['seconds'] / total, stats['pixels'],
+                    _optional(stats['pixels_per_second'], 1e6, '{:.1f}'),
+                    _optional(stats['allocated'], 2 ** 20, '{:.1f}MB'),
+                    _optional(stats['nan']), _optional(stats['inf'])))
+        return '\n'.join(lines)
+
+
+def _add(total, value):
+    return None if total is None or value is None else total + value
+
+
+def _optional(value, unit=1, form='{}'):
+    return '-' if value is None else form.format(value / unit if unit != 1
+                                                 else value)
+
+
+def active():
+    """Return the :class:`Recorder` in use, ``None`` if disabled."""
+    return _recorder
+
+
+def enable(memory=False, values=True):
+    """
+    Record the index calls until :func:`disable`.
+
+    :param memory: See :class:`Recorder`. Memory is then traced until \
+    :func:`disable`, so that calls from several threads share a session.
+    :type memory: bool
+    :param values: See :class:`Recorder`.
+    :type values: bool
+
+    :returns: The new recorder.
+    :rtype: Recorder
+    """
+
+    global _recorder
+    _recorder = Recorder(memory, values)
+    _recorder._traced = memory and not tracemalloc.is_tracing()
+    if _recorder._traced:
+        tracemalloc.start()
+    return _recorder
+
+
+def disable():
+    """
+    Stop recording the index calls.
+
+    :returns: The recorder that was in use, if any.
+    :rtype: Recorder
+    """
+
+    global _recorder
+    recorder, _recorder = _recorder, None
+    _stop(recorder)
+    return recorder
+
+
+def _stop(recorder):
+    """Stop the memory tracing started for ``recorder``, if any."""
+    if recorder is not None and recorder._traced:
+        recorder._traced = False
+        tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def record(memory=False, values=True):
+    """
+    Record the index calls within a ``with`` block.
+
+    :param memory: See :class:`Recorder`.
+    :type memory: bool
+    :param values: See :class:`Recorder`.
+    :type values: bool
+
+    :returns: The recorder, which keeps its statistics after the block.
+    :rtype: Recorder
+    """
+
+    global _recorder
+    previous = _recorder
+    recorder = enable(memory, values)
+    try:
+        yield recorder
+    finally:
+        _stop(recorder)
+        _recorder = previous
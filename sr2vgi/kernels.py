@@ -0,0 +1,181 @@
+import numpy
+
+from .expr import Node, apply
+
+
+# Number of elements evaluated at a time. Scratch buffers hold one block,
+# small enough to stay in cache and negligible next to full-size arrays.
+BLOCK_SIZE = 65536
+
+
+def _dtype(values):
+    """Floating data type in which the given values are computed."""
+    result = None
+    for value in values:
+        if isinstance(value, (int, float)):
+            continue
+        dtype = value.dtype if hasattr(value, 'dtype') \
+            else numpy.asarray(value).dtype
+        if dtype.kind not in 'fc':
+            dtype = numpy.dtype('float64')
+        if result is None or result != dtype:
+            result = dtype if result is None else numpy.result_type(
+                result, dtype)
+    return numpy.dtype('float64') if result is None else result
+
+
+def _divide(x, y, out, zero, scratch, divide):
+    """
+    Write ``x / y`` into ``out``, following the ``divide`` policy where y is 0.
+
+    ``divide`` is ``clamp`` or a fill value (see \
+    :func:`sr2vgi.fused.execute`). ``zero`` and ``scratch`` are scratch \
+    buffers of the shape of ``out``, ``scratch`` may be ``y`` and ``out`` \
+    may be ``x`` or ``y``. Zero denominators are replaced by ones before \
+    dividing, so no floating point warning is raised, and blocks without \
+    any are divided as is.
+    """
+
+    numpy.equal(y, 0, out=zero)
+    if not zero.any():
+        return numpy.divide(x, y, out=out)
+
+    # Where y is zero, out gets x, whose sign is what clamp needs.
+    numpy.add(y, zero, out=scratch)
+    numpy.divide(x, scratch, out=out)
+    if divide == 'clamp':
+        numpy.sign(out, out=scratch)
+        numpy.multiply(scratch, numpy.finfo(out.dtype).max, out=scratch)
+        numpy.copyto(out, scratch, where=zero)
+    else:
+        numpy.copyto(out, divide, where=zero)
+    return out
+
+
+def _plain(value):
+    """Whether ``value`` is computed by its own operators, not by blocks."""
+    return isinstance(value, numpy.ma.MaskedArray) or not isinstance(
+        value, (numpy.ndarray, numpy.generic, int, float))
+
+
+def _nd(x, y, out, denominator, zero, fill_value):
+    """
+    Write ``(x - y) / (x + y)`` into ``out``, ``fill_value`` where x + y is 0.
+
+    ``denominator`` and ``zero`` are scratch buffers of the shape of \
+    ``out``. ``out`` may be ``x`` or ``y``. ``fill_value`` may also be \
+    ``clamp``, see :func:`_divide`.
+    """
+
+    numpy.add(x, y, out=denominator, dtype=denominator.dtype)
+    numpy.subtract(x, y, out=out, dtype=out.dtype)
+    return _divide(out, denominator, out, zero, denominator, fill_value)
+
+
+def normalized_difference(x, y, out=None, fill_value=numpy.nan):
+    """
+    Normalized difference of two bands.
+
+    .. math:: ND = (x - y)/(x + y)
+
+    Computed in one pass over block-sized scratch buffers, with a single \
+    output allocation, and ``fill_value`` instead of a floating point \
+    warning where ``x + y`` is zero. Scalars and inputs of at most one \
+    block are computed directly. Called with expression nodes (see \
+    :mod:`sr2vgi.expr`) it returns an ``nd`` node. Masked arrays and other \
+    array types are computed with their own operators, so they keep their \
+    mask, and ``out`` and ``fill_value`` are ignored.
+
+    :param x: First band.
+    :type x: numpy.ndarray or float
+    :param y: Second band.
+    :type y: numpy.ndarray or float
+    :param out: Array receiving the index value.
+    :type out: numpy.ndarray
+    :param fill_value: Value where ``x + y`` is zero, or ``clamp`` for the \
+    largest finite value with the sign of ``x - y``.
+    :type fill_value: float or str
+
+    :returns ND: Index value
+    """
+
+    if isinstance(x, Node) or isinstance(y, Node):
+        return apply('nd', x, y)
+
+    if _plain(x) or _plain(y):
+        # Masked and other array types keep their own arithmetic.
+        return (x - y) / (x + y)
+
+    if not getattr(x, 'ndim', 0) and not getattr(y, 'ndim', 0):
+        if not isinstance(x, float) or not isinstance(y, float):
+            dtype = _dtype([x, y])
+            x, y = dtype.type(x), dtype.type(y)
+        total = x + y
+        if total != 0:
+            value = (x - y) / total
+        else:
+            dtype = _dtype([x, y])
+            value = numpy.sign(x - y) * numpy.finfo(dtype).max \
+                if fill_value == 'clamp' else dtype.type(fill_value)
+        if out is None:
+            return value
+        out[...] = value
+        return out
+
+    dtype = _dtype([x, y])
+    if max(getattr(x, 'size', 1), getattr(y, 'size', 1)) <= BLOCK_SIZE:
+        # A single block, whose sum is the only temporary.
+        total = numpy.add(x, y, dtype=dtype)
+        out = numpy.subtract(x, y, out=out, dtype=dtype)
+        if numpy.count_nonzero(total) == total.size:
+            return numpy.divide(out, total, out=out)
+        return _divide(out, total, out, total == 0, total, fill_value)
+
+    from .fused import _rows
+
+    shape = numpy.broadcast_shapes(numpy.shape(x), numpy.shape(y))
+    if out is None:
+        out = numpy.empty(shape, dtype)
+    ndim = len(shape)
+    row_size = max(int(numpy.prod(shape[1:])), 1)
+    step = min(max(1, BLOCK_SIZE // row_size), shape[0])
+    denominator = numpy.empty(step * row_size, dtype)
+    zero = numpy.empty(step * row_size, bool)
+
+    for start in range(0, shape[0], step):
+        rows = slice(start, start + step)
+        target = _rows(out, rows, ndim)
+        size = target.size
+        _nd(_rows(x, rows, ndim), _rows(y, rows, ndim), target,
+            denominator[:size].reshape(target.shape),
+            zero[:size].reshape(target.shape), fill_value)
+    return out
+
+
+def normalized_differences(bands, pairs, out=None, **options):
+    """
+    Compute many normalized differences in a single sweep over the bands.
+
+    All the pairs are evaluated block by block together, so each block of \
+    every band is read from memory once whatever the number of pairs.
+
+    :param bands: Band arrays by name.
+    :type bands: dict
+    :param pairs: ``(x, y)`` band names by output name, e.g. \
+    ``{'ndvi': ('b8', 'b4'), 'nbr': ('b8', 'b12')}``.
+    :type pairs: dict
+    :param out: Output arrays by output name. Missing ones are allocated.
+    :type out: dict
+    :param options: Options of :func:`sr2vgi.fused.execute`.
+
+    :returns: Normalized differences by output name.
+    :rtype: dict
+    """
+
+    from .expr import var
+    from .fused import execute
+    from .plan import Plan
+
+    plan = Plan({name: apply('nd', var(x), var(y))
+                 for name, (x, y) in pairs.items()})
+    return execute(plan, bands, out=out, **options)
@@ -0,0 +1,238 @@
+"""
+Deferred evaluation of indexes.
+
+Every index of :mod:`sr2vgi.vgi` is available here under the same name, \
+returning a :class:`Lazy` expression instead of an array:
+
+.. code-block:: python
+
+    from sr2vgi import lazy
+
+    dnbr = lazy.nbr(pre_b8, pre_b12) - lazy.nbr(post_b8, post_b12)
+    burnt = (dnbr > 0.27) & (lazy.mndwi(post_b3, post_b11) < 0)
+    burnt.compute(out=mask)
+
+Nothing is computed until :meth:`Lazy.compute`, which evaluates the whole \
+expression at once, block by block, without materializing the \
+intermediate indexes.
+"""
+
+import numbers
+
+import numpy
+
+from . import registry, vgi  # noqa: F401, vgi fills the registry
+from .expr import _UFUNC_OPS, apply, var, wrap
+from .fused import execute
+from .plan import Plan
+
+
+class Lazy:
+    """
+    Index expression evaluated on demand.
+
+    :param node: Expression graph.
+    :type node: sr2vgi.expr.Node
+    :param bindings: Arrays of the ``var`` leaves of ``node``, by name.
+    :type bindings: dict
+    """
+
+    def __init__(self, node, bindings):
+        self.node = node
+        self.bindings = bindings
+
+    def __repr__(self):
+        return 'Lazy({!r})'.format(self.node)
+
+    def _combine(self, op, *operands):
+        bindings = dict(self.bindings)
+        nodes = []
+        for operand in operands:
+            operand = lift(operand)
+            if isinstance(operand, Lazy):
+                bindings.update(operand.bindings)
+                operand = operand.node
+            nodes.append(operand)
+        return Lazy(apply(op, *nodes), bindings)
+
+    def __add__(self, other):
+        return self._combine('add', self, other)
+
+    def __radd__(self, other):
+        return self._combine('add', other, self)
+
+    def __sub__(self, other):
+        return self._combine('sub', self, other)
+
+    def __rsub__(self, other):
+        return self._combine('sub', other, self)
+
+    def __mul__(self, other):
+        return self._combine('mul', self, other)
+
+    def __rmul__(self, other):
+        return self._combine('mul', other, self)
+
+    def __truediv__(self, other):
+        return self._combine('div', self, other)
+
+    def __rtruediv__(self, other):
+        return self._combine('div', other, self)
+
+    def __pow__(self, other):
+        return self._combine('pow', self, other)
+
+    def __rpow__(self, other):
+        return self._combine('pow', other, self)
+
+    def __neg__(self):
+        return self._combine('neg', self)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return self._combine('abs', self)
+
+    def __lt__(self, other):
+        return self._combine('lt', self, other)
+
+    def __le__(self, other):
+        return self._combine('le', self, other)
+
+    def __gt__(self, other):
+        return self._combine('gt', self, other)
+
+    def __ge__(self, other):
+        return self._combine('ge', self, other)
+
+    def __eq__(self, other):
+        return self._combine('eq', self, other)
+
+    def __ne__(self, other):
+        return self._combine('ne', self, other)
+
+    def __and__(self, other):
+        return self._combine('and', self, other)
+
+    def __rand__(self, other):
+        return self._combine('and', other, self)
+
+    def __or__(self, other):
+        return self._combine('or', self, other)
+
+    def __ror__(self, other):
+        return self._combine('or', other, self)
+
+    def __invert__(self):
+        return self._combine('not', self)
+
+    __hash__ = None
+
+    def __bool__(self):
+        raise TypeError('The truth value of a lazy expression is unknown '
+                        'until it is computed')
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or kwargs or ufunc not in _UFUNC_OPS:
+            return NotImplemented
+        return self._combine(_UFUNC_OPS[ufunc], *inputs)
+
+    def __array__(self, dtype=None, copy=None):
+        result = numpy.asarray(self.compute())
+        return result if dtype is None else result.astype(dtype)
+
+    def compute(self, out=None, dtype=None, precision=None, scaling=None,
+                where=None, fill_value=None, divide=None,
+                encoding=None):
+        """
+        Evaluate the expression.
+
+        :param out: Array receiving the values.
+        :type out: numpy.ndarray
+        :param dtype: Floating data type of the result, and of the \
+        computation unless ``precision`` says otherwise.
+        :type dtype: numpy.dtype
+        :param precision: Precision policy of :mod:`sr2vgi.precision`.
+        :type precision: str
+        :param scaling: Decoding of bands given as digital numbers, a single \
+        one or by band name (see :mod:`sr2vgi.scaling`).
+        :type scaling: sr2vgi.scaling.Scaling or str or dict
+        :param where: Valid pixels, the others are not computed.
+        :type where: numpy.ndarray
+        :param fill_value: Value of the pixels outside ``where``, defaults \
+        to NaN.
+        :type fill_value: float
+        :param divide: Result of the divisions by zero, ``nan``, ``clamp`` \
+        or a fill value (see :func:`sr2vgi.fused.execute`).
+        :type divide: str or float
+        :param encoding: Integer encoding of the result (see \
+        :mod:`sr2vgi.encoding`).
+        :type encoding: sr2vgi.encoding.Encoding
+
+        :returns: Values of the expression
+        :rtype: numpy.ndarray
+        """
+
+        if isinstance(scaling, dict):
+            scaling = {name: scaling.get(name.split('#')[0])
+                       for name in self.bindings}
+
+        result = execute(Plan({'result': self.node}), self.bindings,
+                         out=None if out is None else {'result': out},
+                         dtype=dtype, precision=precision,
+                         scaling=scaling, where=where,
+                         fill_value=fill_value, divide=divide,
+                         encoding=encoding)['result']
+        if out is None and not result.ndim:
+            return result[()]
+        return result
+
+
+def lift(value, name='x'):
+    """
+    Return ``value`` usable in a lazy expression.
+
+    Arrays become :class:`Lazy` leaves named after ``name`` and the array \
+    identity, so the same array used twice is read once. Numbers are kept.
+    """
+
+    if isinstance(value, (Lazy, numbers.Number)):
+        return value
+    key = '{}#{}'.format(name, id(value))
+    return Lazy(var(key), {key: value})
+
+
+def _lazy(spec):
+    def function(*args, **kwargs):
+        arguments = spec.signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+
+        values = dict(arguments.arguments)
+        bindings = {}
+        for band in spec.bands:
+            leaf = lift(values[band], band)
+            if isinstance(leaf, Lazy):
+                bindings.update(leaf.bindings)
+                values[band] = leaf.node
+        return Lazy(wrap(spec.function(**values)), bindings)
+
+    function.__name__ = spec.name
+    function.__qualname__ = spec.name
+    function.__signature__ = spec.signature
+    function.__doc__ = 'Lazy version of :func:`sr2vgi.vgi.{}`.'.format(
+        spec.name)
+    return function
+
+
+def __getattr__(name):
+    if name in registry.INDEXES:
+        function = _lazy(registry.INDEXES[name])
+        globals()[name] = function
+        return function
+    raise AttributeError('module {!r} has no attribute {!r}'.format(
+        __name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(registry.INDEXES))
@@ -0,0 +1,332 @@
+import concurrent.futures
+import mmap
+import os
+from multiprocessing import shared_memory
+
+import numpy
+
+from . import registry
+from .fused import _size, dtypes
+from .tiled import _encodings, _options, read, windows
+
+
+BACKENDS = ('thread', 'process')
+
+
+class SharedArray:
+    """
+    NumPy array stored in a :mod:`multiprocessing.shared_memory` segment.
+
+    Bands given to the ``process`` backend as :class:`SharedArray` are used \
+    in place by the worker processes; other arrays are copied into one \
+    once. Use it as a context manager, or call :meth:`close`, to release \
+    the segment.
+
+    :param shape: Shape of the array.
+    :type shape: tuple
+    :param dtype: Data type of the array.
+    :type dtype: numpy.dtype
+    :param name: Name of an existing segment to attach to, instead of \
+    creating one.
+    :type name: str
+    """
+
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(shape)
+        self.dtype = numpy.dtype(dtype)
+        size = max(self.dtype.itemsize * _size(self.shape), 1)
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner,
+                                                 size=size)
+        self.array = numpy.ndarray(self.shape, self.dtype,
+                                   buffer=self.memory.buf)
+
+    @classmethod
+    def copy(cls, array):
+        """Return a :class:`SharedArray` holding a copy of ``array``."""
+        shared = cls(numpy.shape(array), numpy.asarray(array).dtype)
+        shared.array[...] = array
+        return shared
+
+    def descriptor(self):
+        """Name, shape and type of the segment, to attach to it elsewhere."""
+        return ('shared', self.memory.name, self.shape, self.dtype.str)
+
+    def close(self):
+        """Detach from the segment, and destroy it if it was created here."""
+        self.array = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _mapped(array):
+    """Describe a whole memory-mapped file array, ``None`` otherwise."""
+    if isinstance(array, numpy.memmap) and isinstance(array.base, mmap.mmap) \
+            and array.filename:
+        order = 'F' if array.flags.f_contiguous and \
+            not array.flags.c_contiguous else 'C'
+        return ('mapped', array.filename, array.offset, array.shape,
+                array.dtype.str, order)
+    return None
+
+
+def _open(descriptor, mode='r'):
+    """Attach to an array described by :func:`_mapped` or a segment."""
+    if descriptor[0] == 'mapped':
+        _, filename, offset, shape, dtype, order = descriptor
+        return None, numpy.memmap(filename, dtype, mode, offset, shape, order)
+    _, name, shape, dtype = descriptor
+    shared = SharedArray(shape, dtype, name=name)
+    return shared, shared.array
+
+
+_STATE = {}
+
+
+def _attach(bands, out, names, params, options):
+    """Initialize a worker process: attach to bands and outputs once."""
+    _STATE['segments'] = []
+    _STATE['bands'] = {}
+    _STATE['out'] = {}
+    for target, descriptors, mode in ((_STATE['bands'], bands, 'r'),
+                                      (_STATE['out'], out, 'r+')):
+        for key, descriptor in descriptors.items():
+            segment, target[key] = _open(descriptor, mode)
+            _STATE['segments'].append(segment)
+    _STATE['request'] = names, params, options
+
+
+def _work(window):
+    names, params, options = _STATE['request']
+    bands, out = dict(_STATE['bands']), _STATE['out']
+    ndim = len(next(iter(out.values())).shape)
+    if 'where' in bands:
+        options = dict(options, where=bands.pop('where'))
+    registry.compute_many({band: read(array, window, ndim)
+                           for band, array in bands.items()}, names, params,
+                          out={name: array[window]
+                               for name, array in out.items()},
+                          **_options(options, window, ndim))
+
+
+def _processes(names, params, bands, out, shape, kinds, workers, block,
+               options):
+    """
+    Compute with a pool of processes sharing the arrays.
+
+    Only descriptors (segment or file names, shapes, types) and windows \
+    are sent to the workers, never array data.
+    """
+
+    segments = []
+    try:
+        descriptors = {}
+        for band, array in bands.items():
+            if not isinstance(array, SharedArray) and not numpy.ndim(array):
+                array = numpy.asarray(array)
+            descriptor = _mapped(array)
+            if descriptor is None:
+                if not isinstance(array, SharedArray):
+                    array = SharedArray.copy(array)
+                    segments.append(array)
+                descriptor = array.descriptor()
+            descriptors[band] = descriptor
+
+        outputs = {}
+        targets = {}
+        for name in names:
+            array = out.get(name)
+            outputs[name] = None if array is None else _mapped(array)
+            if outputs[name] is None:
+                targets[name] = SharedArray(shape, kinds[name] if array is None
+                                            else array.dtype)
+                segments.append(targets[name])
+                outputs[name] = targets[name].descriptor()
+
+        with concurrent.futures.ProcessPoolExecutor(
+                workers, initializer=_attach,
+                initargs=(descriptors, outputs, names, params,
+                          options)) as executor:
+            for future in [executor.submit(_work, window)
+                           for window in windows(shape, block)]:
+                future.result()
+
+        for name, shared in targets.items():
+            if out.get(name) is None:
+                out[name] = shared.array.copy()
+            else:
+                out[name][...] = shared.array
+        for name in names:
+            if isinstance(out[name], numpy.memmap):
+                out[name].flush()
+        return out
+    finally:
+        for segment in segments:
+            segment.close()
+
+
+def _array(value):
+    return value.array if isinstance(value, SharedArray) else value
+
+
+def _workers(workers):
+    return workers or os.cpu_count() or 1
+
+
+def _block(shape, block, workers):
+    """Default strips: a few per worker, so that the load is balanced."""
+    if block is not None:
+        return block
+    return max(1, -(-shape[0] // (4 * workers)))
+
+
+def _run(job, shape, block, workers):
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        for future in [executor.submit(job, window)
+                       for window in windows(shape, block)]:
+            future.result()
+
+
+def compute(function, bands, out=None, workers=None, block=None,
+            backend='thread', **kwargs):
+    """
+    Compute an index with a pool of threads or processes.
+
+    The arrays are split in blocks computed concurrently, each worker \
+    writing into a disjoint window of ``out``.
+
+    With the ``thread`` backend, NumPy releases the GIL during the ufunc \
+    loops, so blocks run in parallel on multiple cores. The ``process`` \
+    backend avoids the Python overhead between ufunc calls being \
+    serialized by the GIL: bands are placed once in shared memory (or \
+    reopened by file name when memory-mapped) and workers compute on \
+    zero-copy views, writing into a shared output. Only names, shapes, \
+    types and windows are sent to the workers, never band data.
+
+    :param function: Index function of :mod:`sr2vgi.vgi` or index name.
+    :type function: callable or str
+    :param bands: Band arrays by name.
+    :type bands: dict
+    :param out: Output array, allocated if not given.
+    :type out: numpy.ndarray
+    :param workers: Number of workers, defaults to the number of CPUs.
+    :type workers: int
+    :param block: Number of rows of a strip, or the shape of a block over \
+    the leading axes. Defaults to four strips per worker.
+    :type block: int or tuple
+    :param backend: ``thread`` or ``process``.
+    :type backend: str
+    :param kwargs: Parameters of the index and options of the index \
+    functions (``dtype``, ``precision``, ``scaling``...).
+
+    :returns: Index value
+    :rtype: numpy.ndarray
+    """
+
+    spec = registry.get(function if isinstance(function, str)
+                        else function.__name__)
+    if backend != 'thread':
+        options = {key: kwargs.pop(key) for key in registry.OPTIONS
+                   if key in kwargs}
+        return compute_many(bands, [spec.name], out={spec.name: out},
+                            params={spec.name: kwargs}, workers=workers,
+                            block=block, backend=backend,
+                            **options)[spec.name]
+
+    bands = {band: _array(bands[band]) for band in spec.bands}
+    shape = numpy.broadcast_shapes(*(numpy.shape(bands[band])
+                                     for band in spec.bands))
+    _, dtype = dtypes([bands[band] for band in spec.bands],
+                      kwargs.get('dtype'), kwargs.get('precision'))
+    kwargs, types = _encodings([spec.name], kwargs)
+    if out is None:
+        out = numpy.empty(shape, types.get(spec.name, dtype))
+
+    def job(window):
+        spec.compute({band: read(bands[band], window, len(shape))
+                      for band in spec.bands},
+                     out=out[window], **_options(kwargs, window, len(shape)))
+
+    workers = _workers(workers)
+    _run(job, shape, _block(shape, block, workers), workers)
+    return out
+
+
+def compute_many(bands, names=None, *, out=None, params=None, workers=None,
+                 block=None, backend='thread', **options):
+    """
+    Compute several indexes with a pool of threads or processes.
+
+    Like :func:`compute`, with every block evaluated by \
+    :func:`sr2vgi.registry.compute_many`, so subexpressions are still \
+    shared between the indexes of the batch.
+
+    :param bands: Band arrays by name.
+    :type bands: dict
+    :param names: Indexes to compute. Defaults to every index whose bands \
+    are present in ``bands``.
+    :type names: iterable of str
+    :param out: Output arrays by index name. Missing ones are allocated.
+    :type out: dict
+    :param params: Parameters by index name.
+    :type params: dict
+    :param workers: Number of workers, defaults to the number of CPUs.
+    :type workers: int
+    :param block: Number of rows of a strip, or the shape of a block over \
+    the leading axes. Defaults to four strips per worker.
+    :type block: int or tuple
+    :param backend: ``thread`` or ``process``, see :func:`compute`.
+    :type backend: str
+    :param options: Options of :func:`sr2vgi.registry.compute_many`.
+
+    :returns: Index values by name.
+    :rtype: dict
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError('Unknown backend {!r}, expected one of {}'.format(
+            backend, ', '.join(BACKENDS)))
+    if names is None:
+        names = registry.available(bands)
+    names = [registry.get(name).name for name in names]
+    batch = registry.plan(names, params)
+    shape = numpy.broadcast_shapes(*(numpy.shape(_array(bands[band]))
+                                     for band in batch.bands))
+
+    out = {registry.get(name).name: array
+           for name, array in (out or {}).items() if array is not None}
+    _, dtype = dtypes([_array(bands[band]) for band in batch.bands],
+                      options.get('dtype'), options.get('precision'))
+    options, types = _encodings(names, options)
+    kinds = {name: types.get(name, dtype) for name in names}
+    workers = _workers(workers)
+    block = _block(shape, block, workers)
+
+    if backend == 'process':
+        # The mask is shared with the workers like the bands.
+        shared = {band: bands[band] for band in batch.bands}
+        if options.get('where') is not None:
+            shared['where'] = options.pop('where')
+        return _processes(names, params, shared, out, shape, kinds, workers,
+                          block, options)
+
+    bands = {band: _array(bands[band]) for band in batch.bands}
+    for name in names:
+        if name not in out:
+            out[name] = numpy.empty(shape, kinds[name])
+
+    def job(window):
+        registry.compute_many({band: read(bands[band], window, len(shape))
+                               for band in batch.bands}, names, params,
+                              out={name: out[name][window] for name in names},
+                              **_options(options, window, len(shape)))
+
+    _run(job, shape, block, workers)
+    return out
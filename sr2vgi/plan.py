@@ -0,0 +1,83 @@
+import numpy
+
+from .expr import BOOLEAN, OPS, canonical, walk
+from .kernels import normalized_difference
+
+
+class Plan:
+    """
+    Evaluation plan of several index expressions.
+
+    The expression graphs of all the outputs are merged into a single \
+    graph where every distinct subexpression appears once, e.g. the \
+    ``b8 - b4`` of both :func:`~sr2vgi.vgi.ndvi` and :func:`~sr2vgi.vgi.evi` \
+    or the whole formula shared by :func:`~sr2vgi.vgi.ndwi_gao` and \
+    :func:`~sr2vgi.vgi.lswi`. Expressions are put in canonical form first \
+    (see :func:`sr2vgi.expr.canonical`), so equivalent formulas written \
+    differently are shared too, and an index that is the negation of \
+    another, like :func:`~sr2vgi.vgi.ndbi` of :func:`~sr2vgi.vgi.ndmi`, \
+    costs a single negation. Plans are evaluated by \
+    :func:`sr2vgi.fused.execute`.
+
+    :param outputs: Expression graphs by output name.
+    :type outputs: dict of sr2vgi.expr.Node
+    :param swap: Whether to share normalized differences of swapped bands, \
+    see :func:`sr2vgi.expr.canonical`, when both are computed.
+    :type swap: bool
+    """
+
+    def __init__(self, outputs, swap=True):
+        self.sources = dict(outputs)
+        if swap:
+            # Swapping only pays when both nd(x, y) and nd(y, x) are
+            # computed, otherwise it costs a negation and a temporary.
+            pairs = {node.key for node in walk(
+                [canonical(root, False) for root in outputs.values()])
+                if node.op == 'nd'}
+            swap = any(('nd', y, x) in pairs for _, x, y in pairs)
+        self.swap = swap
+        self._unswapped = None if swap else self
+        self.outputs = {name: canonical(root, swap)
+                        for name, root in outputs.items()}
+
+        nodes = list(walk(self.outputs.values()))
+        self.bands = tuple(node.args[0] for node in nodes if node.op == 'var')
+        self.steps = [node for node in nodes
+                      if node.op not in ('var', 'const')]
+        self.boolean = frozenset(node.key for node in self.steps
+                                 if node.op in BOOLEAN)
+
+        # Number of times each value is read: by later steps and as output.
+        self.uses = {}
+        for node in self.steps:
+            for child in node.children():
+                self.uses[child.key] = self.uses.get(child.key, 0) + 1
+        for root in self.outputs.values():
+            self.uses[root.key] = self.uses.get(root.key, 0) + 1
+
+    def __repr__(self):
+        return 'Plan({}, bands={!r}, steps={})'.format(
+            list(self.outputs), self.bands, len(self.steps))
+
+    def unswapped(self):
+        """
+        Return the plan of the same outputs without swapped normalized \
+        differences, built once.
+
+        :returns: This plan, if it swaps none.
+        :rtype: Plan
+        """
+
+        if self._unswapped is None:
+            self._unswapped = Plan(self.sources, swap=False)
+        return self._unswapped
+
+
+def _apply(node, operands, **kwargs):
+    if node.op == 'pow' and node.args[1].op == 'const' \
+            and node.args[1].value == 2:
+        # Same shortcut as ``ndarray.__pow__``, so results are identical.
+        return numpy.square(operands[0], **kwargs)
+    if node.op == 'nd':
+        return normalized_difference(*operands, **kwargs)
+    return OPS[node.op][0](*operands, **kwargs)
@@ -0,0 +1,151 @@
+import contextlib
+
+import numpy
+
+
+# Policy name -> (computation data type, result data type)
+POLICIES = {
+    'float32': (numpy.dtype('float32'), numpy.dtype('float32')),
+    'float64': (numpy.dtype('float64'), numpy.dtype('float64')),
+    'mixed': (numpy.dtype('float64'), numpy.dtype('float32')),
+}
+
+# Bound of the float32 error relative to float64 (see :func:`compare`).
+FLOAT32_TOLERANCE = 1e-3
+
+_default = None
+
+
+def get_default():
+    """Return the global precision policy, ``None`` if not set."""
+    return _default
+
+
+def set_default(policy):
+    """
+    Set the precision policy of every index computation.
+
+    :param policy: One of :data:`POLICIES`, or ``None`` to compute in the \
+    type of the bands.
+    :type policy: str
+    """
+
+    global _default
+    _default = _check(policy)
+
+
+@contextlib.contextmanager
+def policy(name):
+    """
+    Use a precision policy within a ``with`` block.
+
+    .. code-block:: python
+
+        with sr2vgi.precision.policy('float32'):
+            ndvi = sr2vgi.vgi.ndvi(b4, b8)
+
+    :param name: One of :data:`POLICIES`.
+    :type name: str
+    """
+
+    previous = get_default()
+    set_default(name)
+    try:
+        yield
+    finally:
+        set_default(previous)
+
+
+def _check(policy):
+    if policy is not None and policy not in POLICIES:
+        raise ValueError('Unknown precision policy {!r}, expected one of '
+                         '{}'.format(policy, ', '.join(POLICIES)))
+    return policy
+
+
+def resolve(policy=None, dtype=None):
+    """
+    Return the computation and result data types of a computation.
+
+    :param policy: Precision policy, defaults to the global one.
+    :type policy: str
+    :param dtype: Requested result data type, which takes precedence over \
+    the result type of the policy.
+    :type dtype: numpy.dtype
+
+    :returns: Computation and result data types, ``None`` where undecided.
+    :rtype: tuple
+    """
+
+    policy = _check(policy) or get_default()
+    dtype = None if dtype is None else numpy.dtype(dtype)
+    if policy is None:
+        return dtype, dtype
+
+    compute, result = POLICIES[policy]
+    return compute, dtype or result
+
+
+def compare(names=None, size=100000, policy='float32', seed=0):
+    """
+    Measure the error of a precision policy against float64, by index.
+
+    Bands are drawn uniformly from typical surface reflectance values. \
+    The error is relative to the float64 value, or to ``1e-3`` when the \
+    value is smaller, and the 99.9th percentile is reported so that the \
+    few pixels where an ill-conditioned formula (e.g. a denominator close \
+    to zero) amplifies any rounding do not hide the typical error.
+
+    :param names: Indexes to compare, defaults to all.
+    :type names: iterable of str
+    :param size: Number of random pixels.
+    :type size: int
+    :param policy: Policy compared to ``float64``.
+    :type policy: str
+    :param seed: Seed of the random bands.
+    :type seed: int
+
+    :returns: Relative error by index name.
+    :rtype: dict
+    """
+
+    from .registry import BANDS, INDEXES, compute_many
+
+    generator = numpy.random.default_rng(seed)
+    bands = {band: generator.uniform(0.01, 0.6, size) for band in BANDS}
+    names = list(INDEXES) if names is None else list(names)
+
+    with numpy.errstate(all='ignore'):
+        reference = compute_many(bands, names, precision='float64')
+        values = compute_many(bands, names, precision=policy)
+
+    errors = {}
+    for name in reference:
+        valid = numpy.isfinite(reference[name])
+        error = numpy.abs(values[name][valid] - reference[name][valid])
+        error /= numpy.maximum(numpy.abs(reference[name][valid]), 1e-3)
+        errors[name] = float(numpy.percentile(error, 99.9))
+    return errors
+
+
+def check(names=None, policy='float32', tolerance=FLOAT32_TOLERANCE):
+    """
+    Check that the error of a precision policy is within ``tolerance``.
+
+    :param names: Indexes to check, defaults to all.
+    :type names: iterable of str
+    :param policy: Policy compared to ``float64``.
+    :type policy: str
+    :param tolerance: Bound of the error measured by :func:`compare`.
+    :type tolerance: float
+
+    :raises AssertionError: If any index exceeds the bound.
+    """
+
+    errors = compare(names, policy=policy)
+    failed = {name: error for name, error in errors.items()
+              if not error <= tolerance}
+    if failed:
+        raise AssertionError('{} error above {} for {}'.format(
+            policy, tolerance, ', '.join('{} ({:.2e})'.format(*item)
+                                         for item in sorted(failed.items()))))
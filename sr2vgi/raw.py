@@ -0,0 +1,314 @@
+"""
+Raw band files, memory-mapped.
+
+Reads and writes band stacks as raw binary files with an ENVI header \
+(band sequential ``bsq``, band interleaved by line ``bil`` or by pixel \
+``bip``) or as ``.npy`` files, with no geospatial dependency:
+
+.. code-block:: python
+
+    from sr2vgi import raw, vgi
+
+    bands = raw.load('S2_L2A.dat')          # header in S2_L2A.hdr
+    ndvi = vgi.ndvi(bands['b4'], bands['b8'])
+
+    # Indexes streamed block by block into a new file.
+    raw.compute_many(bands, 'indexes.dat', ['ndvi', 'ndmi'])
+
+Bands are zero-copy views of the mapped file, only read when and where \
+an index is computed. Bands of ``bsq`` files and ``.npy`` stacks are \
+contiguous memory maps of their own, which the ``process`` backend of \
+:mod:`sr2vgi.parallel` reopens by name instead of copying them.
+"""
+
+import os
+import sys
+
+import numpy
+
+from . import registry
+from .fused import dtypes
+from .tiled import BLOCK_ROWS, _encodings, _shape
+from .tiled import compute_many as _compute_many
+
+
+INTERLEAVES = ('bsq', 'bil', 'bip')
+
+# ENVI data type codes.
+DATA_TYPES = {
+    1: 'u1', 2: 'i2', 3: 'i4', 4: 'f4', 5: 'f8', 6: 'c8', 9: 'c16',
+    12: 'u2', 13: 'u4', 14: 'i8', 15: 'u8',
+}
+
+# Header fields holding numbers.
+_NUMBERS = ('samples', 'lines', 'bands', 'header offset', 'data type',
+            'byte order')
+
+
+def header_path(path):
+    """
+    Return the path of the ENVI header of a raw file.
+
+    The header of ``image.dat`` is ``image.hdr`` if it exists, and \
+    ``image.dat.hdr`` otherwise.
+    """
+
+    replaced = os.path.splitext(path)[0] + '.hdr'
+    if os.path.exists(replaced) or not os.path.exists(path + '.hdr'):
+        return replaced
+    return path + '.hdr'
+
+
+def read_header(path):
+    """
+    Read an ENVI header.
+
+    :param path: Path of the header.
+    :type path: str
+
+    :returns: Fields by lower-case name, numbers for the sizes, types and \
+    offsets, lists for the values in braces and strings otherwise.
+    :rtype: dict
+
+    :raises ValueError: If the file is not an ENVI header.
+    """
+
+    with open(path) as file:
+        text = file.read()
+    if not text.startswith('ENVI'):
+        raise ValueError('{} is not an ENVI header'.format(path))
+
+    header = {}
+    lines = iter(text.splitlines()[1:])
+    for line in lines:
+        if '=' not in line:
+            continue
+        key, value = (part.strip() for part in line.split('=', 1))
+        if value.startswith('{'):
+            while '}' not in value:
+                value += next(lines, '}')
+            value = [item.strip() for item in
+                     value.strip('{}').split(',') if item.strip()]
+        key = key.lower()
+        header[key] = int(value) if key in _NUMBERS else value
+    return header
+
+
+def write_header(path, header):
+    """
+    Write an ENVI header.
+
+    :param path: Path of the header.
+    :type path: str
+    :param header: Fields by name, lists being written in braces.
+    :type header: dict
+    """
+
+    lines = ['ENVI']
+    for key, value in header.items():
+        if isinstance(value, (list, tuple)):
+            value = '{{{}}}'.format(', '.join(str(item) for item in value))
+        lines.append('{} = {}'.format(key, value))
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def _name(name):
+    """Band name, lower-case if it is a band of :data:`registry.BANDS`."""
+    return name.lower() if name.lower() in registry.BANDS else name
+
+
+def _layout(header):
+    """Data type, shape of the file and band axis of an ENVI header."""
+
+    code = header.get('data type')
+    if code not in DATA_TYPES:
+        raise ValueError('Unsupported ENVI data type {}'.format(code))
+    dtype = numpy.dtype(DATA_TYPES[code]).newbyteorder(
+        '>' if header.get('byte order') else '<')
+
+    interleave = header.get('interleave', 'bsq').lower()
+    if interleave not in INTERLEAVES:
+        raise ValueError('Unknown interleave {!r}, expected one of '
+                         '{}'.format(interleave, ', '.join(INTERLEAVES)))
+    lines, samples, count = header['lines'], header['samples'], \
+        header['bands']
+    shape, axis = {
+        'bsq': ((count, lines, samples), 0),
+        'bil': ((lines, count, samples), 1),
+        'bip': ((lines, samples, count), 2),
+    }[interleave]
+    return dtype, shape, axis
+
+
+def _stack(path, offset, dtype, shape, axis, names, mode):
+    """Bands of a file stacked along ``axis``, by name."""
+
+    if axis == 0:
+        # A memory map per band, each one contiguous.
+        size = shape[1] * shape[2] * dtype.itemsize
+        return {name: numpy.memmap(path, dtype, mode, offset + index * size,
+                                   shape[1:])
+                for index, name in enumerate(names)}
+
+    stack = numpy.memmap(path, dtype, mode, offset, shape)
+    return {name: stack[(slice(None),) * axis + (index,)]
+            for index, name in enumerate(names)}
+
+
+def load(path, names=None, mode='r'):
+    """
+    Open the bands of a raw file as memory-mapped arrays.
+
+    :param path: Raw file with an ENVI header (see :func:`header_path`), \
+    ``.npy`` file of a stack of bands along its first axis, or directory \
+    of ``.npy`` files named after their band, e.g. ``b8a.npy``.
+    :type path: str
+    :param names: Band names, in the order of the file. Default to the \
+    ``band names`` of the header, or the names of the files of a \
+    directory, and required for ``.npy`` stacks.
+    :type names: list of str
+    :param mode: Memory mapping mode of :class:`numpy.memmap`, ``r``, \
+    ``r+`` or ``c``.
+    :type mode: str
+
+    :returns: Band arrays by name, ready for the index functions.
+    :rtype: dict
+
+    :raises ValueError: If the band names are missing or do not match the \
+    number of bands.
+    """
+
+    if os.path.isdir(path):
+        files = sorted(name for name in os.listdir(path)
+                       if name.endswith('.npy'))
+        return {_name(name[:-4]): numpy.load(os.path.join(path, name),
+                                             mmap_mode=mode)
+                for name in files
+                if names is None or _name(name[:-4]) in names}
+
+    if path.endswith('.npy'):
+        stack = numpy.load(path, mmap_mode=mode)
+        if names is None or len(names) != len(stack):
+            raise ValueError('Give the names of the {} bands of {}'.format(
+                len(stack), path))
+        if not stack.flags.c_contiguous:
+            return {_name(name): band for name, band in zip(names, stack)}
+        return _stack(path, stack.offset, stack.dtype, stack.shape, 0,
+                      [_name(name) for name in names], mode)
+
+    header = read_header(header_path(path))
+    dtype, shape, axis = _layout(header)
+    if names is None:
+        names = header.get('band names') or []
+    if len(names) != header['bands']:
+        raise ValueError('Give the names of the {} bands of {}'.format(
+            header['bands'], path))
+    return _stack(path, header.get('header offset', 0), dtype, shape, axis,
+                  [_name(name) for name in names], mode)
+
+
+def create(path, names, shape, dtype='float32', interleave='bsq', **header):
+    """
+    Create a raw file of bands, and open them for writing.
+
+    :param path: Path of the raw file, whose ENVI header is written next \
+    to it, or of a ``.npy`` file.
+    :type path: str
+    :param names: Band names.
+    :type names: list of str
+    :param shape: Number of lines and samples of a band.
+    :type shape: tuple
+    :param dtype: Data type of the values.
+    :type dtype: numpy.dtype
+    :param interleave: ``bsq``, ``bil`` or ``bip``, ignored for ``.npy`` \
+    files.
+    :type interleave: str
+    :param header: Other fields of the ENVI header, e.g. \
+    ``description='NDVI'`` (spaces for underscores).
+
+    :returns: Writable band arrays by name, mapping the new file.
+    :rtype: dict
+    """
+
+    names = list(names)
+    dtype = numpy.dtype(dtype)
+    lines, samples = shape
+    if path.endswith('.npy'):
+        numpy.lib.format.open_memmap(path, 'w+', dtype,
+                                     (len(names), lines, samples))
+        return load(path, names, 'r+')
+
+    codes = {numpy.dtype(value): code for code, value in DATA_TYPES.items()}
+    native = dtype.newbyteorder('<')
+    if native not in codes:
+        raise ValueError('Cannot write {} values in an ENVI file'.format(
+            dtype))
+
+    fields = {
+        'description': '{sr2vgi}',
+        'samples': samples,
+        'lines': lines,
+        'bands': len(names),
+        'header offset': 0,
+        'file type': 'ENVI Standard',
+        'data type': codes[native],
+        'interleave': interleave,
+        'byte order': int(dtype.byteorder == '>' or dtype.byteorder == '='
+                          and sys.byteorder == 'big'),
+        'band names': names,
+    }
+    fields.update((key.replace('_', ' '), value)
+                  for key, value in header.items())
+    _layout(fields)
+    numpy.memmap(path, dtype, 'w+', 0, len(names) * lines * samples).flush()
+    write_header(header_path(path), fields)
+    return load(path, names, 'r+')
+
+
+def compute_many(bands, path, names=None, *, params=None, interleave='bsq',
+                 block=BLOCK_ROWS, **options):
+    """
+    Compute indexes block by block into a new raw file.
+
+    The file is created with one band per index (see :func:`create`) and \
+    filled by :func:`sr2vgi.tiled.compute_many`, so the index values \
+    never exist in memory in full.
+
+    :param bands: Band arrays by name, e.g. from :func:`load`.
+    :type bands: dict
+    :param path: Path of the raw or ``.npy`` file to create.
+    :type path: str
+    :param names: Indexes to compute. Defaults to every index whose bands \
+    are present.
+    :type names: iterable of str
+    :param params: Parameters by index name.
+    :type params: dict
+    :param interleave: ``bsq``, ``bil`` or ``bip``.
+    :type interleave: str
+    :param block: Number of rows of a strip.
+    :type block: int
+    :param options: Options of :func:`sr2vgi.registry.compute_many`. All \
+    the indexes are stored in one data type, the computation one or that \
+    of their ``encoding``.
+
+    :returns: Index arrays by name, mapping the new file.
+    :rtype: dict
+    """
+
+    if names is None:
+        names = registry.available(bands)
+    names = [registry.get(name).name for name in names]
+    batch = registry.plan(names, params)
+    _, dtype = dtypes([bands[band] for band in batch.bands],
+                      options.get('dtype'), options.get('precision'))
+    options, types = _encodings(names, options)
+    kinds = {types.get(name, dtype) for name in names}
+    if len(kinds) > 1:
+        raise ValueError('A raw file holds values of one type, not {}'.format(
+            ', '.join(sorted(kind.name for kind in kinds))))
+
+    out = create(path, names, _shape(bands, batch.bands)[-2:], kinds.pop(),
+                 interleave)
+    return _compute_many(bands, out, names, params=params, block=block,
+                         **options)
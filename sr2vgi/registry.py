@@ -0,0 +1,464 @@
+import functools
+import inspect
+import textwrap
+
+import numpy
+
+from . import encoding as _encoding
+from . import instrument as _instrument
+from . import precision as _precision
+from .expr import canonical, trace
+from .fused import execute
+from .plan import Plan
+
+
+BANDS = {
+    'b1': 'Coastal aerosol',
+    'b2': 'Blue',
+    'b3': 'Green',
+    'b4': 'Red',
+    'b5': 'Red-edge 1',
+    'b6': 'Red-edge 2',
+    'b7': 'Red-edge 3',
+    'b8': 'NIR',
+    'b8a': 'NIR narrow',
+    'b9': 'Water vapour',
+    'b10': 'SWIR cirrus',
+    'b11': 'SWIR 1',
+    'b12': 'SWIR 2',
+}
+
+INDEXES = {}
+
+# Keyword-only options added to every index function, with their docs.
+OPTIONS = {
+    'out': ('Array receiving the index value.', 'numpy.ndarray'),
+    'dtype': ('Floating data type of the result, and of the computation '
+              'unless ``precision`` says otherwise.', 'numpy.dtype'),
+    'precision': ('Precision policy of :mod:`sr2vgi.precision`, defaults '
+                  'to the global one.', 'str'),
+    'scaling': ('Decoding of bands given as digital numbers, applied block '
+                'by block (see :mod:`sr2vgi.scaling`).',
+                'sr2vgi.scaling.Scaling or str or dict'),
+    'where': ('Valid pixels. Tiles without any are not computed, and '
+              'invalid pixels get ``fill_value``.', 'numpy.ndarray'),
+    'fill_value': ('Value of the invalid pixels, defaults to NaN.', 'float'),
+    'divide': ('Result of the divisions by zero: ``nan``, ``clamp`` to the '
+               'largest finite value or a fill value, set in the same pass '
+               'without warnings.', 'str or float'),
+    'encoding': ('Integer encoding of the result, or an integer data type '
+                 'for the default encoding of the valid range of the index '
+                 '(see :mod:`sr2vgi.encoding`), applied block by block.',
+                 'sr2vgi.encoding.Encoding or str'),
+}
+
+# Band readers decoding only the blocks sliced, like sr2vgi.tiff.TiffBand,
+# added by their modules. The index functions compute them block by block,
+# and other array types with their own operators.
+READERS = ()
+
+_PLANS = {}
+
+
+class Index:
+    """
+    Metadata of a registered vegetation index.
+
+    :param function: Index function, as defined in :mod:`sr2vgi.vgi`.
+    :type function: callable
+    :param valid_range: Lowest and highest value of the index, see \
+    :attr:`valid_range`.
+    :type valid_range: tuple
+
+    The required bands and the default parameters are taken from the \
+    function signature: every argument named after a Sentinel-2 band \
+    (see :data:`BANDS`) is a band, every other argument is a parameter.
+    """
+
+    def __init__(self, function, valid_range=None):
+        self.name = function.__name__
+        self.function = function
+        self._valid_range = valid_range
+
+        self.signature = inspect.signature(function)
+        self.bands = tuple(name for name in self.signature.parameters
+                           if name in BANDS)
+        self.params = {name: parameter.default for name, parameter
+                       in self.signature.parameters.items()
+                       if name not in BANDS}
+        self._expressions = {}
+
+    def __repr__(self):
+        return 'Index({!r}, bands={!r}, params={!r})'.format(
+            self.name, self.bands, self.params)
+
+    def __call__(self, bands, **params):
+        """
+        Compute the index reading the required bands from a mapping.
+
+        Like the index functions (see :func:`index`), the formula runs as \
+        written unless options, a global precision policy or band readers \
+        call for :meth:`compute`.
+
+        :param bands: Band arrays by name (``b1`` .. ``b12``, ``b8a``).
+        :type bands: dict
+        :param params: Values overriding the default parameters, and \
+        options listed in :data:`OPTIONS`.
+
+        :returns: Index value
+        """
+
+        missing = [band for band in self.bands if band not in bands]
+        if missing:
+            raise KeyError('Index {} requires the bands {}'.format(
+                self.name, ', '.join(missing)))
+
+        options = {}
+        for key in OPTIONS.keys() & params.keys():
+            value = params.pop(key)
+            if value is not None:
+                options[key] = value
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise TypeError('Index {} has no parameters {}'.format(
+                self.name, ', '.join(sorted(unknown))))
+
+        args = {band: bands[band] for band in self.bands}
+        if options or _precision.get_default() is not None \
+                or any(map(_blockwise, args.values())):
+            return self.compute(args, **params, **options)
+        args.update(params)
+        recorder = _instrument.active()
+        if recorder is not None:
+            return recorder.call(self.name, self.function, (), args)
+        return self.function(**args)
+
+    def expression(self, **params):
+        """
+        Return the expression graph of the index.
+
+        :param params: Values overriding the default parameters.
+
+        :returns: Root of the expression graph
+        :rtype: sr2vgi.expr.Node
+        """
+
+        values = dict(self.params, **params)
+        key = tuple(sorted(values.items()))
+        if key not in self._expressions:
+            self._expressions[key] = trace(self.function, self.bands,
+                                           **values)
+        return self._expressions[key]
+
+    @property
+    def valid_range(self):
+        """
+        Lowest and highest value of the index, ``None`` if unbounded.
+
+        Declared indexes give the range of their values over reflectances \
+        from 0 to 1, or the usual one when the formula is unbounded, like \
+        ``(-1, 1)`` for :func:`~sr2vgi.vgi.evi`. Defaults to ``(-1, 1)`` \
+        for the normalized differences of two bands. Used by the default \
+        integer encodings (see :func:`sr2vgi.encoding.default`).
+        """
+
+        if self._valid_range is not None:
+            return self._valid_range
+        root = canonical(self.expression())
+        if root.op == 'neg':
+            root = root.args[0]
+        if root.op == 'nd' and all(child.op == 'var' for child in root.args):
+            return (-1.0, 1.0)
+        return None
+
+    def compute(self, bands, **kwargs):
+        """
+        Compute the index with :func:`sr2vgi.fused.execute`.
+
+        :param bands: Band arrays by name (``b1`` .. ``b12``, ``b8a``).
+        :type bands: dict
+        :param kwargs: Parameters of the index and options listed in \
+        :data:`OPTIONS`.
+
+        :returns: Index value
+        """
+
+        options = {key: kwargs.pop(key) for key in OPTIONS if key in kwargs}
+        out = options.pop('out', None)
+        options['encoding'] = _encoding.get(options.get('encoding'),
+                                            {self.name: self.valid_range})
+
+        result = _execute(plan([self.name], {self.name: kwargs}), bands,
+                          out=None if out is None else {self.name: out},
+                          **options)[self.name]
+        if out is None and not result.ndim:
+            return result[()]
+        return result
+
+
+def index(function=None, valid_range=None):
+    """
+    Register an index function in :data:`INDEXES`.
+
+    Can be used either as ``@index`` or as ``@index(valid_range=...)``.
+
+    The function gets the keyword-only options of :data:`OPTIONS`. Called \
+    without any of them, without a global precision policy and with plain \
+    arrays, it runs its formula as written, after about a microsecond of \
+    option handling; otherwise it is computed by :meth:`Index.compute`, \
+    which also reads the band readers of :data:`READERS`, like \
+    :class:`sr2vgi.resample.Upsampled`, block by block.
+
+    :param function: Index function.
+    :type function: callable
+    :param valid_range: Lowest and highest value of the index.
+    :type valid_range: tuple
+
+    :returns: The function with the options.
+    """
+
+    def register(function):
+        spec = Index(function, valid_range=valid_range)
+        INDEXES[spec.name] = spec
+        # Plans of a replaced index would keep computing its old formula.
+        for key in [key for key in _PLANS
+                    if any(name == spec.name for name, _ in key)]:
+            del _PLANS[key]
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            options = {}
+            for key in OPTIONS.keys() & kwargs.keys() if kwargs else ():
+                value = kwargs.pop(key)
+                if value is not None:
+                    options[key] = value
+            if not options and _precision.get_default() is None \
+                    and not any(map(_blockwise, args)) \
+                    and not any(map(_blockwise, kwargs.values() if kwargs
+                                    else ())):
+                recorder = _instrument.active()
+                if recorder is not None:
+                    return recorder.call(spec.name, function, args, kwargs)
+                return function(*args, **kwargs)
+
+            arguments = spec.signature.bind(*args, **kwargs).arguments
+            bands = {band: arguments.pop(band) for band in spec.bands}
+            return spec.compute(bands, **arguments, **options)
+
+        wrapper.index = spec
+        wrapper.__signature__ = spec.signature.replace(parameters=list(
+            spec.signature.parameters.values()) + [
+            inspect.Parameter(key, inspect.Parameter.KEYWORD_ONLY,
+                              default=None) for key in OPTIONS])
+        wrapper.__doc__ = _document_options(function.__doc__)
+        return wrapper
+
+    if function is None:
+        return register
+    return register(function)
+
+
+def _blockwise(value):
+    """Whether ``value`` is a band reader, only read by blocks."""
+    return isinstance(value, READERS)
+
+
+def _document_options(doc):
+    """Insert the documentation of :data:`OPTIONS` before ``:returns``."""
+
+    if not doc or '    :returns' not in doc:
+        return doc
+
+    lines = []
+    for key, (description, kind) in OPTIONS.items():
+        lines.extend(textwrap.wrap(
+            ':param {}: {}'.format(key, description), width=79,
+            initial_indent='    ', subsequent_indent='        '))
+        lines.append('    :type {}: {}'.format(key, kind))
+    head, tail = doc.split('    :returns', 1)
+    return head.rstrip() + '\n' + '\n'.join(lines) + '\n\n    :returns' + tail
+
+
+def get(name):
+    """
+    Return the registered :class:`Index` named ``name``.
+
+    The lookup falls back to a case-insensitive match, so ``repa`` resolves \
+    to ``REPA``.
+
+    :param name: Index name.
+    :type name: str
+
+    :returns: Index metadata
+    :rtype: Index
+    """
+
+    if name in INDEXES:
+        return INDEXES[name]
+
+    for key, spec in INDEXES.items():
+        if key.lower() == name.lower():
+            return spec
+
+    raise KeyError('Unknown index {!r}'.format(name))
+
+
+def required_bands(names):
+    """
+    Return the bands needed to compute all the given indexes.
+
+    :param names: Index names.
+    :type names: iterable of str
+
+    :returns: Band names, in :data:`BANDS` order.
+    :rtype: tuple
+    """
+
+    needed = set()
+    for name in names:
+        needed.update(get(name).bands)
+    return tuple(band for band in BANDS if band in needed)
+
+
+def available(bands):
+    """
+    Return the names of the indexes that can be computed from ``bands``.
+
+    :param bands: Band names or band arrays by name.
+    :type bands: iterable of str or dict
+
+    :returns: Index names.
+    :rtype: list
+    """
+
+    bands = set(bands)
+    return [name for name, spec in INDEXES.items()
+            if bands.issuperset(spec.bands)]
+
+
+def plan(names, params=None):
+    """
+    Return the evaluation plan computing the given indexes together.
+
+    Plans are cached, so repeated batches over many tiles are planned once.
+
+    :param names: Index names.
+    :type names: iterable of str
+    :param params: Parameters by index name, e.g. ``{'savirre': {'L': 1}}``.
+    :type params: dict
+
+    :returns: Evaluation plan
+    :rtype: sr2vgi.plan.Plan
+    """
+
+    specs = [get(name) for name in names]
+    params = params or {}
+    key = tuple((spec.name, tuple(sorted(params.get(spec.name, {}).items())))
+                for spec in specs)
+
+    if key not in _PLANS:
+        _PLANS[key] = Plan({spec.name: spec.expression(**dict(values))
+                            for spec, (_, values) in zip(specs, key)})
+    return _PLANS[key]
+
+
+def equivalents(names=None, params=None):
+    """
+    Group the indexes computing the same values.
+
+    Formulas are compared in canonical form (see \
+    :func:`sr2vgi.expr.canonical`), e.g. :func:`~sr2vgi.vgi.ndwi_gao`, \
+    :func:`~sr2vgi.vgi.lswi`, :func:`~sr2vgi.vgi.ndii` and \
+    :func:`~sr2vgi.vgi.ndmi` are all ``nd(b8, b11)``.
+
+    :param names: Index names, defaults to all of them.
+    :type names: iterable of str
+    :param params: Parameters by index name, e.g. ``{'savirre': {'L': 1}}``.
+    :type params: dict
+
+    :returns: Groups of more than one equivalent index.
+    :rtype: list of tuple
+    """
+
+    groups = {}
+    for name, root in plan(names or INDEXES, params).outputs.items():
+        groups.setdefault(root.key, []).append(name)
+    return [tuple(group) for group in groups.values() if len(group) > 1]
+
+
+def compute_many(bands, names=None, params=None, out=None, dtype=None,
+                 precision=None, scaling=None, where=None, fill_value=None,
+                 divide=None, encoding=None):
+    """
+    Compute several indexes from a single set of bands.
+
+    The indexes are evaluated together (see :func:`plan`), so a \
+    subexpression shared by several of them is computed only once, and \
+    with :func:`sr2vgi.fused.execute`, so no full-size temporary is \
+    allocated. Equivalent indexes (see :func:`equivalents`) are computed \
+    once, the duplicates missing from ``out`` being read-only views.
+
+    :param bands: Band arrays by name (``b1`` .. ``b12``, ``b8a``). Each \
+    band is read as given, so memory-mapped arrays are never copied.
+    :type bands: dict
+    :param names: Indexes to compute. Defaults to every index whose bands \
+    are present in ``bands``.
+    :type names: iterable of str
+    :param params: Parameters by index name, e.g. ``{'savirre': {'L': 1}}``.
+    :type params: dict
+    :param out: Arrays receiving the index values, by index name.
+    :type out: dict
+    :param dtype: Floating data type of the results, and of the computation \
+    unless ``precision`` says otherwise.
+    :type dtype: numpy.dtype
+    :param precision: Precision policy of :mod:`sr2vgi.precision`, \
+    defaults to the global one.
+    :type precision: str
+    :param scaling: Decoding of bands given as digital numbers, e.g. \
+    :data:`sr2vgi.scaling.SENTINEL2_L2A`.
+    :type scaling: sr2vgi.scaling.Scaling or str or dict
+    :param where: Valid pixels, e.g. clear-sky pixels of a scene. Tiles \
+    of the blocks without valid pixels, like under clouds, are not \
+    computed, and only the valid pixels of tiles partly valid are. \
+    Scattered masks cost a full computation and a fill.
+    :type where: numpy.ndarray
+    :param fill_value: Value of the pixels outside ``where``, defaults to \
+    NaN.
+    :type fill_value: float
+    :param divide: Result of the divisions by zero, e.g. over water or \
+    nodata: ``nan``, ``clamp`` for the largest finite value with the sign \
+    of the numerator, or a fill value. Set while dividing, without \
+    floating point warnings nor extra passes. Defaults to the IEEE results.
+    :type divide: str or float
+    :param encoding: Integer encoding of the results, a single one, an \
+    integer data type for the default encoding of the valid range of each \
+    index, or by index name (see :mod:`sr2vgi.encoding`). Results are \
+    scaled, rounded and clipped while computed, with no floating result \
+    in full.
+    :type encoding: sr2vgi.encoding.Encoding or str or dict
+
+    :returns: Index values by name.
+    :rtype: dict
+    """
+
+    if names is None:
+        names = available(bands)
+
+    batch = plan(names, params)
+    missing = [band for band in batch.bands if band not in bands]
+    if missing:
+        raise KeyError('Missing bands {}'.format(', '.join(missing)))
+    return _execute(batch, bands, out=out, dtype=dtype, precision=precision,
+                    scaling=scaling, where=where, fill_value=fill_value,
+                    divide=divide, encoding=_encoding.get(encoding, {
+                        name: get(name).valid_range
+                        for name in batch.outputs}))
+
+
+def _execute(batch, bands, **options):
+    """Run :func:`sr2vgi.fused.execute`, recorded if instrumentation is on."""
+    recorder = _instrument.active()
+    if recorder is None:
+        return execute(batch, bands, **options)
+    return recorder.call(list(batch.outputs), execute, (batch, bands),
+                         options)
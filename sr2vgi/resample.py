@@ -0,0 +1,388 @@
+"""
+Bands of different resolutions, without upsampled copies.
+
+Sentinel-2 bands come at 10, 20 and 60 m. Instead of upsampling every band \
+to 10 m before computing an index, give them at their native resolution:
+
+.. code-block:: python
+
+    from sr2vgi import resample
+
+    # Nearest neighbour at the finest resolution, on zero-copy views.
+    values = resample.compute_many(bands, ['ndre1m', 'srre1', 'bai'])
+
+    # Bilinear at 10 m, or any resolution, upsampling block by block.
+    values = resample.compute_many(bands, ['reip'], resolution=10,
+                                   method='bilinear')
+
+The upsampled bands never exist in full: either every band is viewed with \
+extra axes of length 1 that NumPy broadcasts (see :func:`views`), or the \
+coarse bands are wrapped in :class:`Upsampled`, which upsamples only the \
+block the engine is reading.
+"""
+
+import numpy
+
+from . import registry
+
+
+# Native resolution of the Sentinel-2 bands in meters.
+RESOLUTIONS = {
+    'b1': 60, 'b2': 10, 'b3': 10, 'b4': 10, 'b5': 20, 'b6': 20, 'b7': 20,
+    'b8': 10, 'b8a': 20, 'b9': 60, 'b10': 60, 'b11': 20, 'b12': 20,
+}
+
+METHODS = ('nearest', 'bilinear')
+
+
+def _ranges(band, key):
+    """Contiguous ranges of the two last axes, of a key of slices."""
+
+    key = key if isinstance(key, tuple) else (key,)
+    if len(key) > band.ndim or not all(isinstance(part, slice)
+                                       for part in key):
+        raise TypeError('{} bands only support slices, not {!r}'.format(
+            type(band).__name__, key))
+    key = key + (slice(None),) * (band.ndim - len(key))
+
+    ranges = []
+    for part, length in zip(key[-2:], band.shape[-2:]):
+        start, stop, step = part.indices(length)
+        if step != 1:
+            raise TypeError('{} bands only support contiguous slices, not '
+                            '{!r}'.format(type(band).__name__, part))
+        ranges.append((start, max(start, stop)))
+    return key[:-2], ranges
+
+
+class Upsampled:
+    """
+    Band upsampled on demand by an integer factor.
+
+    The two last axes of ``array`` are the image rows and columns. Slicing \
+    an :class:`Upsampled` band returns the upsampled values of the slice \
+    only, reading the matching part of ``array``, so that \
+    :func:`sr2vgi.fused.execute` and the tiled and parallel executors, \
+    which read one block at a time, never hold the whole upsampled band.
+
+    :param array: Band at its native resolution.
+    :type array: numpy.ndarray
+    :param factor: Upsampling factor, e.g. 2 from 20 m to 10 m.
+    :type factor: int
+    :param method: ``nearest`` or ``bilinear``. Bilinear interpolation is \
+    aligned on pixel centers and clamped at the edges.
+    :type method: str
+    """
+
+    def __init__(self, array, factor, method='nearest'):
+        if method not in METHODS:
+            raise ValueError('Unknown resampling method {!r}, expected one '
+                             'of {}'.format(method, ', '.join(METHODS)))
+        if numpy.ndim(array) < 2:
+            raise ValueError('Cannot upsample an array of {} dimensions'
+                             .format(numpy.ndim(array)))
+        self.array = array
+        self.factor = int(factor)
+        self.method = method
+        self.shape = tuple(numpy.shape(array)[:-2]) + tuple(
+            length * self.factor for length in numpy.shape(array)[-2:])
+        self.dtype = array.dtype
+        if method == 'bilinear' and self.dtype.kind != 'f':
+            self.dtype = numpy.dtype('float64')
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return 'Upsampled({}, factor={}, method={!r})'.format(
+            self.shape, self.factor, self.method)
+
+    def __getitem__(self, key):
+        lead, ranges = _ranges(self, key)
+        ranges = [numpy.arange(start, stop) for start, stop in ranges]
+        if self.method == 'nearest':
+            # Sources read by blocks, like TIFF bands, only take slices.
+            rows, columns = (indices // self.factor for indices in ranges)
+            first = [indices[0] if indices.size else 0
+                     for indices in (rows, columns)]
+            source = self.array[lead + tuple(
+                slice(start, indices[-1] + 1 if indices.size else start)
+                for start, indices in zip(first, (rows, columns)))]
+            return source[..., (rows - first[0])[:, None],
+                          columns - first[1]]
+        return self._bilinear(lead, *ranges)
+
+    def _bilinear(self, lead, rows, columns):
+        (top, bottom, y), (left, right, x) = (
+            self._neighbours(indices, length) for indices, length in
+            zip((rows, columns), numpy.shape(self.array)[-2:]))
+
+        # Only the source rows and columns around the slice are read.
+        first = [low[0] if low.size else 0 for low in (top, left)]
+        source = self.array[lead + tuple(
+            slice(start, high[-1] + 1 if high.size else start)
+            for start, high in zip(first, (bottom, right)))]
+        top, bottom = top - first[0], bottom - first[0]
+        left, right = left - first[1], right - first[1]
+
+        y, x = y.astype(self.dtype)[:, None], x.astype(self.dtype)
+        upper = source[..., top, :].astype(self.dtype, copy=False)
+        lower = source[..., bottom, :].astype(self.dtype, copy=False)
+        upper = upper[..., left] + (upper[..., right] - upper[..., left]) * x
+        lower = lower[..., left] + (lower[..., right] - lower[..., left]) * x
+        return upper + (lower - upper) * y
+
+    def _neighbours(self, indices, length):
+        """Return the source pixels around ``indices`` and their weights."""
+        position = (indices + 0.5) / self.factor - 0.5
+        first = numpy.floor(position)
+        weight = position - first
+        first = first.astype(numpy.intp)
+        return (numpy.clip(first, 0, length - 1),
+                numpy.clip(first + 1, 0, length - 1), weight)
+
+
+registry.READERS += (Upsampled,)
+
+
+class Downsampled:
+    """
+    Band reader downsampled on demand by an integer factor.
+
+    The pixels kept are those nearest to the target pixel centers, as in \
+    the strided views :func:`resample` makes of arrays. Band readers, \
+    like :class:`sr2vgi.tiff.TiffBand`, cannot be viewed with strides: \
+    slicing a :class:`Downsampled` band reads the matching part of \
+    ``array`` only and keeps every ``factor``-th pixel of it.
+
+    :param array: Band at its native resolution.
+    :type array: sr2vgi.tiff.TiffBand
+    :param factor: Downsampling factor, e.g. 2 from 10 m to 20 m.
+    :type factor: int
+    """
+
+    def __init__(self, array, factor):
+        if numpy.ndim(array) < 2:
+            raise ValueError('Cannot downsample an array of {} dimensions'
+                             .format(numpy.ndim(array)))
+        self.array = array
+        self.factor = int(factor)
+        self.start = self.factor // 2
+        self.shape = tuple(numpy.shape(array)[:-2]) + tuple(
+            -(-(length - self.start) // self.factor)
+            for length in numpy.shape(array)[-2:])
+        self.dtype = array.dtype
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return 'Downsampled({}, factor={})'.format(self.shape, self.factor)
+
+    def __getitem__(self, key):
+        lead, ranges = _ranges(self, key)
+        source = self.array[lead + tuple(
+            slice(self.start + start * self.factor,
+                  self.start + (stop - 1) * self.factor + 1
+                  if stop > start else self.start + start * self.factor)
+            for start, stop in ranges)]
+        return source[..., ::self.factor, ::self.factor]
+
+
+registry.READERS += (Downsampled,)
+
+
+def _factor(native, target):
+    factor = max(native, target) / min(native, target)
+    if factor != int(factor):
+        raise ValueError('Cannot resample from {} to {}, the resolutions '
+                         'must be multiples of each other'.format(native,
+                                                                  target))
+    return int(factor)
+
+
+def resample(bands, resolution=10, method='nearest', resolutions=None):
+    """
+    Return the bands at a target resolution, without copies.
+
+    Coarser bands are wrapped in :class:`Upsampled`. Finer bands are \
+    downsampled by nearest neighbour, as strided views of the pixels \
+    nearest to the target pixel centers, or wrapped in \
+    :class:`Downsampled` for the band readers of \
+    :data:`sr2vgi.registry.READERS`.
+
+    :param bands: Band arrays at their native resolution, by name.
+    :type bands: dict
+    :param resolution: Target resolution in meters.
+    :type resolution: float
+    :param method: ``nearest`` or ``bilinear``, for upsampling.
+    :type method: str
+    :param resolutions: Native resolutions by band name, overriding \
+    :data:`RESOLUTIONS`.
+    :type resolutions: dict
+
+    :returns: Bands at the target resolution, by name, usable by \
+    :func:`sr2vgi.compute_many`, the index functions and the executors.
+    :rtype: dict
+    """
+
+    resolutions = dict(RESOLUTIONS, **(resolutions or {}))
+    result = {}
+    for band, array in bands.items():
+        native = resolutions.get(band, resolution)
+        factor = _factor(native, resolution)
+        if factor == 1:
+            result[band] = array
+        elif native > resolution:
+            result[band] = Upsampled(array, factor, method)
+        elif isinstance(array, registry.READERS):
+            result[band] = Downsampled(array, factor)
+        else:
+            start = factor // 2
+            result[band] = array[..., start::factor, start::factor]
+    return result
+
+
+def _chain(factors):
+    """Return the ratios of the increasing factors, each dividing the next."""
+
+    factors = sorted(set(factors) | {1})
+    for smaller, larger in zip(factors, factors[1:]):
+        if larger % smaller:
+            raise ValueError('Cannot broadcast resolutions with ratios {}, '
+                             'each must divide the next'.format(factors))
+    return factors, [larger // smaller for smaller, larger
+                     in zip(factors, factors[1:])]
+
+
+def views(bands):
+    """
+    View bands of different resolutions so that they broadcast together.
+
+    The image axes of every band, of ``H*f`` rows for a band ``f`` times \
+    finer than the coarsest one, are split into one axis per resolution \
+    step, e.g. rows of 10, 20 and 60 m bands become axes of lengths \
+    ``(H, 3, 2)``, ``(H, 3, 1)`` and ``(H, 1, 1)``. These are views of the \
+    bands, and NumPy broadcasting then repeats the coarse pixels like a \
+    nearest neighbour upsampling, with no copy.
+
+    :param bands: Band arrays at their native resolution, by name. The \
+    two last axes are the image rows and columns.
+    :type bands: dict
+
+    :returns: Views by band name, and the shape of the bands at the finest \
+    resolution, into which computed values are reshaped.
+    :rtype: tuple
+
+    :raises ValueError: If the resolutions are not multiples of each \
+    other, or an array cannot be viewed without a copy.
+    """
+
+    shapes = {band: numpy.shape(array) for band, array in bands.items()}
+    lead = numpy.broadcast_shapes(*(shape[:-2] for shape in shapes.values()))
+    fine = [max(shape[axis] for shape in shapes.values()) for axis in (-2, -1)]
+
+    axes = []
+    for axis, length in zip((-2, -1), fine):
+        factors = {}
+        for band, shape in shapes.items():
+            if length % shape[axis]:
+                raise ValueError('Band {} of shape {} is not a whole '
+                                 'fraction of the finest shape {}'.format(
+                                     band, shape, tuple(fine)))
+            factors[band] = length // shape[axis]
+        axes.append((factors, _chain(factors.values())))
+
+    result = {}
+    for band, array in bands.items():
+        shape = shapes[band][:-2]
+        for (factors, (steps, ratios)), length in zip(axes, fine):
+            coarse = length // steps[-1]
+            # Axes for the ratios from the coarsest step down to the finest,
+            # of length 1 below the resolution of the band.
+            shape += (coarse,) + tuple(
+                ratio if finer >= factors[band] else 1
+                for finer, ratio in reversed(list(zip(steps, ratios))))
+        try:
+            result[band] = _view(array, shape)
+        except AttributeError:
+            raise ValueError('Band {} cannot be viewed without a copy, make '
+                             'it contiguous first'.format(band)) from None
+    return result, tuple(lead) + tuple(fine)
+
+
+def _view(array, shape):
+    view = array.view()
+    view.shape = shape
+    return view
+
+
+def compute_many(bands, names=None, *, resolution=None, method='nearest',
+                 resolutions=None, params=None, out=None, **options):
+    """
+    Compute indexes from bands at their native resolutions.
+
+    :param bands: Band arrays at their native resolution, by name.
+    :type bands: dict
+    :param names: Indexes to compute, defaults to every index whose bands \
+    are present.
+    :type names: iterable of str
+    :param resolution: Target resolution in meters. Defaults to the \
+    finest resolution of the bands, computed on zero-copy broadcast views \
+    (see :func:`views`) unless ``method`` is ``bilinear``.
+    :type resolution: float
+    :param method: ``nearest`` or ``bilinear`` upsampling.
+    :type method: str
+    :param resolutions: Native resolutions by band name, overriding \
+    :data:`RESOLUTIONS`.
+    :type resolutions: dict
+    :param params: Parameters by index name, e.g. ``{'savirre': {'L': 1}}``.
+    :type params: dict
+    :param out: Contiguous arrays receiving the index values, by index \
+    name.
+    :type out: dict
+    :param options: ``dtype``, ``precision``, ``scaling``, ``where`` and \
+    ``fill_value`` options of :func:`sr2vgi.compute_many`. ``where`` may \
+    be at any band resolution when computing on views, and is otherwise \
+    at the target resolution, unless given in ``resolutions``.
+
+    :returns: Index values by name, at the target resolution.
+    :rtype: dict
+    """
+
+    if names is None:
+        names = registry.available(bands)
+
+    where = options.pop('where', None)
+    if resolution is not None or method != 'nearest':
+        if resolution is None:
+            native = dict(RESOLUTIONS, **(resolutions or {}))
+            resolution = min(native.get(band, 10) for band in bands)
+        if where is not None:
+            where = resample({'where': where}, resolution, 'nearest',
+                             resolutions)['where']
+        return registry.compute_many(
+            resample(bands, resolution, method, resolutions), names,
+            params=params, out=out, where=where, **options)
+
+    batch = registry.plan(names, params)
+    arrays = {band: bands[band] for band in batch.bands}
+    if where is not None:
+        arrays['where'] = numpy.asarray(where)
+    viewed, shape = views(arrays)
+    where = viewed.pop('where', None)
+    broadcast = numpy.broadcast_shapes(*(view.shape
+                                         for view in viewed.values()))
+    out = {name: _view(array, broadcast)
+           for name, array in (out or {}).items()}
+    values = registry.compute_many(viewed, names, params=params, out=out,
+                                   where=where, **options)
+    return {name: _view(value, shape) for name, value in values.items()}
@@ -0,0 +1,278 @@
+"""
+Sentinel-2 L2A products in the SAFE format.
+
+.. code-block:: python
+
+    import sr2vgi
+
+    product = sr2vgi.open_safe('S2A_MSIL2A_20200101T132231_..._T23KMQ.SAFE')
+    values = product.compute_many(['ndvi', 'nbr'])
+
+Opening a product only lists its band files. The bands an index needs \
+are opened when it is computed, at their native resolution or at the \
+requested one, and the others are never read: ``ndvi`` and ``nbr`` only \
+read ``b4``, ``b8`` and ``b12``. GeoTIFF band files are read tile by tile \
+(see :mod:`sr2vgi.tiff`); JPEG 2000 ones, as distributed, require \
+:mod:`imagecodecs` (``pip install sr2vgi[safe]``) and are decoded whole, \
+once, in threads, when the first block is read, so each of them holds a \
+full band in memory until it is closed (see :class:`Jp2Band`). \
+Reflectances are decoded with the offset and quantification value of the \
+product metadata.
+"""
+
+import glob
+import os
+import re
+import struct
+import threading
+import xml.etree.ElementTree as ElementTree
+
+import numpy
+
+from . import registry
+from . import resample as _resample
+from .scaling import SENTINEL2_L2A_LEGACY, Scaling
+
+try:
+    import imagecodecs
+except ImportError:
+    imagecodecs = None
+
+
+# Band files of the IMG_DATA directories, e.g. T23KMQ_20200101T132231_B8A_20m.
+_BAND_FILE = re.compile(r'_B(\d[\dA])_(\d+)m\.(jp2|tif)$', re.IGNORECASE)
+
+
+def _jp2_header(path):
+    """Shape and data type of the image of a JPEG 2000 file."""
+
+    with open(path, 'rb') as file:
+        head = file.read(4096)
+    position = head.find(b'ihdr')
+    if position < 0:
+        raise ValueError('{} is not a JPEG 2000 file'.format(path))
+    height, width, components, depth = struct.unpack(
+        '>IIHB', head[position + 4:position + 15])
+    bits = (depth & 0x7f) + 1
+    kind = 'i' if depth & 0x80 else 'u'
+    shape = (height, width) if components == 1 else \
+        (height, width, components)
+    return shape, numpy.dtype('{}{}'.format(kind, -(-bits // 8)))
+
+
+class Jp2Band:
+    """
+    Band of a JPEG 2000 file, decoded when first read.
+
+    The whole image is decoded by the first read, under a lock so that \
+    concurrent reads decode it once, and kept for the next ones until \
+    :meth:`close`. Memory use is thus that of the full band, whatever the \
+    size of the blocks read.
+
+    :param path: Path of the file.
+    :type path: str
+    :param threads: Number of threads decoding the file, defaults to the \
+    number of CPUs.
+    :type threads: int
+    """
+
+    def __init__(self, path, threads=None):
+        self.path = path
+        self.threads = threads or os.cpu_count()
+        self.shape, self.dtype = _jp2_header(path)
+        self.values = None
+        self.lock = threading.Lock()
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return 'Jp2Band({!r}, shape={})'.format(
+            os.path.basename(self.path), self.shape)
+
+    def __getitem__(self, key):
+        values = self.values
+        if values is None:
+            with self.lock:
+                if self.values is None:
+                    self.values = self._decode()
+                values = self.values
+        return values[key]
+
+    def _decode(self):
+        if imagecodecs is None:
+            raise ImportError('Reading JPEG 2000 bands requires imagecodecs, '
+                              'install it with pip install sr2vgi[safe]')
+        with open(self.path, 'rb') as file:
+            return imagecodecs.jpeg2k_decode(file.read(),
+                                             numthreads=self.threads)
+
+    def close(self):
+        """Free the decoded image, decoded again if the band is read."""
+        with self.lock:
+            self.values = None
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[...]
+        return values if dtype is None else values.astype(dtype)
+
+
+registry.READERS += (Jp2Band,)
+
+
+def _open(path):
+    """Open a band file, GeoTIFF or JPEG 2000."""
+    if path.lower().endswith('.tif'):
+        from .tiff import TiffBand, _Reader
+        return TiffBand(_Reader(path))
+    return Jp2Band(path)
+
+
+def _scaling(path):
+    """Reflectance scaling of the product metadata, by band name."""
+
+    files = glob.glob(os.path.join(path, 'MTD_MSIL2A.xml'))
+    if not files:
+        return SENTINEL2_L2A_LEGACY
+    root = ElementTree.parse(files[0]).getroot()
+    quantification = next((float(node.text) for node in root.iter()
+                           if node.tag.endswith('BOA_QUANTIFICATION_VALUE')),
+                          10000.0)
+    offsets = {}
+    for node in root.iter():
+        if node.tag.endswith('BOA_ADD_OFFSET'):
+            offsets[int(node.get('band_id'))] = float(node.text)
+    if not offsets:
+        return Scaling(1 / quantification, 0.0)
+    # band_id counts the bands b1 to b12 with b8a after b8, like BANDS.
+    return {band: Scaling(1 / quantification,
+                          offsets.get(index, 0.0) / quantification)
+            for index, band in enumerate(registry.BANDS)}
+
+
+class Safe:
+    """
+    Sentinel-2 L2A product, see :func:`open_safe`.
+
+    :param path: Path of the ``.SAFE`` directory.
+    :type path: str
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        pattern = os.path.join(path, 'GRANULE', '*', 'IMG_DATA', 'R*m', '*')
+        for name in sorted(glob.glob(pattern)):
+            match = _BAND_FILE.search(name)
+            if match:
+                band = 'b' + match.group(1).lstrip('0').lower()
+                self.files.setdefault(band, {})[int(match.group(2))] = name
+        if not self.files:
+            raise ValueError('No L2A band files in {}'.format(path))
+        self.scaling = _scaling(path)
+
+    def __repr__(self):
+        return 'Safe({!r}, bands={})'.format(
+            os.path.basename(os.path.normpath(self.path)),
+            [band for band in registry.BANDS if band in self.files])
+
+    @property
+    def resolutions(self):
+        """Native resolution of each band, its finest one."""
+        return {band: min(files) for band, files in self.files.items()}
+
+    def bands(self, names=None, resolution=None, method='nearest'):
+        """
+        Open the bands needed by indexes.
+
+        :param names: Indexes, defaults to all the bands of the product.
+        :type names: iterable of str
+        :param resolution: Resolution of the bands in meters. Bands are \
+        read from the files at that resolution when the product has one, \
+        and resampled otherwise (see :func:`sr2vgi.resample.resample`). \
+        Defaults to the native resolution of each band.
+        :type resolution: float
+        :param method: ``nearest`` or ``bilinear`` upsampling.
+        :type method: str
+
+        :returns: Band objects by name, read block by block.
+        :rtype: dict
+
+        :raises KeyError: If the product lacks a band.
+        """
+
+        needed = registry.required_bands(names) if names is not None \
+            else [band for band in registry.BANDS if band in self.files]
+        missing = [band for band in needed if band not in self.files]
+        if missing:
+            raise KeyError('Missing bands {} in {}'.format(
+                ', '.join(missing), self.path))
+
+        result = {}
+        for band in needed:
+            files = self.files[band]
+            if resolution in files:
+                result[band] = _open(files[resolution])
+                continue
+            native = min(files)
+            result[band] = _open(files[native])
+            if resolution is not None:
+                result.update(_resample.resample(
+                    {band: result[band]}, resolution, method,
+                    {band: native}))
+        return result
+
+    def compute_many(self, names, *, resolution=None, method='nearest',
+                     params=None, out=None, **options):
+        """
+        Compute indexes from the bands they need only.
+
+        :param names: Indexes to compute.
+        :type names: iterable of str
+        :param resolution: Resolution of the results in meters, defaults to \
+        the finest native resolution of the bands needed.
+        :type resolution: float
+        :param method: ``nearest`` or ``bilinear`` upsampling.
+        :type method: str
+        :param params: Parameters by index name.
+        :type params: dict
+        :param out: Arrays receiving the index values, by index name.
+        :type out: dict
+        :param options: Options of :func:`sr2vgi.registry.compute_many`. \
+        ``scaling`` defaults to that of the product.
+
+        :returns: Index values by name.
+        :rtype: dict
+        """
+
+        names = list(names)
+        if resolution is None:
+            resolutions = self.resolutions
+            resolution = min(resolutions[band]
+                             for band in registry.required_bands(names))
+        options.setdefault('scaling', self.scaling)
+        return registry.compute_many(self.bands(names, resolution, method),
+                                     names, params=params, out=out,
+                                     **options)
+
+
+def open_safe(path):
+    """
+    Open a Sentinel-2 L2A product in the SAFE format.
+
+    Only the names of the band files are read, per band and resolution.
+
+    :param path: Path of the ``.SAFE`` directory.
+    :type path: str
+
+    :returns: Product
+    :rtype: Safe
+
+    :raises ValueError: If the directory holds no L2A band file.
+    """
+
+    return Safe(path)
@@ -0,0 +1,52 @@
+import collections
+
+
+Scaling = collections.namedtuple('Scaling', ['scale', 'offset'])
+Scaling.__doc__ = """
+Linear decoding of digital numbers: ``reflectance = DN * scale + offset``.
+
+Index functions accept it as ``scaling=`` and decode integer bands block by \
+block while computing, so decoded floating bands never exist in full.
+"""
+
+# Sentinel-2 L2A since processing baseline 04.00: (DN - 1000) / 10000.
+SENTINEL2_L2A = Scaling(0.0001, -0.1)
+
+# Sentinel-2 L2A before processing baseline 04.00: DN / 10000.
+SENTINEL2_L2A_LEGACY = Scaling(0.0001, 0.0)
+
+# Landsat Collection 2 Level-2 surface reflectance.
+LANDSAT_C2_L2 = Scaling(0.0000275, -0.2)
+
+PRESETS = {
+    'sentinel2-l2a': SENTINEL2_L2A,
+    'sentinel2-l2a-legacy': SENTINEL2_L2A_LEGACY,
+    'landsat-c2-l2': LANDSAT_C2_L2,
+}
+
+
+def get(scaling, bands):
+    """
+    Return the scaling of each band.
+
+    :param scaling: A single scaling for all the bands, a preset name of \
+    :data:`PRESETS`, or scalings by band name.
+    :type scaling: Scaling or str or dict
+    :param bands: Band names.
+    :type bands: iterable of str
+
+    :returns: Scaling by band name, for the scaled bands only.
+    :rtype: dict
+    """
+
+    if scaling is None:
+        return {}
+    if isinstance(scaling, str):
+        if scaling not in PRESETS:
+            raise KeyError('Unknown scaling {!r}, expected one of {}'.format(
+                scaling, ', '.join(PRESETS)))
+        scaling = PRESETS[scaling]
+    if isinstance(scaling, dict):
+        return {band: Scaling(*scaling[band]) for band in bands
+                if scaling.get(band) is not None}
+    return {band: Scaling(*scaling) for band in bands}
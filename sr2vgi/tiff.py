@@ -0,0 +1,402 @@
+"""
+Tiled GeoTIFF bands, read and written by whole tiles.
+
+Requires :mod:`tifffile` (``pip install sr2vgi[tiff]``).
+
+.. code-block:: python
+
+    from sr2vgi import tiff
+
+    paths = {'b4': 'T23KMQ_B04.tif', 'b8': 'T23KMQ_B08.tif'}
+    with tiff.load(paths) as bands:
+        tiff.compute_many(bands, 'indexes.tif', ['ndvi', 'gndvi'])
+
+Bands are :class:`TiffBand` objects, which decode only the internal tiles \
+under the block being read, several at a time in threads, and keep the \
+last ones decoded so that blocks smaller than a tile do not decode it \
+again. They can be given to the index functions like arrays. \
+:func:`compute_many` goes further and processes the bands tile by tile, \
+writing a tiled, compressed GeoTIFF with the tiling and georeferencing of \
+the input, so every tile is read, decoded and encoded exactly once.
+"""
+
+import collections
+import concurrent.futures
+import os
+import threading
+import weakref
+
+import numpy
+
+from . import encoding as _encoding
+from . import registry
+from .fused import dtypes
+from .tiled import _encodings, _options
+
+try:
+    import tifffile
+except ImportError:
+    tifffile = None
+
+
+# Tags of the georeferencing, copied from the input into the output.
+GEOTIFF_TAGS = (33550, 33922, 34264, 34735, 34736, 34737)
+
+# GDAL tags of the band descriptions and of the nodata value.
+_GDAL_METADATA = 42112
+_GDAL_NODATA = 42113
+
+# Tile shape of outputs of bands that are not tiled.
+TILE = (256, 256)
+
+
+def _require():
+    if tifffile is None:
+        raise ImportError('Reading and writing GeoTIFF files requires '
+                          'tifffile, install it with pip install sr2vgi[tiff]')
+
+
+class _Reader:
+    """Tiles of the first image of a TIFF file, decoded on demand."""
+
+    def __init__(self, path, workers=None):
+        _require()
+        self.file = tifffile.TiffFile(path)
+        self.page = self.file.pages[0]
+        self.shape = tuple(self.page.shape[:2]) if \
+            self.page.planarconfig != 2 or self.page.samplesperpixel == 1 \
+            else tuple(self.page.shape[1:3])
+        self.samples = self.page.samplesperpixel
+        self.dtype = self.page.dtype
+        self.tile = (self.page.tilelength, self.page.tilewidth) \
+            if self.page.is_tiled else (self.page.rowsperstrip,
+                                        self.shape[1])
+        self.across = -(-self.shape[1] // self.tile[1])
+        self.down = -(-self.shape[0] // self.tile[0])
+        self.workers = workers or os.cpu_count()
+        # Decoded tiles of about two rows of tiles are kept.
+        self.capacity = 2 * self.across * (self.samples
+                                           if self.separate else 1)
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = None
+        # Closes the file of a reader collected without being closed.
+        self._finalizer = weakref.finalize(self, self.file.close)
+
+    @property
+    def separate(self):
+        return self.page.planarconfig == 2 and self.samples > 1
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+        self._finalizer()
+
+    def _decode(self, item):
+        data, index = item
+        return self.page.decode(data, index,
+                                jpegtables=self.page.jpegtables)[0]
+
+    def tiles(self, indices):
+        """Return the decoded tiles of the given indices, by index."""
+
+        with self.lock:
+            found = {index: self.cache[index] for index in indices
+                     if index in self.cache}
+            missing = [index for index in indices if index not in found]
+            segments = list(self.file.filehandle.read_segments(
+                [self.page.dataoffsets[index] for index in missing],
+                [self.page.databytecounts[index] for index in missing],
+                indices=missing, sort=True)) if missing else []
+
+        if len(segments) > 1 and self.workers > 1:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(
+                    self.workers)
+            decoded = list(self.executor.map(self._decode, segments))
+        else:
+            decoded = [self._decode(segment) for segment in segments]
+
+        with self.lock:
+            for (_, index), tile in zip(segments, decoded):
+                found[index] = self.cache[index] = tile
+            for index in indices:
+                if index in self.cache:
+                    self.cache.move_to_end(index)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+        return found
+
+    def read(self, rows, columns, sample):
+        """Read the pixels of a sample under contiguous slices."""
+
+        (top, bottom), (left, right) = ((part.start, part.stop)
+                                        for part in (rows, columns))
+        out = numpy.empty((max(bottom - top, 0), max(right - left, 0)),
+                          self.dtype)
+        if not out.size:
+            return out
+
+        height, width = self.tile
+        plane = sample * self.across * self.down if self.separate else 0
+        positions = {plane + row * self.across + column: (row, column)
+                     for row in range(top // height, -(-bottom // height))
+                     for column in range(left // width, -(-right // width))}
+        for index, tile in self.tiles(list(positions)).items():
+            row, column = positions[index]
+            tile = tile.reshape(tile.shape[-3:])[..., 0 if self.separate
+                                                 else sample]
+            y, x = row * height, column * width
+            source = (slice(max(top - y, 0), min(bottom - y, height)),
+                      slice(max(left - x, 0), min(right - x, width)))
+            target = (slice(max(y - top, 0), max(y - top, 0) +
+                            source[0].stop - source[0].start),
+                      slice(max(x - left, 0), max(x - left, 0) +
+                            source[1].stop - source[1].start))
+            out[target] = tile[source]
+        return out
+
+
+class TiffBand:
+    """
+    Band of a TIFF file, read by whole internal tiles.
+
+    Slicing a :class:`TiffBand` decodes the tiles under the slice only, \
+    so :func:`sr2vgi.fused.execute` and the tiled and parallel executors \
+    read the file block by block. Use :func:`load` to open the bands.
+
+    :param reader: Tiles of the file.
+    :type reader: _Reader
+    :param sample: Index of the band among the samples of the file.
+    :type sample: int
+    """
+
+    def __init__(self, reader, sample=0):
+        self.reader = reader
+        self.sample = sample
+        self.shape = reader.shape
+        self.dtype = reader.dtype
+        self.tile = reader.tile
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return 'TiffBand({!r}, sample={}, shape={}, tile={})'.format(
+            self.reader.file.filename, self.sample, self.shape, self.tile)
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        if len(key) > self.ndim or not all(isinstance(part, slice)
+                                           for part in key):
+            raise TypeError('TIFF bands only support slices, not '
+                            '{!r}'.format(key))
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        ranges = []
+        for part, length in zip(key, self.shape):
+            start, stop, step = part.indices(length)
+            if step != 1:
+                raise TypeError('TIFF bands only support contiguous '
+                                'slices, not {!r}'.format(part))
+            ranges.append(slice(start, max(start, stop)))
+        return self.reader.read(*ranges, self.sample)
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:, :]
+        return values if dtype is None else values.astype(dtype)
+
+    def tags(self):
+        """Return the tags of the file, by code."""
+        return {tag.code: tag for tag in self.reader.page.tags.values()}
+
+
+registry.READERS += (TiffBand,)
+
+
+def _descriptions(page):
+    """Band descriptions of the GDAL metadata of a page, by sample."""
+
+    tag = page.tags.get(_GDAL_METADATA)
+    if tag is None:
+        return {}
+    import xml.etree.ElementTree as ElementTree
+    return {int(item.get('sample', 0)): item.text
+            for item in ElementTree.fromstring(tag.value)
+            if item.get('role') == 'description'}
+
+
+class Bands(dict):
+    """
+    Bands by name, whose files are closed at the end of a ``with`` block.
+
+    .. code-block:: python
+
+        with tiff.load('T23KMQ.tif') as bands:
+            ndvi = vgi.ndvi(bands['b4'], bands['b8'])
+
+    Bands not closed have their files closed when they are garbage \
+    collected.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        close(self)
+
+
+def load(paths, names=None, workers=None):
+    """
+    Open the bands of TIFF files.
+
+    :param paths: A TIFF file holding a band per sample, or single band \
+    files by band name.
+    :type paths: str or dict
+    :param names: Band names of the samples of a multi-band file, in \
+    order. Default to the band descriptions of its GDAL metadata.
+    :type names: list of str
+    :param workers: Number of threads decoding the tiles of a block, \
+    defaults to the number of CPUs.
+    :type workers: int
+
+    :returns: Band objects by name, ready for the index functions, to \
+    close with :func:`close` or in a ``with`` block.
+    :rtype: Bands
+
+    :raises ValueError: If the band names of a multi-band file are \
+    unknown.
+    """
+
+    if isinstance(paths, dict):
+        return Bands((band, TiffBand(_Reader(path, workers)))
+                     for band, path in paths.items())
+
+    reader = _Reader(paths, workers)
+    if names is None:
+        descriptions = _descriptions(reader.page)
+        names = [descriptions.get(sample)
+                 for sample in range(reader.samples)]
+    if len(names) != reader.samples or None in names:
+        reader.close()
+        raise ValueError('Give the names of the {} bands of {}'.format(
+            reader.samples, paths))
+    return Bands((name.lower() if name.lower() in registry.BANDS else name,
+                  TiffBand(reader, sample))
+                 for sample, name in enumerate(names))
+
+
+def close(bands):
+    """Close the files of bands opened by :func:`load`."""
+    for reader in {id(band.reader): band.reader for band in bands.values()
+                   if isinstance(band, TiffBand)}.values():
+        reader.close()
+
+
+def _metadata(names):
+    items = ''.join('<Item name="DESCRIPTION" sample="{}" role="description">'
+                    '{}</Item>'.format(sample, name)
+                    for sample, name in enumerate(names))
+    return '<GDALMetadata>{}</GDALMetadata>'.format(items)
+
+
+def compute_many(bands, path, names=None, *, params=None, compression='zlib',
+                 workers=None, **options):
+    """
+    Compute indexes tile by tile into a tiled GeoTIFF file.
+
+    Processing blocks are the internal tiles of the first :class:`TiffBand` \
+    of the bands (or of :data:`TILE` for other arrays), so each tile of \
+    every band is decoded once. The tiles of a row are computed by a pool \
+    of threads, then compressed and written in order, with a sample per \
+    index, the tiling and georeferencing of the input, and the index names \
+    as GDAL band descriptions.
+
+    :param bands: Band arrays or :class:`TiffBand` by name, of the same \
+    shape.
+    :type bands: dict
+    :param path: Path of the GeoTIFF file to create.
+    :type path: str
+    :param names: Indexes to compute. Defaults to every index whose bands \
+    are present.
+    :type names: iterable of str
+    :param params: Parameters by index name.
+    :type params: dict
+    :param compression: Compression of :func:`tifffile.imwrite`.
+    :type compression: str
+    :param workers: Number of threads, defaults to the number of CPUs.
+    :type workers: int
+    :param options: Options of :func:`sr2vgi.registry.compute_many`. All \
+    the indexes are stored in one data type, the computation one or that \
+    of their ``encoding``, whose ``nodata`` is written as GDAL nodata.
+
+    :returns: Path of the file.
+    :rtype: str
+    """
+
+    _require()
+    if names is None:
+        names = registry.available(bands)
+    names = [registry.get(name).name for name in names]
+    batch = registry.plan(names, params)
+    inputs = {band: bands[band] for band in batch.bands}
+    shapes = {numpy.shape(array) for array in inputs.values()}
+    if len(shapes) != 1 or len(next(iter(shapes))) != 2:
+        raise ValueError('Bands must be 2-D and of the same shape, not '
+                         '{}'.format(', '.join(map(str, shapes))))
+    shape = shapes.pop()
+
+    _, dtype = dtypes(inputs.values(), options.get('dtype'),
+                      options.get('precision'))
+    options, types = _encodings(names, options)
+    kinds = {types.get(name, dtype) for name in names}
+    if len(kinds) > 1:
+        raise ValueError('A GeoTIFF file holds values of one type, not '
+                         '{}'.format(', '.join(sorted(kind.name
+                                                      for kind in kinds))))
+    kind = kinds.pop()
+
+    tiled = [band for band in inputs.values() if isinstance(band, TiffBand)]
+    tile = tiled[0].tile if tiled and tiled[0].reader.page.is_tiled \
+        else TILE
+    tags = [(_GDAL_METADATA, 's', 0, _metadata(names), True)]
+    if tiled:
+        tags.extend((tag.code, int(tag.dtype), tag.count, tag.value, True)
+                    for code, tag in tiled[0].tags().items()
+                    if code in GEOTIFF_TAGS)
+    nodata = {_encoding.nodata(value)
+              for value in options['encoding'].values()}
+    if len(nodata) == 1 and len(options['encoding']) == len(names):
+        tags.append((_GDAL_NODATA, 's', 0, str(nodata.pop()), True))
+
+    def compute(window):
+        values = registry.compute_many(
+            {band: array[window] for band, array in inputs.items()}, names,
+            params, **_options(options, window, 2))
+        block = numpy.zeros(tile + (len(names),), kind)
+        for sample, name in enumerate(names):
+            block[:values[name].shape[0], :values[name].shape[1],
+                  sample] = values[name]
+        return block if len(names) > 1 else block[..., 0]
+
+    def tiles(executor):
+        for top in range(0, shape[0], tile[0]):
+            # One row of tiles at a time bounds the memory held.
+            yield from executor.map(compute, [
+                (slice(top, top + tile[0]), slice(left, left + tile[1]))
+                for left in range(0, shape[1], tile[1])])
+
+    size = shape[0] * shape[1] * len(names) * kind.itemsize
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        tifffile.imwrite(path, tiles(executor), shape=shape + (
+                         (len(names),) if len(names) > 1 else ()),
+                         dtype=kind, tile=tile, compression=compression,
+                         photometric='minisblack', planarconfig='contig'
+                         if len(names) > 1 else None,
+                         metadata=None, extratags=tags,
+                         bigtiff=size > 2 ** 32 - 2 ** 25)
+    return path
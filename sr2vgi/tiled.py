@@ -0,0 +1,167 @@
+import itertools
+
+import numpy
+
+from . import encoding as _encoding
+from . import registry
+from .fused import dtypes
+
+
+# Default number of rows of a strip.
+BLOCK_ROWS = 512
+
+
+def windows(shape, block=BLOCK_ROWS):
+    """
+    Yield the windows covering an array of the given shape.
+
+    :param shape: Shape of the array.
+    :type shape: tuple
+    :param block: Number of rows of a strip, or the shape of a block over \
+    the leading axes, e.g. ``(1024, 1024)`` for 2-D blocks.
+    :type block: int or tuple
+
+    :returns: Tuples of slices, one per blocked axis.
+    """
+
+    block = (block,) if isinstance(block, int) else tuple(block)
+    if len(block) > len(shape):
+        raise ValueError('Block {} has more axes than the array {}'.format(
+            block, shape))
+
+    ranges = [range(0, length, size) for length, size in zip(shape, block)]
+    for starts in itertools.product(*ranges):
+        yield tuple(slice(start, min(start + size, length)) for start, size,
+                    length in zip(starts, block, shape))
+
+
+def read(array, window, ndim):
+    """
+    Return the part of ``array`` under ``window``.
+
+    ``array`` is broadcast against an array of ``ndim`` dimensions, its \
+    axes aligned on the last ones, so a 2-D mask of a cube is sliced by \
+    the spatial part of the window. Axes it does not have, or has with \
+    length 1, are not sliced.
+    """
+
+    shape = numpy.shape(array)
+    offset = ndim - len(shape)
+    if not shape or offset < 0:
+        return array
+    return array[tuple(window[offset + axis]
+                       if offset + axis < len(window) and length != 1
+                       else slice(None) for axis, length in enumerate(shape))]
+
+
+def _options(options, window, ndim):
+    """Options of the block under ``window``, with its part of ``where``."""
+    if options.get('where') is None:
+        return options
+    return dict(options, where=read(options['where'], window, ndim))
+
+
+def _encodings(names, options):
+    """Options with the encodings of ``names`` resolved, and their types."""
+    encodings = _encoding.get(options.get('encoding'), {
+        name: registry.get(name).valid_range for name in names})
+    return dict(options, encoding=encodings), {
+        name: numpy.dtype(value.dtype) for name, value in encodings.items()}
+
+
+def _output(target, shape, dtype):
+    if isinstance(target, str):
+        return numpy.lib.format.open_memmap(target, mode='w+', dtype=dtype,
+                                            shape=shape)
+    return target
+
+
+def _shape(bands, names):
+    return numpy.broadcast_shapes(*(numpy.shape(bands[band])
+                                    for band in names))
+
+
+def compute(function, bands, out, block=BLOCK_ROWS, **kwargs):
+    """
+    Compute an index block by block, writing into ``out``.
+
+    Bands are typically :class:`numpy.memmap` arrays, or ``.npy`` files \
+    opened with ``numpy.load(path, mmap_mode='r')``. Only one block of \
+    every band is read at a time and the index function is called on it \
+    with ``out=`` set to the same block of the output, so memory use is \
+    bounded by the block size whatever the raster size. Index formulas \
+    are pixel-wise, hence the result is identical to the whole-array call.
+
+    :param function: Index function of :mod:`sr2vgi.vgi` or index name.
+    :type function: callable or str
+    :param bands: Band arrays by name.
+    :type bands: dict
+    :param out: Output array, or the path of a ``.npy`` file to create.
+    :type out: numpy.ndarray or str
+    :param block: Number of rows of a strip, or the shape of a block over \
+    the leading axes.
+    :type block: int or tuple
+    :param kwargs: Parameters of the index and options of the index \
+    functions (``dtype``, ``precision``, ``scaling``...).
+
+    :returns: The output array.
+    """
+
+    spec = registry.get(function if isinstance(function, str)
+                        else function.__name__)
+    shape = _shape(bands, spec.bands)
+    _, dtype = dtypes([bands[band] for band in spec.bands],
+                      kwargs.get('dtype'), kwargs.get('precision'))
+    kwargs, types = _encodings([spec.name], kwargs)
+    out = _output(out, shape, types.get(spec.name, dtype))
+
+    for window in windows(shape, block):
+        spec.compute({band: read(bands[band], window, len(shape))
+                      for band in spec.bands},
+                     out=out[window], **_options(kwargs, window, len(shape)))
+    return out
+
+
+def compute_many(bands, out, names=None, *, params=None, block=BLOCK_ROWS,
+                 **options):
+    """
+    Compute several indexes block by block, writing into ``out``.
+
+    Like :func:`compute`, with every block evaluated by \
+    :func:`sr2vgi.registry.compute_many`.
+
+    :param bands: Band arrays by name.
+    :type bands: dict
+    :param out: Output arrays, or paths of ``.npy`` files to create, by \
+    index name.
+    :type out: dict
+    :param names: Indexes to compute. Defaults to the keys of ``out``.
+    :type names: iterable of str
+    :param params: Parameters by index name.
+    :type params: dict
+    :param block: Number of rows of a strip, or the shape of a block over \
+    the leading axes.
+    :type block: int or tuple
+    :param options: Options of :func:`sr2vgi.registry.compute_many`.
+
+    :returns: Output arrays by index name.
+    :rtype: dict
+    """
+
+    names = list(out) if names is None else list(names)
+    batch = registry.plan(names, params)
+    shape = _shape(bands, batch.bands)
+    _, dtype = dtypes([bands[band] for band in batch.bands],
+                      options.get('dtype'), options.get('precision'))
+    options, types = _encodings(batch.outputs, options)
+    out = {registry.get(name).name: _output(
+        out[name], shape, types.get(registry.get(name).name, dtype))
+        for name in names}
+
+    for window in windows(shape, block):
+        registry.compute_many({band: read(bands[band], window, len(shape))
+                               for band in batch.bands}, list(out), params,
+                              out={name: array[window]
+                                   for name, array in out.items()},
+                              **_options(options, window, len(shape)))
+    return out
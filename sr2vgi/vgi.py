@@ -1,6 +1,10 @@
 import numpy
 
+from .kernels import normalized_difference
+from .registry import index
 
+
+@index(valid_range=(-1.0, 1.0))
 def evi(b2, b4, b8):
     """
     Enhanced Vegetation Index (Huete et al., 2002).
@@ -29,6 +33,7 @@ def evi(b2, b4, b8):
     return EVI
 
 
+@index
 def ndvi(b4, b8):
     """
     Normalized Difference Vegetation Index (Rouse Jr et al., 1974).
@@ -51,10 +56,11 @@ def ndvi(b4, b8):
 
     """
 
-    NDVI = (b8 - b4)/(b8 + b4)
+    NDVI = normalized_difference(b8, b4)
     return NDVI
 
 
+@index
 def ndwi_gao(b8, b11):
     """
     Normalized Difference Water Index (Gao, 1996).
@@ -76,10 +82,11 @@ def ndwi_gao(b8, b11):
 
     """
 
-    NDWI = (b8 - b11)/(b8 + b11)
+    NDWI = normalized_difference(b8, b11)
     return NDWI
 
 
+@index
 def ndwi_mcfeeters(b3, b8):
     """
     Normalized Difference Water Index (McFeeters, 1996).
@@ -100,10 +107,11 @@ def ndwi_mcfeeters(b3, b8):
         Journal of Remote Sensing 17(7), 1425-1432. \
         doi:10.1080/01431169608948714.
     """
-    NDWI = (b3 - b8)/(b3 + b8)
+    NDWI = normalized_difference(b3, b8)
     return NDWI
 
 
+@index(valid_range=(-1.0, 1.0))
 def savi(b4, b8):
     """
     Soil-Adjusted Vegetation Index (Huete, 1988).
@@ -128,6 +136,7 @@ def savi(b4, b8):
     return SAVI
 
 
+@index(valid_range=(-0.36, 1.25))
 def evi2(b2, b4, b8):
     """
     Enhanced Vegetation Index-2 (Jiang et al., 2008).
@@ -155,6 +164,7 @@ def evi2(b2, b4, b8):
     return EVI2
 
 
+@index
 def gndvi(b3, b8):
     """
     Green Normalized Difference Vegetation Index \
@@ -177,10 +187,11 @@ def gndvi(b3, b8):
         doi:10.1016/s0034-4257(96)00072-7.
     """
 
-    GNDVI = (b8 - b3) / (b8 + b3)
+    GNDVI = normalized_difference(b8, b3)
     return GNDVI
 
 
+@index(valid_range=(-1.0, 1.0))
 def msavi(b5, b8):
     """
     Modified Soil-Adjusted Vegetation Index (Qi et al., 1994).
@@ -205,6 +216,7 @@ def msavi(b5, b8):
     return MSAVI
 
 
+@index
 def osavi(b4, b8):
     """
     Optimized Soil-Adjusted Vegetation Index \
@@ -231,6 +243,7 @@ def osavi(b4, b8):
     return OSAVI
 
 
+@index
 def afri_16(b8a, b11):
     """
     Aerosol Free Vegetation Index 1.6 \
@@ -256,6 +269,7 @@ def afri_16(b8a, b11):
     return AFRI_16
 
 
+@index
 def ari(b3, b5):
     """
     Anthocyanin Reflectance Index (Gitelson, Chivkunova and Merzlyak, 2009).
@@ -280,6 +294,7 @@ def ari(b3, b5):
     return ARI
 
 
+@index(valid_range=(-1.0, 2.0))
 def avi(b4, b8a):
     """
     Ashburn Vegetation Index (Ashburn, 1978).
@@ -304,6 +319,7 @@ def avi(b4, b8a):
     return AVI
 
 
+@index
 def bai(b4, b6, b7, b8a, b12):
     """
     Burned Area Index for Sentinel-2 (Filipponi, 2018).
@@ -337,6 +353,7 @@ def bai(b4, b6, b7, b8a, b12):
     return BAI
 
 
+@index
 def cigreen(b3, b8):
     """
     Chlorophyll Index Green (Gitelson et al., 2003a).
@@ -363,6 +380,7 @@ def cigreen(b3, b8):
     return CIGREEN
 
 
+@index
 def cire(b5, b7):
     """
     Chlorophyll Index Red-edge (Gitelson et al., 2003a).
@@ -389,6 +407,7 @@ def cire(b5, b7):
     return CIRE
 
 
+@index
 def cired_re(b4, b5, b8, a=0.7):
     """
     Red and Red-edge Modified Chlorophyll Index (Xie et al. 2018).
@@ -419,6 +438,7 @@ def cired_re(b4, b5, b8, a=0.7):
     return CIREDRE
 
 
+@index
 def cri700(b2, b5):
     """
     Carotenoid Reflectance Index 700 (Gitelson, Merzlyak, and Chivkunova, \
@@ -445,6 +465,7 @@ def cri700(b2, b5):
     return CRI700
 
 
+@index
 def cvi(b3, b4, b8):
     """
     Chlorophyll Vegetation Index (Hunt et al., 2011).
@@ -471,6 +492,7 @@ def cvi(b3, b4, b8):
     return CVI
 
 
+@index
 def datt1(b4, b5, b8):
     """
     Vegetation Index proposed by Datt 1 (Datt, 1999a).
@@ -495,6 +517,7 @@ def datt1(b4, b5, b8):
     return DATT1
 
 
+@index
 def datt3(b3, b5, b8a):
     """
     Vegetation Index proposed by Datt 3 (Datt, 1998).
@@ -522,6 +545,7 @@ def datt3(b3, b5, b8a):
     return DATT3
 
 
+@index(valid_range=(0.0, 1.0))
 def dnvi(b1, b2):
     """
     Discriminant Normalized Vegetation Index (Manna and Raychawdhuri, 2018).
@@ -547,6 +571,7 @@ def dnvi(b1, b2):
     return DNVI
 
 
+@index
 def gari(b2, b3, b4, b8):
     """
     Green Atmospherically Resistant Vegetation Index \
@@ -577,6 +602,7 @@ def gari(b2, b3, b4, b8):
     return GARI
 
 
+@index
 def gcvi(b3, b8):
     """
     Green Chlorophyll Vegetation Index (Gitelson et al., 2003b).
@@ -602,6 +628,7 @@ def gcvi(b3, b8):
     return GCVI
 
 
+@index
 def grvi(b3, b4):
     """
     Green-Red Vegetation Index (Tucker, 1979).
@@ -622,10 +649,11 @@ def grvi(b3, b4):
         doi:10.1016/0034-4257(79)90013-0.
     """
 
-    GRVI = (b3 - b4)/(b3 + b4)
+    GRVI = normalized_difference(b3, b4)
     return GRVI
 
 
+@index
 def ireci(b4, b5, b6, b7):
     """
     Inverted Red-edge Chlorophyll Index (Frampton et al., 2013).
@@ -656,6 +684,7 @@ def ireci(b4, b5, b6, b7):
     return IRECI
 
 
+@index
 def lanthoc(b3, b5, b7):
     """
     Leaf Anthocyanid Content (Wulf and Stuhler, 2015).
@@ -683,6 +712,7 @@ def lanthoc(b3, b5, b7):
     return LAnthoC
 
 
+@index
 def lcaroc(b2, b5, b7):
     """
     Leaf Carotenoid Content (Wulf and Stuhler, 2015).
@@ -710,6 +740,7 @@ def lcaroc(b2, b5, b7):
     return LCaroC
 
 
+@index
 def lchloc(b5, b7):
     """
     Leaf Chlorophyll Content (Wulf and Stuhler, 2015).
@@ -735,6 +766,7 @@ def lchloc(b5, b7):
     return LChloC
 
 
+@index
 def lswi(b8, b11):
     """
     Land Surface Water Index (Xiao et al., 2002).
@@ -752,10 +784,11 @@ def lswi(b8, b11):
 
     """
 
-    LSWI = (b8 - b11)/(b8 + b11)
+    LSWI = normalized_difference(b8, b11)
     return LSWI
 
 
+@index
 def maccioni(b4, b5, b7):
     """
     Vegetation Index proposed by Maccioni (Maccioni, Agati, and \
@@ -784,6 +817,7 @@ def maccioni(b4, b5, b7):
     return Maccioni
 
 
+@index
 def mcari(b3, b4, b5):
     """
     Modified Chlorophyll Absorption in Reflectance Index \
@@ -811,6 +845,7 @@ def mcari(b3, b4, b5):
     return MCARI
 
 
+@index(valid_range=(-7.8, 12.0))
 def mirbi(b11, b12):
     """
     Mid Infrared Burned Index (Trigg and Flasse, 2001).
@@ -836,6 +871,7 @@ def mirbi(b11, b12):
     return MIRBI
 
 
+@index
 def mndbi(b8, b12):
     """
     Modified Normalized Difference Built-up Index \
@@ -859,10 +895,11 @@ def mndbi(b8, b12):
         pp. 598-603. doi:10.1109/ICSPCT.2014.6884944.
     """
 
-    MNDBI = (b12 - b8)/(b12 + b8)
+    MNDBI = normalized_difference(b12, b8)
     return MNDBI
 
 
+@index
 def mndvi(b2, b4, b8):
     """
     Modified Normalized Difference Vegetation Index \
@@ -891,6 +928,7 @@ def mndvi(b2, b4, b8):
     return MNDVI
 
 
+@index
 def mndwi(b3, b11):
     """
     Modified Normalized Difference Water Index (Xu, 2006).
@@ -912,10 +950,11 @@ def mndwi(b3, b11):
         doi:10.1080/01431160600589179.
     """
 
-    MNDWI = (b3 - b11) / (b3 + b11)
+    MNDWI = normalized_difference(b3, b11)
     return MNDWI
 
 
+@index(valid_range=(-0.505, 1.205))
 def mnsi(b3, b4, b6, b8):
     """
     Misra Non-such Index (Misra, Wheeler, and Oliver, 1977).
@@ -943,6 +982,7 @@ def mnsi(b3, b4, b6, b8):
     return MNSI
 
 
+@index
 def msi(b8a, b11):
     """
     Moisture Stress Index (Rock, Williams, and Vogelmann, 1985).
@@ -969,6 +1009,7 @@ def msi(b8a, b11):
     return MSI
 
 
+@index
 def msr2(b4, b5, b8):
     """
     Modified Simple Ratio (Chen, 1996).
@@ -995,6 +1036,7 @@ def msr2(b4, b5, b8):
     return MSR
 
 
+@index
 def msrredre(b4, b5, b8, a=0.4):
     """
     Red and Red-edge MSR Index (Xie et al. 2018).
@@ -1030,6 +1072,7 @@ def msrredre(b4, b5, b8, a=0.4):
     return MSRREDRE
 
 
+@index
 def msrre(b5, b8):
     """
     Modified Simple Ratio Red-edge (Wu et al., 2008).
@@ -1060,6 +1103,7 @@ def msrre(b5, b8):
     return MSRRE
 
 
+@index
 def MSRREn(b5, b8a):
     """
     Modified Simple Ratio Red-edge normalized (Wu et al., 2008).
@@ -1091,6 +1135,7 @@ def MSRREn(b5, b8a):
     return MSRREn
 
 
+@index
 def mtci(b4, b5, b6):
     """
     MERIS Terrestrial Chlorophyll Index (Dash and Curran, 2004).
@@ -1117,6 +1162,7 @@ def mtci(b4, b5, b6):
     return MTCI
 
 
+@index
 def nbr(b8, b12):
     """
     Normalized Burn Ratio \
@@ -1142,10 +1188,11 @@ def nbr(b8, b12):
         Geological Survey, Northern Rocky Mountain Science Center.
     """
 
-    NBR = (b8 - b12) / (b8 + b12)
+    NBR = normalized_difference(b8, b12)
     return NBR
 
 
+@index
 def nbr2(b11, b12):
     """
     Normalized Burn Ratio-2 (García and Caselles, 1991).
@@ -1166,10 +1213,11 @@ def nbr2(b11, b12):
         6(1), 31-37. doi:10.1080/10106049109354290.
     """
 
-    NBR2 = (b11 - b12) / (b11 + b12)
+    NBR2 = normalized_difference(b11, b12)
     return NBR2
 
 
+@index
 def nbai(b6, b11):
     """
     Normalized Difference Bareness Index (Zhao and Chen, 2005).
@@ -1191,10 +1239,11 @@ def nbai(b6, b11):
         Symposium 3, pp. 1666. doi:10.1109/IGARSS.2005.1526319.
     """
 
-    NDBaI = (b6 - b11) / (b6 + b11)
+    NDBaI = normalized_difference(b6, b11)
     return NDBaI
 
 
+@index
 def ndbi(b8, b11):
     """
     Normalized Difference Built-up Index (Zha, Gao, and Ni, 2003).
@@ -1216,10 +1265,11 @@ def ndbi(b8, b11):
         doi:10.1080/01431160304987.
     """
 
-    NDBI = (b11 - b8) / (b11 + b8)
+    NDBI = normalized_difference(b11, b8)
     return NDBI
 
 
+@index
 def ndii(b8, b11):
     """
     Normalized Difference Infrared Index \
@@ -1243,10 +1293,11 @@ def ndii(b8, b11):
         and Remote Sensing 49, 77-83.
     """
 
-    NDII = (b8 - b11) / (b8 + b11)
+    NDII = normalized_difference(b8, b11)
     return NDII
 
 
+@index
 def ndmi(b8, b11):
     """
     Normalized Difference Moisture Index \
@@ -1271,10 +1322,11 @@ def ndmi(b8, b11):
         doi:10.1109/tgrs.2003.819190.
     """
 
-    NDMI = (b8 - b11) / (b8 + b11)
+    NDMI = normalized_difference(b8, b11)
     return NDMI
 
 
+@index
 def ndre1(b5, b6):
     """
     Normalized Difference Red-edge 1 \
@@ -1298,10 +1350,11 @@ def ndre1(b5, b6):
        doi:10.1016/S0176-1617(11)81633-0.
     """
 
-    NDRE1 = (b6 - b5)/(b6 + b5)
+    NDRE1 = normalized_difference(b6, b5)
     return NDRE1
 
 
+@index
 def ndre2(b5, b7):
     """
     Normalized Difference Red-edge 2 (Barnes et al., 2000).
@@ -1325,10 +1378,11 @@ def ndre2(b5, b7):
        Agriculture, 16-19 July 2000. Bloomington, USA.
     """
 
-    NDRE2 = (b7 - b5)/(b7 + b5)
+    NDRE2 = normalized_difference(b7, b5)
     return NDRE2
 
 
+@index
 def ndredgeswir(b6, b12):
     """
     Normalized Difference Red-edge and SWIR2 (Radoux et al., 2016).
@@ -1350,10 +1404,11 @@ def ndredgeswir(b6, b12):
        doi:10.3390/rs8060488.
     """
 
-    NDREDGESWIR = (b6 - b12)/(b6 + b12)
+    NDREDGESWIR = normalized_difference(b6, b12)
     return NDREDGESWIR
 
 
+@index
 def ndre1m(b1, b5, b6):
     """
     Normalized Difference Red-edge 1 modified (Sims and Gamon, 2002).
@@ -1381,6 +1436,7 @@ def ndre1m(b1, b5, b6):
     return NDRE1M
 
 
+@index
 def ndre2m(b1, b5, b7):
     """
     Normalized Difference Red-edge 2 modified (Sims and Gamon, 2002).
@@ -1408,6 +1464,7 @@ def ndre2m(b1, b5, b7):
     return NDRE2M
 
 
+@index
 def ndswir(b8, b12):
     """
     Normalized Difference SWIR (Gerard et al., 2003).
@@ -1430,10 +1487,11 @@ def ndswir(b8, b12):
        doi:10.1109/tgrs.2003.819190.
     """
 
-    NDSWIR = (b8 - b12) / (b8 + b12)
+    NDSWIR = normalized_difference(b8, b12)
     return NDSWIR
 
 
+@index
 def ndti(b11, b12):
     """
     Normalized Difference Tillage Index (Van Deventer et al., 1997).
@@ -1455,10 +1513,11 @@ def ndti(b11, b12):
        63, 87-93.
     """
 
-    NDTI = (b11 - b12) / (b11 + b12)
-    return MDTI
+    NDTI = normalized_difference(b11, b12)
+    return NDTI
 
 
+@index
 def ndvire(b5, b8):
     """
     Normalized Difference Vegetation Index Red-edge \
@@ -1482,10 +1541,11 @@ def ndvire(b5, b8):
        doi:10.1016/S0176-1617(11)81633-0.
     """
 
-    NDVIRE = (b8 - b5) / (b8 + b5)
+    NDVIRE = normalized_difference(b8, b5)
     return NDVIRE
 
 
+@index
 def ndvire1n(b5, b8a):
     """
     Normalized Difference Vegetation Index red-edge 1 narrow \
@@ -1508,10 +1568,11 @@ def ndvire1n(b5, b8a):
        Geoinformation 50, 170-175. doi:10.1016/j.jag.2016.03.005.
     """
 
-    NDVIRE1n = (b8a - b5) / (b8a + b5)
+    NDVIRE1n = normalized_difference(b8a, b5)
     return NDVIRE1n
 
 
+@index
 def ndvire2(b6, b8):
     """
     Normalized Difference Vegetation Index red-edge 2 narrow \
@@ -1534,10 +1595,11 @@ def ndvire2(b6, b8):
        Geoinformation 50, 170-175. doi:10.1016/j.jag.2016.03.005.
     """
 
-    NDVIRE2 = (b8 - b6) / (b8 + b6)
+    NDVIRE2 = normalized_difference(b8, b6)
     return NDVIRE2
 
 
+@index
 def ndvire2n(b6, b8a):
     """
     Normalized Difference Vegetation Index Red-edge 2 narrow \
@@ -1560,10 +1622,11 @@ def ndvire2n(b6, b8a):
        Geoinformation 50, 170-175. doi:10.1016/j.jag.2016.03.005.
     """
     #
-    NDVIRE2n = (b8a - b6) / (b8a + b6)
+    NDVIRE2n = normalized_difference(b8a, b6)
     return NDVIRE2n
 
 
+@index
 def ndvire3(b7, b8):
     """
     Normalized Difference Vegetation Index Red-edge 3 \
@@ -1587,10 +1650,11 @@ def ndvire3(b7, b8):
        doi:10.1016/S0176-1617(11)81633-0.
     """
 
-    NDVIRE3 = (b8 - b7) / (b8 + b7)
+    NDVIRE3 = normalized_difference(b8, b7)
     return NDVIRE3
 
 
+@index
 def ndvire3n(b7, b8a):
     """
     Normalized Difference Vegetation Index Red-edge 3 narrow \
@@ -1613,10 +1677,11 @@ def ndvire3n(b7, b8a):
        Geoinformation 50, 170-175. doi:10.1016/j.jag.2016.03.005.
     """
 
-    NDVIRE3n = (b8a - b7)/(b8a + b7)
+    NDVIRE3n = normalized_difference(b8a, b7)
     return NDVIRE3n
 
 
+@index
 def ndvi705(b5, b6):
     """
     Red-edge Normalized Difference Vegetation Index \
@@ -1640,10 +1705,11 @@ def ndvi705(b5, b6):
        doi:10.1016/S0176-1617(11)81633-0.
     """
 
-    NDVI705 = (b6 - b5)/(b6 + b5)
+    NDVI705 = normalized_difference(b6, b5)
     return NDVI705
 
 
+@index
 def ngrdi(b3, b5):
     """
     Normalized Green Red Difference Index (Zarco-Tejada et al., 2001).
@@ -1666,10 +1732,11 @@ def ngrdi(b3, b5):
        Geoscience and Remote Sensing 39, 1491-1507. doi:10.1109/36.934080.
     """
 
-    NGRDI = (b3 - b5)/(b3 + b5)
+    NGRDI = normalized_difference(b3, b5)
     return NGRDI
 
 
+@index
 def nhi(b3, b11):
     """
     Normalized Humidity Index (Lacaux et al., 2007).
@@ -1692,10 +1759,11 @@ def nhi(b3, b11):
        Geoscience and Remote Sensing 39, 1491-1507. doi:10.1109/36.934080.
     """
 
-    NHI = (b11 - b3)/(b11 + b3)
+    NHI = normalized_difference(b11, b3)
     return NHI
 
 
+@index
 def nmdi(b8, b11, b12):
     """
     Normalized Multi-band Drought Index (Wang and Qu, 2007).
@@ -1718,10 +1786,11 @@ def nmdi(b8, b11, b12):
        sensing. Geophysical Research Letters 34(20). doi:10.1029/2007GL031021.
     """
 
-    NMDI = (b8 - (b11 - b12)) / (b8 + (b11 - b12))
+    NMDI = normalized_difference(b8, b11 - b12)
     return NMDI
 
 
+@index
 def ppr(b2, b3):
     """
     Plant Pigment Ratio (Metternicht, 2003).
@@ -1743,10 +1812,11 @@ def ppr(b2, b3):
        doi:10.1080/01431160210163074
     """
 
-    PPR = (b3 - b2)/(b3 + b2)
+    PPR = normalized_difference(b3, b2)
     return PPR
 
 
+@index
 def psri(b3, b4, b6):
     """
     Plant Senescence Reflectance Index (Merzlyak et al., 1999).
@@ -1774,6 +1844,7 @@ def psri(b3, b4, b6):
     return PSRI
 
 
+@index
 def pvr(b3, b4):
     """
     Photosyntetic Vigour Ratio (Metternicht, 2003).
@@ -1795,10 +1866,11 @@ def pvr(b3, b4):
        doi:10.1080/01431160210163074
     """
 
-    PVR = (b3 - b4)/(b3 + b4)
+    PVR = normalized_difference(b3, b4)
     return PVR
 
 
+@index(valid_range=(-1.0, 1.0))
 def rbndvi(b2, b4, b8):
     """
     Red-Blue NDVI (Wang et al., 2007).
@@ -1822,10 +1894,11 @@ def rbndvi(b2, b4, b8):
        doi:10.1016/S1672-6308(07)60027-4.
     """
 
-    RBNDVI = (b8 - (b4 + b2))/(b8 + (b4 + b2))
+    RBNDVI = normalized_difference(b8, b4 + b2)
     return RBNDVI
 
 
+@index(valid_range=(-1.0, 1.0))
 def redswir1(b4, b11):
     """
     Red and SWIR bands difference (Jacques et al., 2014).
@@ -1850,6 +1923,7 @@ def redswir1(b4, b11):
     return RedSWIR1
 
 
+@index
 def reip(b4, b5, b6, b7):
     """
     Red-edge Inflection Point (Herrmann et al. 2011).
@@ -1879,6 +1953,7 @@ def reip(b4, b5, b6, b7):
     return REIP
 
 
+@index
 def rervi(b5, b8):
     """
     Red-edge Ratio Vegetation Index (Cao et al., 2013).
@@ -1904,6 +1979,7 @@ def rervi(b5, b8):
     return RERVI
 
 
+@index(valid_range=(0.0, 5.0))
 def REPA(b4, b5, b6, b7, b8a):
     """
     Red-edge Peak Area (Radoux et al. 2016).
@@ -1935,6 +2011,7 @@ def REPA(b4, b5, b6, b7, b8a):
     return REPA
 
 
+@index(valid_range=(-100.0, 100.0))
 def rtvicore(b3, b5, b8):
     """
     Red-edge Triangular Vegetation Index (Chen et al., 2010).
@@ -1962,6 +2039,7 @@ def rtvicore(b3, b5, b8):
     return RTVIcore
 
 
+@index(valid_range=(-0.67, 3.0))
 def savirre(b4, b5, b8, a=0.4, L=0.5):
     """
     Soil-Adjusted Vegetation Index with red and red-edge \
@@ -2008,6 +2086,7 @@ def savirre(b4, b5, b8, a=0.4, L=0.5):
     return SAVIRRE
 
 
+@index
 def sipi(b3, b4, b8):
     """
     Structure Intensive Pigment Index \
@@ -2035,6 +2114,7 @@ def sipi(b3, b4, b8):
     return SIPI
 
 
+@index
 def siwsi(b8a, b11):
     """
     Shortwave Infrared Water Stress Index \
@@ -2057,10 +2137,11 @@ def siwsi(b8a, b11):
        Environment 87, 111-121. doi:10.1016/j.rse.2003.07.002.
     """
 
-    SIWSI = (b8a - b11)/(b8a + b11)
+    SIWSI = normalized_difference(b8a, b11)
     return SIWSI
 
 
+@index
 def sri(b4, b8):
     """
     Simple Ratio Index (Jordan, 1969).
@@ -2085,6 +2166,7 @@ def sri(b4, b8):
     return SRI
 
 
+@index
 def srnirnarrowgreen(b3, b8a):
     """
     Simple Ratio NIR narrow and Green \
@@ -2111,6 +2193,7 @@ def srnirnarrowgreen(b3, b8a):
     return SRNIRnarrowGreen
 
 
+@index
 def snrirnarrowred(b4, b8a):
     """
     Simple Ratio NIR narrow and Red (Blackburn, 1998).
@@ -2135,6 +2218,7 @@ def snrirnarrowred(b4, b8a):
     return SRNIRnarrowRed
 
 
+@index
 def srnirnarrowre1(b5, b8a):
     """
     Simple NIR and Red-edge 1 Ratio (Datt, 1999b).
@@ -2159,6 +2243,7 @@ def srnirnarrowre1(b5, b8a):
     return SRNIRnarrowRE1
 
 
+@index
 def srnirnarrowre2(b6, b8a):
     """
     Simple NIR and Red-edge 2 Ratio (Datt, 1999b).
@@ -2183,6 +2268,7 @@ def srnirnarrowre2(b6, b8a):
     return SRNIRnarrowRE2
 
 
+@index
 def srnirnarrowre3(b7, b8a):
     """
     Simple NIR and Red-edge 3 Ratio (Datt, 1999b).
@@ -2207,6 +2293,7 @@ def srnirnarrowre3(b7, b8a):
     return SRNIRnarrowRE3
 
 
+@index
 def srre1(b1, b5, b6):
     """
     Surface Reflectance Red-edge 1 (Sims and Gamon, 2002).
@@ -2234,6 +2321,7 @@ def srre1(b1, b5, b6):
     return SRRE1
 
 
+@index
 def srre2(b1, b5, b7):
     """
     Surface Reflectance Red-edge 2 (Sims and Gamon, 2002).
@@ -2261,6 +2349,7 @@ def srre2(b1, b5, b7):
     return SRRE2
 
 
+@index
 def sti(b11, b12):
     """
     Soil Tillage Index (Van Deventer, 1997).
@@ -2286,6 +2375,7 @@ def sti(b11, b12):
     return STI
 
 
+@index
 def s2rep(b4, b5, b6, b7):
     """
     Sentinel-2 Red-edge Position (Frampton et al., 2013).
@@ -2316,6 +2406,7 @@ def s2rep(b4, b5, b6, b7):
     return S2REP
 
 
+@index(valid_range=(-3.0, 3.0))
 def tcari(b3, b4, b5):
     """
     Transformed Chlorophyll Absorption in \
@@ -2344,6 +2435,7 @@ def tcari(b3, b4, b5):
     return TCARI
 
 
+@index(valid_range=(-100.0, 100.0))
 def tvi(b3, b4, b6):
     """
     Transformed Vegetation Index (Broge and Leblanc, 2001).
@@ -2372,6 +2464,7 @@ def tvi(b3, b4, b6):
     return TVI
 
 
+@index
 def varigreen(b2, b3, b4):
     """
     Visible Atmospherically Resistant Index Green \
@@ -2400,6 +2493,7 @@ def varigreen(b2, b3, b4):
     return VARIGREEN
 
 
+@index
 def vi700(b4, b5):
     """
     Vegetation Index 700 (Gitelson et al., 2002).
@@ -2421,10 +2515,11 @@ def vi700(b4, b5):
         doi:10.1016/S0034-4257(01)00289-9.
     """
 
-    VI700 = (b5 - b4)/(b5 + b4)
+    VI700 = normalized_difference(b5, b4)
     return VI700
 
 
+@index(valid_range=(-1.0, 3.0))
 def vsdi(b2, b4, b11):
     """
     Visible and Shortwave Infrared Drought Index \
@@ -2453,6 +2548,7 @@ def vsdi(b2, b4, b11):
     return VSDI
 
 
+@index
 def wbi(b2, b4):
     """
     Water Body Index (Domenech and Mallet, 2014).
@@ -2473,10 +2569,11 @@ def wbi(b2, b4):
         EuroSDR official publication, 64.
     """
 
-    WBI = (b2 - b4) / (b2 + b4)
+    WBI = normalized_difference(b2, b4)
     return WBI
 
 
+@index
 def wdrvire(b5, b7, alpha=0.01):
     """
     Wide Dynamic Range Vegetation Index Red-edge (Peng and Gitelson, 2011).
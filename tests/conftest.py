@@ -0,0 +1,20 @@
+import numpy
+import pytest
+
+from sr2vgi import registry
+
+
+@pytest.fixture
+def bands():
+    """Bands of typical surface reflectance values, by name."""
+    generator = numpy.random.default_rng(1)
+    return {band: generator.uniform(0.01, 0.6, (300, 257))
+            for band in registry.BANDS}
+
+
+@pytest.fixture
+def clouds():
+    """Mask of the clear pixels of ``bands``, around blocky clouds."""
+    generator = numpy.random.default_rng(2)
+    cells = generator.random((8, 8)) > 0.6
+    return numpy.kron(cells, numpy.ones((40, 40), bool))[:300, :257]
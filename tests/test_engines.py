@@ -0,0 +1,126 @@
+import numpy
+import pytest
+
+from sr2vgi import fused, parallel, registry, tiled, vgi
+
+NAMES = list(registry.INDEXES)
+
+
+@pytest.fixture
+def plain(bands):
+    """Values of every index by its formula as written."""
+    with numpy.errstate(all='ignore'):
+        return {name: numpy.asarray(spec.function(
+            *(bands[band] for band in spec.bands)))
+            for name, spec in registry.INDEXES.items()}
+
+
+def assert_same(values, expected, names=NAMES):
+    for name in names:
+        numpy.testing.assert_array_equal(values[name], expected[name],
+                                         err_msg=name)
+
+
+def test_fused(bands, plain):
+    with numpy.errstate(all='ignore'):
+        assert_same(registry.compute_many(bands), plain)
+
+
+@pytest.mark.parametrize('block', [1, 37, (50, 64)])
+def test_tiled(bands, plain, block):
+    out = {name: numpy.empty((300, 257)) for name in NAMES}
+    with numpy.errstate(all='ignore'):
+        assert_same(tiled.compute_many(bands, out, block=block), plain)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_parallel(bands, plain, workers):
+    with numpy.errstate(all='ignore'):
+        assert_same(parallel.compute_many(bands, workers=workers, block=50),
+                    plain)
+
+
+def test_parallel_processes(bands, plain):
+    with numpy.errstate(all='ignore'):
+        values = parallel.compute_many(bands, ['ndvi', 'evi', 'nbr'],
+                                       workers=2, block=100,
+                                       backend='process')
+    assert_same(values, plain, ['ndvi', 'evi', 'nbr'])
+
+
+def test_index_function_options(bands, plain):
+    out = numpy.empty((300, 257))
+    value = vgi.evi(bands['b2'], bands['b4'], bands['b8'], out=out)
+    assert value is out
+    numpy.testing.assert_array_equal(out, plain['evi'])
+
+
+@pytest.mark.parametrize('mask', ['clouds', 'random', 'none', 'row'])
+def test_where(bands, plain, clouds, mask):
+    where = {'clouds': clouds,
+             'random': numpy.random.default_rng(3).random((300, 257)) > 0.5,
+             'none': numpy.zeros((300, 257), bool),
+             'row': clouds[:1]}[mask]
+    names = ['ndvi', 'evi', 'savi', 'nbr']
+    values = registry.compute_many(bands, names, where=where, fill_value=-9)
+    valid = numpy.broadcast_to(where, (300, 257))
+    for name in names:
+        numpy.testing.assert_array_equal(values[name][valid],
+                                         plain[name][valid])
+        assert (values[name][~valid] == -9).all()
+
+
+def test_where_encoded(bands, clouds):
+    names = ['ndvi', 'ndwi_gao', 'lswi']
+    full = registry.compute_many(bands, names, encoding='int16')
+    masked = registry.compute_many(bands, names, encoding='int16',
+                                   where=clouds)
+    for name in names:
+        numpy.testing.assert_array_equal(masked[name][clouds],
+                                         full[name][clouds])
+        assert (masked[name][~clouds] == -32768).all()
+
+
+def test_where_skips_cloudy_tiles(bands, plain, clouds, monkeypatch):
+    computed = []
+
+    def apply(node, operands, out):
+        computed.append(out.size)
+        return _apply(node, operands, out=out)
+
+    _apply = fused._apply
+    monkeypatch.setattr(fused, '_apply', apply)
+    batch = registry.plan(['evi'])
+    fused.execute(batch, bands, block_size=2570)
+    full = sum(computed)
+    del computed[:]
+    values = fused.execute(batch, bands, where=clouds, block_size=2570)
+    numpy.testing.assert_array_equal(values['evi'][clouds],
+                                     plain['evi'][clouds])
+    # Clear pixels are 43% of the scene.
+    assert sum(computed) < full / 2
+
+
+@pytest.mark.parametrize('divide', [0, 'clamp', 5.0])
+def test_divide(bands, divide):
+    bands = dict(bands, b4=bands['b4'].copy(), b8=bands['b8'].copy(),
+                 b11=bands['b11'].copy())
+    bands['b4'][0, :3] = bands['b8'][0, :3] = bands['b11'][0, :3] = 0
+    batch = registry.plan(['ndmi', 'ndbi', 'ndvi'])
+    assert batch.swap
+    values = registry.compute_many(bands, batch.outputs, divide=divide)
+    fill = 0.0 if divide == 'clamp' else divide
+    for name, value in values.items():
+        numpy.testing.assert_array_equal(value[0, :3], fill)
+        assert not numpy.signbit(value[0, :3]).any()
+    assert batch.unswapped() is batch.unswapped()
+    assert not numpy.signbit(vgi.ndvi(0, 0, divide=0))
+
+
+def test_executor_options_are_keywords(bands):
+    params = {'savirre': {'L': 0.25}}
+    with pytest.raises(TypeError):
+        parallel.compute_many(bands, ['savirre'], params)
+    values = parallel.compute_many(bands, ['savirre'], params=params)
+    numpy.testing.assert_array_equal(values['savirre'], registry.compute_many(
+        bands, ['savirre'], params)['savirre'])
@@ -0,0 +1,163 @@
+import numpy
+import pytest
+
+from sr2vgi import raw, registry, vgi
+
+NAMES = ['ndvi', 'evi', 'nbr']
+
+
+@pytest.fixture
+def expected(bands):
+    return registry.compute_many(bands, NAMES)
+
+
+@pytest.mark.parametrize('interleave', ['bsq', 'bil', 'bip'])
+def test_raw(tmp_path, bands, expected, interleave):
+    path = str(tmp_path / 'bands.dat')
+    names = registry.required_bands(NAMES)
+    written = raw.create(path, names, (300, 257), 'float64', interleave)
+    for name in names:
+        written[name][...] = bands[name]
+    del written
+
+    values = raw.compute_many(raw.load(path), str(tmp_path / 'out.dat'),
+                              NAMES, interleave=interleave, block=64)
+    for name in NAMES:
+        numpy.testing.assert_array_equal(values[name], expected[name])
+
+
+def test_npy_directory(tmp_path, bands, expected):
+    for name in registry.required_bands(NAMES):
+        numpy.save(str(tmp_path / (name + '.npy')), bands[name])
+    values = registry.compute_many(raw.load(str(tmp_path)), NAMES)
+    for name in NAMES:
+        numpy.testing.assert_array_equal(values[name], expected[name])
+
+
+def test_tiff(tmp_path, bands, expected):
+    tifffile = pytest.importorskip('tifffile')
+    from sr2vgi import tiff
+
+    paths = {}
+    for name in registry.required_bands(NAMES):
+        paths[name] = str(tmp_path / (name + '.tif'))
+        tifffile.imwrite(paths[name], bands[name], tile=(64, 64))
+    with tiff.load(paths) as loaded:
+        path = tiff.compute_many(loaded, str(tmp_path / 'out.tif'), NAMES)
+    assert all(band.reader.file.filehandle.closed
+               for band in loaded.values())
+    values = tifffile.imread(path)
+    for sample, name in enumerate(NAMES):
+        numpy.testing.assert_array_equal(values[..., sample],
+                                         expected[name])
+
+
+def test_tiff_closed_when_collected(tmp_path, bands):
+    tifffile = pytest.importorskip('tifffile')
+    import gc
+    from sr2vgi import tiff
+
+    tifffile.imwrite(str(tmp_path / 'b4.tif'), bands['b4'])
+    loaded = tiff.load({'b4': str(tmp_path / 'b4.tif')})
+    handle = loaded['b4'].reader.file.filehandle
+    del loaded
+    gc.collect()
+    assert handle.closed
+
+
+def test_jp2_decoded_once(tmp_path, monkeypatch):
+    imagecodecs = pytest.importorskip('imagecodecs')
+    import concurrent.futures
+    from sr2vgi import safe
+
+    values = numpy.arange(64 * 48, dtype=numpy.uint16).reshape(64, 48)
+    path = tmp_path / 'T23KMQ_B04_10m.jp2'
+    path.write_bytes(imagecodecs.jpeg2k_encode(values, level=0))
+    band = safe.Jp2Band(str(path))
+    decode, calls = band._decode, []
+    monkeypatch.setattr(band, '_decode',
+                        lambda: calls.append(1) or decode())
+
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        blocks = list(executor.map(lambda top: band[top:top + 8],
+                                   range(0, 64, 8)))
+    numpy.testing.assert_array_equal(numpy.concatenate(blocks), values)
+    assert len(calls) == 1
+    band.close()
+    assert band.values is None
+    numpy.testing.assert_array_equal(band[:2], values[:2])
+    assert len(calls) == 2
+
+
+def test_scene_directory(tmp_path, bands, expected):
+    tifffile = pytest.importorskip('tifffile')
+    from sr2vgi import cli
+
+    scene = tmp_path / 'scene'
+    scene.mkdir()
+    numpy.save(str(scene / 'b4.npy'), bands['b4'])
+    tifffile.imwrite(str(scene / 'T23KMQ_B08.tif'), bands['b8'])
+    written = raw.create(str(scene / 'b12.dat'), ['b12'], (300, 257),
+                         'float64')
+    written['b12'][...] = bands['b12']
+    del written
+    numpy.save(str(scene / 'b2.npy'), bands['b2'])
+
+    cli.process(str(scene), str(tmp_path), ['ndvi', 'evi', 'nbr'],
+                block=64)
+    for name in NAMES:
+        numpy.testing.assert_array_equal(
+            numpy.load(str(tmp_path / 'scene_{}.npy'.format(name))),
+            expected[name])
+
+
+def test_cli_unknown_index(capsys):
+    from sr2vgi import cli
+
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(['scene', '-i', 'ndvi,nope'])
+    assert exit_info.value.code == 2
+    assert "Unknown index 'nope'" in capsys.readouterr().err
+
+
+@pytest.fixture
+def tiff_safe(tmp_path, bands):
+    """SAFE product of GeoTIFF bands, b8 at 10 m only, as distributed."""
+    tifffile = pytest.importorskip('tifffile')
+    images = tmp_path / 'S2A_MSIL2A_TEST.SAFE' / 'GRANULE' / 'L2A' / \
+        'IMG_DATA'
+    digital = {band: numpy.rint(bands[band][:300, :256] * 10000).astype(
+        numpy.uint16) for band in ('b4', 'b8')}
+    for band, resolutions in (('b4', (10, 20)), ('b8', (10,))):
+        for resolution in resolutions:
+            folder = images / 'R{}m'.format(resolution)
+            folder.mkdir(parents=True, exist_ok=True)
+            tifffile.imwrite(str(folder / 'T23KMQ_B0{}_{}m.tif'.format(
+                band[1], resolution)), digital[band][
+                1::resolution // 10, 1::resolution // 10]
+                if resolution > 10 else digital[band], tile=(64, 64))
+    return str(tmp_path / 'S2A_MSIL2A_TEST.SAFE'), digital
+
+
+def test_tiff_safe_downsampled(tiff_safe):
+    from sr2vgi import safe
+
+    path, digital = tiff_safe
+    product = safe.open_safe(path)
+    values = product.compute_many(['ndvi'], resolution=20)['ndvi']
+    expected = vgi.ndvi(digital['b4'][1::2, 1::2], digital['b8'][1::2, 1::2],
+                        scaling=product.scaling)
+    assert values.shape == (150, 128)
+    numpy.testing.assert_array_equal(values, expected)
+
+
+def test_cli_tiff_safe_resolution(tiff_safe, tmp_path):
+    from sr2vgi import cli, safe
+
+    path, digital = tiff_safe
+    assert cli.main([path, '-i', 'ndvi', '-o', str(tmp_path / 'out'),
+                     '--resolution', '20']) == 0
+    expected = vgi.ndvi(digital['b4'][1::2, 1::2], digital['b8'][1::2, 1::2],
+                        scaling=safe.open_safe(path).scaling)
+    numpy.testing.assert_array_equal(numpy.load(str(
+        tmp_path / 'out' / 'S2A_MSIL2A_TEST_ndvi.npy')), expected)
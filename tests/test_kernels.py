@@ -0,0 +1,66 @@
+import numpy
+import pytest
+
+from sr2vgi import kernels, vgi
+
+
+def plain(x, y):
+    return (x - y) / (x + y)
+
+
+@pytest.mark.parametrize('shape', [(5,), (1000,), (300, 257), (700, 300)])
+def test_normalized_difference(shape):
+    generator = numpy.random.default_rng(5)
+    x, y = generator.random(shape), generator.random(shape)
+    numpy.testing.assert_array_equal(kernels.normalized_difference(x, y),
+                                     plain(x, y))
+
+
+@pytest.mark.parametrize('shape', [(5,), (700, 300)])
+def test_fill_value(shape):
+    x, y = numpy.zeros(shape), numpy.zeros(shape)
+    x[0], y[0] = 1, 3
+    value = kernels.normalized_difference(x, y, fill_value=-2)
+    assert value[0].flat[0] == -0.5
+    assert (value.ravel()[value[0].size:] == -2).all()
+    clamped = kernels.normalized_difference(y, 0 * y, fill_value='clamp')
+    assert clamped[0].flat[0] == 1
+    assert (clamped.ravel()[clamped[0].size:] == 0).all()
+
+
+def test_scalars():
+    assert kernels.normalized_difference(0.5, 0.1) == plain(0.5, 0.1)
+    assert numpy.isnan(kernels.normalized_difference(0.0, 0.0))
+    assert kernels.normalized_difference(0, 0, fill_value=3) == 3
+    value = kernels.normalized_difference(numpy.float32(1), numpy.float32(3))
+    assert value.dtype == 'float32'
+
+
+def test_out():
+    out = numpy.empty(4)
+    assert kernels.normalized_difference(numpy.ones(4), 0.5, out=out) is out
+    numpy.testing.assert_array_equal(out, plain(1, 0.5))
+
+
+def test_masked_arrays_keep_their_mask():
+    x = numpy.ma.masked_less(numpy.linspace(0.1, 0.9, 9), 0.5)
+    value = vgi.ndvi(x, numpy.full(9, 0.3))
+    assert isinstance(value, numpy.ma.MaskedArray)
+    numpy.testing.assert_array_equal(value.mask, x.mask)
+
+
+def test_integer_bands_do_not_wrap():
+    x = numpy.array([1, 2], 'uint16')
+    numpy.testing.assert_array_equal(
+        kernels.normalized_difference(x, x[::-1]), [-1 / 3, 1 / 3])
+
+
+def test_normalized_differences(bands):
+    pairs = {'ndvi': ('b8', 'b4'), 'nbr': ('b8', 'b12'),
+             'ndmi': ('b8', 'b11'), 'ndbi': ('b11', 'b8')}
+    out = {'nbr': numpy.empty((300, 257))}
+    values = kernels.normalized_differences(bands, pairs, out=out)
+    assert values['nbr'] is out['nbr']
+    for name, (x, y) in pairs.items():
+        numpy.testing.assert_array_equal(values[name], getattr(vgi, name)(
+            **{x: bands[x], y: bands[y]}))
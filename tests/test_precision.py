@@ -0,0 +1,42 @@
+import pytest
+
+from sr2vgi import precision, registry
+
+
+@pytest.mark.parametrize('name', list(registry.INDEXES))
+def test_float32_error_bound(name):
+    error = precision.compare([name], policy='float32')[name]
+    assert error <= precision.FLOAT32_TOLERANCE
+
+
+@pytest.mark.parametrize('name', ['ndvi', 'evi', 'msavi'])
+def test_mixed_error_bound(name):
+    error = precision.compare([name], policy='mixed')[name]
+    assert error <= precision.FLOAT32_TOLERANCE
+
+
+def test_check_reports_indexes_above_the_bound():
+    with pytest.raises(AssertionError, match='evi'):
+        precision.check(['evi'], tolerance=0)
+
+
+def test_policy_is_restored():
+    with precision.policy('float32'):
+        assert precision.get_default() == 'float32'
+    assert precision.get_default() is None
+
+
+def test_policy_applies_to_index_functions(bands):
+    from sr2vgi import vgi
+
+    with precision.policy('float32'):
+        value = vgi.ndvi(bands['b4'], bands['b8'])
+    assert value.dtype == 'float32'
+
+
+def test_policy_applies_to_index_specs(bands):
+    spec = registry.get('ndvi')
+    assert spec(bands).dtype == 'float64'
+    with precision.policy('float32'):
+        assert spec(bands).dtype == 'float32'
+    assert spec(bands, dtype='float32').dtype == 'float32'
@@ -0,0 +1,105 @@
+import numpy
+import pytest
+
+from sr2vgi import dsl, encoding, instrument, registry, tiled, vgi
+
+
+@pytest.fixture
+def custom():
+    yield
+    for name in ('myidx', 'MYIDX'):
+        registry.INDEXES.pop(name, None)
+
+
+def test_register_replaces_the_formula(custom):
+    bands = {'b4': numpy.array([0.3]), 'b8': numpy.array([0.5])}
+    dsl.register('myidx', 'b8 - b4')
+    numpy.testing.assert_allclose(
+        registry.compute_many(bands, ['myidx'])['myidx'], 0.2)
+    dsl.register('myidx', 'b8 + b4')
+    numpy.testing.assert_allclose(
+        registry.compute_many(bands, ['myidx'])['myidx'], 0.8)
+
+
+def test_register_keeps_builtins():
+    with pytest.raises(ValueError, match='built-in'):
+        dsl.register('ndvi', 'b8')
+    assert registry.get('ndvi').function.__module__ == 'sr2vgi.vgi'
+
+
+@pytest.mark.parametrize('formula', ['b8 is b4', 'b8 in b4', 'b8 // b4',
+                                     'b8.real', 'b8 if b4 else b3'])
+def test_unsupported_syntax(formula):
+    with pytest.raises(ValueError):
+        dsl.compile(formula)
+
+
+@pytest.mark.parametrize('name', list(registry.INDEXES))
+def test_default_encodings(name):
+    spec = registry.get(name)
+    value = encoding.get('int16', {name: spec.valid_range})[name]
+    assert value.dtype == 'int16'
+    assert value.clip == (spec.valid_range or encoding.FALLBACK_RANGE)
+
+
+def test_encoded_evi(bands):
+    stored = vgi.evi(bands['b2'], bands['b4'], bands['b8'], encoding='int16')
+    assert stored.dtype == 'int16'
+
+
+def test_instrument_records_batches(bands):
+    out = {name: numpy.empty((300, 257)) for name in ('ndvi', 'evi')}
+    with instrument.record() as recorder:
+        registry.compute_many(bands, ['ndvi', 'evi'])
+        tiled.compute_many(bands, out, block=100)
+        vgi.ndvi(bands['b4'], bands['b8'])
+    stats = recorder.stats
+    assert stats['ndvi'].calls == 1 + 3 + 1
+    assert stats['evi'].calls == 1 + 3
+    assert stats['ndvi'].pixels == 3 * 300 * 257
+    assert instrument.active() is None
+
+
+class Labelled(numpy.lib.mixins.NDArrayOperatorsMixin):
+    """Array with a label kept by its operators, like xarray."""
+
+    def __init__(self, values, label):
+        self.values, self.label = values, label
+        self.shape = values.shape
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [value.values if isinstance(value, Labelled) else value
+                  for value in inputs]
+        return Labelled(getattr(ufunc, method)(*inputs, **kwargs),
+                        self.label)
+
+
+def test_duck_arrays_keep_their_type(bands):
+    value = vgi.ndvi(Labelled(bands['b4'], 'scene'),
+                     Labelled(bands['b8'], 'scene'))
+    assert isinstance(value, Labelled) and value.label == 'scene'
+    numpy.testing.assert_allclose(value.values,
+                                  vgi.ndvi(bands['b4'], bands['b8']))
+
+
+def test_benchmark_peak_keeps_tracing():
+    import tracemalloc
+    from sr2vgi import benchmark
+
+    tracemalloc.start()
+    try:
+        assert benchmark._peak(lambda: numpy.ones(10 ** 5)) >= 8 * 10 ** 5
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_index_spec_reads_band_readers(bands):
+    from sr2vgi import resample
+
+    upsampled = {band: resample.Upsampled(bands[band][::2, ::2], 2)
+                 for band in ('b4', 'b8')}
+    expected = vgi.ndvi(*(upsampled[band][:, :]
+                          for band in ('b4', 'b8')))
+    numpy.testing.assert_array_equal(registry.get('ndvi')(upsampled),
+                                     expected)
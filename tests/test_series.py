@@ -0,0 +1,81 @@
+import numpy
+import pytest
+
+from sr2vgi import composite, cube, registry
+
+
+@pytest.fixture
+def cubes():
+    """Band cubes of 6 dates, time first."""
+    generator = numpy.random.default_rng(4)
+    return {band: generator.uniform(0.01, 0.6, (6, 40, 30))
+            for band in ('b2', 'b4', 'b8', 'b12')}
+
+
+@pytest.fixture
+def ndvi(cubes):
+    return registry.compute_many(cubes, ['ndvi'])['ndvi']
+
+
+@pytest.mark.parametrize('chunk, block', [(1, None), (4, 7), (2, (9, 11))])
+def test_cube_out(cubes, ndvi, chunk, block):
+    out = cube.compute('ndvi', cubes, out=numpy.empty((6, 40, 30)),
+                       chunk=chunk, block=block)
+    numpy.testing.assert_array_equal(out, ndvi)
+
+
+def test_cube_reducers(cubes, ndvi):
+    ndvi[2, :5] = numpy.nan
+    where = ~numpy.isnan(ndvi)
+    mean, low, count = cube.compute('ndvi', cubes, reducer=[
+        cube.Mean(), cube.Min(), cube.Count()], where=where, chunk=4,
+        block=9)
+    numpy.testing.assert_allclose(mean, numpy.nanmean(ndvi, axis=0))
+    numpy.testing.assert_array_equal(low, numpy.nanmin(ndvi, axis=0))
+    numpy.testing.assert_array_equal(count, where.sum(axis=0))
+
+
+@pytest.mark.parametrize('block', [None, 7])
+def test_max_composite(cubes, ndvi, block):
+    images = composite.composite(cubes, 'max', criterion='ndvi',
+                                 block=block)
+    date = ndvi.argmax(axis=0)
+    numpy.testing.assert_array_equal(images['date'], date)
+    numpy.testing.assert_array_equal(
+        images['b8'], numpy.take_along_axis(cubes['b8'], date[None], 0)[0])
+
+
+def test_median_composite(cubes, ndvi):
+    images = composite.composite(cubes, 'median', criterion='ndvi', chunk=3)
+    rank = numpy.argsort(ndvi, axis=0)
+    # Rank of the median of 6 dates, rounded like the composite.
+    expected = numpy.take_along_axis(rank, numpy.full((1, 40, 30), 2), 0)[0]
+    numpy.testing.assert_array_equal(images['date'], expected)
+
+
+@pytest.mark.parametrize('block', [None, 8, (8, 7)])
+def test_cube_spatial_mask(cubes, ndvi, block):
+    where = numpy.zeros((40, 30), bool)
+    where[10:] = True
+    out = cube.compute('ndvi', cubes, out=numpy.empty((6, 40, 30)),
+                       where=where, chunk=4, block=block)
+    numpy.testing.assert_array_equal(out[:, 10:], ndvi[:, 10:])
+    assert numpy.isnan(out[:, :10]).all()
+
+
+def test_incomplete_reducer():
+    class Last(cube.Reducer):
+        def update(self, values, window):
+            self.value = values[-1]
+
+    with pytest.raises(TypeError):
+        Last()
+
+
+def test_incomplete_composite():
+    class First(composite.Composite):
+        def _start(self, dtypes):
+            self.values = {}
+
+    with pytest.raises(TypeError):
+        First('ndvi')